@@ -0,0 +1,161 @@
+import bisect
+from dataclasses import dataclass
+from typing import Optional
+
+import ast_utils
+from instrumentation import span
+
+# --- Bounded tree edit distance between normalized ASTs ---
+# Trees are the JSON-like output of normalize_for_comparison. Every dict, list and scalar is one
+# node. Edits are Selkow-style (top-down): relabelling a scalar costs 1, and inserting or deleting
+# a subtree costs its size. Dict children are matched by key. List children are aligned like a
+# sequence, so a moved import costs a delete plus an insert. Equal subtrees are recognized by
+# their structural hash and cost nothing, so only the parts that differ are explored. Every call
+# carries a budget and gives up as soon as the distance is known to exceed it.
+
+DEFAULT_MAX_EDIT_DISTANCE = 500
+
+@dataclass
+class AstSimilarity:
+    distance: Optional[int] # None when the distance exceeds max_distance
+    similarity: Optional[float] # 1 - distance / (left_size + right_size); None when exceeded
+    left_size: int
+    right_size: int
+
+    @property
+    def exceeded(self) -> bool:
+        return self.distance is None
+
+def _is_container(node) -> bool:
+    return isinstance(node, (dict, list))
+
+class _BoundedEditDistance:
+    """
+    Computes distances with an explicit stack of generators instead of recursion, so deeply nested
+    trees (e.g. JSX) do not hit the recursion limit. A generator yields (left, right, budget) to
+    ask for a sub-distance and receives it back. Any result above the budget means "exceeded".
+    """
+
+    def __init__(self, hasher: ast_utils.SubtreeHasher = None):
+        self.hasher = hasher or ast_utils.SubtreeHasher()
+        self._sizes = {} # id(container) -> (container, size); the container is kept to pin its id
+
+    def size(self, root) -> int:
+        if not _is_container(root): return 1
+        sizes = self._sizes
+        cached = sizes.get(id(root))
+        if cached is not None: return cached[1]
+        stack = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if id(node) in sizes: continue
+            children = node.values() if isinstance(node, dict) else node
+            if not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children if _is_container(child) and id(child) not in sizes)
+                continue
+            sizes[id(node)] = (node, 1 + sum(sizes[id(child)][1] if _is_container(child) else 1 for child in children))
+        return sizes[id(root)][1]
+
+    def distance(self, left, right, budget: int) -> int:
+        stack = [self._pair(left, right, budget)]
+        result = None
+        while stack:
+            try:
+                request = stack[-1].send(result)
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+                continue
+            stack.append(self._pair(*request))
+            result = None
+        return result
+
+    def _pair(self, a, b, budget):
+        a_container, b_container = _is_container(a), _is_container(b)
+        if not a_container and not b_container:
+            return 0 if ast_utils._leaf_digest(a) == ast_utils._leaf_digest(b) else 1
+        if type(a) is type(b) and self.hasher.digest(a) == self.hasher.digest(b): return 0
+        size_a, size_b = self.size(a), self.size(b)
+        if abs(size_a - size_b) > budget: return budget + 1 # Each insert/delete changes the size by its cost.
+        if not a_container or not b_container or type(a) is not type(b): return size_a + size_b
+        if isinstance(a, list): return (yield from self._sequence(a, b, budget))
+
+        total = 0
+        for key in sorted(set(a) | set(b)):
+            if key not in b: total += self.size(a[key])
+            elif key not in a: total += self.size(b[key])
+            else: total += yield (a[key], b[key], budget - total)
+            if total > budget: return budget + 1
+        return total
+
+    def _sequence(self, a: list, b: list, budget: int):
+        """Edit distance of two child lists: delete/insert cost the element's size, substitution its distance."""
+        digest = self.hasher.digest
+        start, end_a, end_b = 0, len(a), len(b)
+        while start < min(end_a, end_b) and digest(a[start]) == digest(b[start]): start += 1
+        while end_a > start and end_b > start and digest(a[end_a - 1]) == digest(b[end_b - 1]):
+            end_a -= 1
+            end_b -= 1
+        a, b = a[start:end_a], b[start:end_b]
+        size_a, size_b = [self.size(x) for x in a], [self.size(y) for y in b]
+        prefix_b = [0]
+        for size in size_b: prefix_b.append(prefix_b[-1] + size)
+
+        exceeded = budget + 1
+        # previous[j]: distance between a[:i - 1] and b[:j], capped at `exceeded`.
+        previous = [min(exceeded, total) for total in prefix_b]
+        prefix_a = 0
+        for i in range(1, len(a) + 1):
+            prefix_a += size_a[i - 1]
+            current = [exceeded] * (len(b) + 1)
+            current[0] = min(exceeded, previous[0] + size_a[i - 1])
+            # Cells whose prefixes differ in size by more than the budget cannot be within it.
+            low = max(1, bisect.bisect_left(prefix_b, prefix_a - budget))
+            high = min(len(b), bisect.bisect_right(prefix_b, prefix_a + budget) - 1)
+            for j in range(low, high + 1):
+                best = min(previous[j] + size_a[i - 1], current[j - 1] + size_b[j - 1], exceeded)
+                allowance = best - 1 - previous[j - 1]
+                if allowance >= 0:
+                    best = min(best, previous[j - 1] + (yield (a[i - 1], b[j - 1], allowance)))
+                current[j] = best
+            if min(current) >= exceeded: return exceeded
+            previous = current
+        return previous[len(b)]
+
+def tree_edit_distance(left, right, max_distance: int = None, hasher: ast_utils.SubtreeHasher = None) -> Optional[int]:
+    """Edit distance between two normalized trees, or None if it is larger than `max_distance`."""
+    editor = _BoundedEditDistance(hasher)
+    budget = editor.size(left) + editor.size(right) if max_distance is None else max_distance
+    distance = editor.distance(left, right, budget)
+    return distance if distance <= budget else None
+
+def similarity_normalized(js_ast_cleaned: dict, ts_ast_cleaned: dict, max_distance: int = DEFAULT_MAX_EDIT_DISTANCE,
+                          hasher: ast_utils.SubtreeHasher = None) -> AstSimilarity:
+    """Bounded edit distance and similarity of two trees already passed through normalize_for_comparison."""
+    editor = _BoundedEditDistance(hasher)
+    left_size, right_size = editor.size(js_ast_cleaned), editor.size(ts_ast_cleaned)
+    budget = left_size + right_size if max_distance is None else max_distance
+    with span("ast.similarity"):
+        distance = editor.distance(js_ast_cleaned, ts_ast_cleaned, budget)
+    if distance > budget: return AstSimilarity(None, None, left_size, right_size)
+    return AstSimilarity(distance, 1.0 - distance / (left_size + right_size), left_size, right_size)
+
+def ast_similarity(js_ast: dict, ts_ast: dict, max_distance: int = DEFAULT_MAX_EDIT_DISTANCE) -> AstSimilarity:
+    """Like compare_asts, but scores how close the two trees are instead of only whether they are equal."""
+    return similarity_normalized(ast_utils.normalize_for_comparison(js_ast or {"type": "Program", "body": []}),
+                                 ast_utils.normalize_for_comparison(ts_ast or {"type": "Program", "body": []}),
+                                 max_distance)
+
+def migration_similarity(js_source: str, tsx_code: str, max_distance: int = DEFAULT_MAX_EDIT_DISTANCE,
+                         tsx_file_name: str = "input.tsx", tree_cache: "ast_utils.NormalizedAstCache" = None) -> Optional[AstSimilarity]:
+    """
+    Scores migrated TSX against its JS/JSX source on the trees ast_utils.compare_migration compares
+    (the TSX with its types stripped), so the distance counts migration changes rather than
+    differences between the two parsers. None if either side does not parse.
+    """
+    js_cleaned = ast_utils.normalized_js_source(js_source, tree_cache)
+    ts_cleaned = ast_utils.normalized_tsx_source(tsx_code, tsx_file_name, tree_cache)
+    if js_cleaned is None or ts_cleaned is None: return None
+    return similarity_normalized(ast_utils.without_empty_exports(js_cleaned), ast_utils.without_empty_exports(ts_cleaned),
+                                 max_distance)
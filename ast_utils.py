@@ -1,28 +1,240 @@
 import json
 import esprima # type: ignore
 import copy
+import hashlib
+import logging
 import os
+import pickle
 import subprocess
+import threading
+import atexit
+from dataclasses import dataclass
+from typing import Optional
+
+from instrumentation import span
 
 # --- AST Generation ---
-def generate_js_ast(file_path: str) -> dict:
+def generate_js_ast(file_path: str, lean: bool = False) -> dict:
     try:
         with open(file_path, 'r', encoding='utf-8') as f: source_code = f.read()
-        return esprima.parseScript(source_code, loc=True, range=True, tokens=True, comment=True).toDict()
+        return generate_js_ast_lenient(source_code, lean)
     except Exception: return {}
 
-def generate_ts_ast(file_path: str, node_script_name: str = "generate_ts_ast.js") -> dict:
+def generate_js_ast_from_source(source_code: str, jsx: bool = False, module: bool = False, lean: bool = False) -> dict:
+    """
+    Esprima AST of `source_code`, or {} if it does not parse. `lean` skips collecting locations,
+    ranges, tokens and comments, none of which survive normalize_ast; use it for comparisons.
+    """
+    parse = esprima.parseModule if module else esprima.parseScript
+    options = {} if lean else {"loc": True, "range": True, "tokens": True, "comment": True}
     try:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        tsx_file_abs_path = os.path.abspath(file_path)
-        node_script_full_path = os.path.join(script_dir, node_script_name)
-        process = subprocess.run(
-            ["node", node_script_full_path, tsx_file_abs_path],
-            capture_output=True, text=True, check=True, cwd=script_dir, env=os.environ.copy()
+        with span("ast.js_parse"):
+            return parse(source_code, jsx=jsx, **options).toDict()
+    except Exception: return {}
+
+def generate_js_ast_lenient(source_code: str, lean: bool = False) -> dict:
+    """Parses as a script with JSX, then as a module with JSX (import/export); {} if neither works."""
+    return (generate_js_ast_from_source(source_code, jsx=True, lean=lean)
+            or generate_js_ast_from_source(source_code, jsx=True, module=True, lean=lean))
+
+# Worker crashes in a row after which a request gives up on the items it has left.
+TS_WORKER_MAX_CRASHES = 5
+
+class TsAstWorker:
+    """
+    Long-lived `node generate_ts_ast.js --worker` process. TypeScript is loaded once and files are
+    parsed over a JSON-lines stdin/stdout protocol; the process is restarted if it dies.
+    Results arrive as one compact line per file and are decoded one at a time, so a batch never
+    has to be held as a single giant string.
+    """
+
+    def __init__(self, node_script_name: str = "generate_ts_ast.js"):
+        self.script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.node_script_full_path = os.path.join(self.script_dir, node_script_name)
+        self.bytes_received = 0
+        self._process = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self._process = subprocess.Popen(
+            ["node", self.node_script_full_path, "--worker"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=self.script_dir, env=os.environ.copy()
         )
-        return json.loads(process.stdout)
+
+    def _send(self, request: dict):
+        self._process.stdin.write(json.dumps(request).encode('utf-8') + b"\n")
+        self._process.stdin.flush()
+
+    def _read_response(self, request_id: int) -> dict:
+        line = self._process.stdout.readline()
+        if not line: raise RuntimeError("TypeScript AST worker exited unexpectedly")
+        self.bytes_received += len(line)
+        response = json.loads(line)
+        if response.get("id") != request_id: raise RuntimeError("TypeScript AST worker response out of sync")
+        return response
+
+    def iter_parse(self, items: list, prune_spec: dict = None, op: str = None):
+        """
+        Parses [{"path": ...} | {"source": ..., "fileName": ...}] items, yielding (index, ast) as each
+        file's result arrives ({} for files that failed). `prune_spec` selects the pruned wire format;
+        `op="outline"` yields statement outlines instead of ASTs (see generate_ts_outline).
+        If the worker crashes mid-batch it is restarted and the remaining items are re-sent; if it
+        crashes again, they are sent one at a time and an item that crashes it on its own gets {}.
+        After TS_WORKER_MAX_CRASHES crashes in a row without a result, every remaining item gets {}.
+        Raises OSError only if the worker cannot be started at all.
+        """
+        with self._lock:
+            pending = list(range(len(items)))
+            crashes = 0  # In a row, without a result in between.
+            while pending:
+                if crashes >= TS_WORKER_MAX_CRASHES:
+                    for index in pending: yield index, {}
+                    return
+                if self._process is None or self._process.poll() is not None:
+                    self._start()
+                batch = pending[:1] if crashes > 1 else pending  # Isolate the item that crashes it.
+                self._next_id += 1
+                request_id = self._next_id
+                request = {"id": request_id, "items": [items[i] for i in batch]}
+                if prune_spec is not None: request["prune"] = prune_spec
+                if op is not None: request["op"] = op
+                received = set()
+                done = False
+                try:
+                    self._send(request)
+                    while not done:
+                        response = self._read_response(request_id)
+                        if response.get("done"):
+                            done = True
+                            continue
+                        position = response["index"]
+                        received.add(position)
+                        crashes = 0
+                        result = response.get(op or "ast")
+                        yield batch[position], result if result is not None else {}
+                except (OSError, ValueError, KeyError, RuntimeError):
+                    # The worker crashed or got out of sync: restart it and retry what is left.
+                    self.close()
+                    crashes += 1
+                    if len(batch) == 1 and crashes > 2 and not received:
+                        yield batch[0], {}
+                        received.add(0)
+                finally:
+                    if not done and self._process is not None and self._process.poll() is None:
+                        # The consumer stopped early; the unread tail would desync the next request.
+                        self.close()
+                sent = set(batch)
+                pending = [index for index in pending if index not in sent] + \
+                    [index for position, index in enumerate(batch) if position not in received]
+
+    def parse(self, items: list, prune_spec: dict = None, op: str = None) -> list:
+        """Parses all items and returns one AST ({} on error) per item, in order."""
+        results = [{} for _ in items]
+        for index, ast in self.iter_parse(items, prune_spec, op):
+            results[index] = ast
+        return results
+
+    def close(self):
+        if self._process is None: return
+        try:
+            self._process.stdin.close()
+            self._process.wait(timeout=5)
+        except Exception:
+            self._process.kill()
+        self._process = None
+
+_ts_workers = {}
+_ts_workers_lock = threading.Lock()
+
+def _get_ts_worker(node_script_name: str) -> TsAstWorker:
+    with _ts_workers_lock:
+        worker = _ts_workers.get(node_script_name)
+        if worker is None:
+            worker = _ts_workers[node_script_name] = TsAstWorker(node_script_name)
+        return worker
+
+@atexit.register
+def _close_ts_workers():
+    for worker in _ts_workers.values(): worker.close()
+
+def generate_ts_asts(file_paths: list, node_script_name: str = "generate_ts_ast.js", pruned: bool = True) -> list:
+    """
+    Parses many .tsx files in one round trip to the shared worker; {} for files that fail.
+    With `pruned` (the default) the worker drops everything the normalizer would discard, which
+    shrinks the payload several-fold without changing the result of compare_asts.
+    """
+    results = [{} for _ in file_paths]
+    if not file_paths: return results
+    try:
+        with span("ast.ts_parse", files=len(file_paths)):
+            for index, ast in _get_ts_worker(node_script_name).iter_parse(
+                [{"path": os.path.abspath(p)} for p in file_paths], TS_WIRE_PRUNE_SPEC if pruned else None
+            ):
+                results[index] = ast
+    except Exception as e:
+        logging.warning(f"TypeScript AST worker failed: {type(e).__name__} - {e}")
+    return results
+
+def generate_ts_ast(file_path: str, node_script_name: str = "generate_ts_ast.js", pruned: bool = True) -> dict:
+    return generate_ts_asts([file_path], node_script_name, pruned)[0]
+
+def generate_ts_ast_from_source(source_code: str, file_name: str = "input.tsx", node_script_name: str = "generate_ts_ast.js", pruned: bool = True) -> dict:
+    """Parses in-memory TSX source without writing it to disk first."""
+    try:
+        with span("ast.ts_parse", files=1):
+            return _get_ts_worker(node_script_name).parse(
+                [{"source": source_code, "fileName": file_name}], TS_WIRE_PRUNE_SPEC if pruned else None
+            )[0]
     except Exception: return {}
 
+def generate_ts_outline(source_code: str, file_name: str = "input.tsx", node_script_name: str = "generate_ts_ast.js") -> Optional[list]:
+    """
+    Statement outline of TSX source: one {"category", "names", "start", "end"[, "body"]} dict per
+    top-level statement, with "body" listing the statements of function bodies the same way.
+    Offsets are Python string indices. None if the source cannot be parsed.
+    """
+    try:
+        with span("ast.ts_outline"):
+            outline = _get_ts_worker(node_script_name).parse([{"source": source_code, "fileName": file_name}], op="outline")[0]
+    except Exception: return None
+    if not isinstance(outline, list): return None
+    if any(ord(char) > 0xFFFF for char in source_code): # The worker reports UTF-16 offsets.
+        offsets = []
+        for index, char in enumerate(source_code):
+            offsets.append(index)
+            if ord(char) > 0xFFFF: offsets.append(index)
+        offsets.append(len(source_code))
+        stack = list(outline)
+        while stack:
+            entry = stack.pop()
+            entry["start"], entry["end"] = offsets[entry["start"]], offsets[entry["end"]]
+            stack.extend(entry.get("body") or [])
+    return outline
+
+def generate_js_from_tsx(source_code: str, file_name: str = "input.tsx", node_script_name: str = "generate_ts_ast.js") -> Optional[str]:
+    """
+    `source_code` with its TypeScript removed by the compiler: annotations, type-only declarations
+    and imports, and `as`/`!`/`satisfies` wrappers. JSX and all other syntax is kept as written.
+    None if the source cannot be parsed.
+    """
+    return generate_js_from_tsx_many([(source_code, file_name)], node_script_name)[0]
+
+def generate_js_from_tsx_many(sources: list, node_script_name: str = "generate_ts_ast.js") -> list:
+    """generate_js_from_tsx for many (source_code, file_name) pairs in one round trip to the shared worker."""
+    results = [None for _ in sources]
+    if not sources: return results
+    try:
+        with span("ast.ts_strip_types", files=len(sources)):
+            for index, code in _get_ts_worker(node_script_name).iter_parse(
+                [{"source": source_code, "fileName": file_name} for source_code, file_name in sources], op="strip_types"
+            ):
+                results[index] = code if isinstance(code, str) else None
+    except Exception as e:
+        logging.warning(f"TypeScript AST worker failed: {type(e).__name__} - {e}")
+    return results
+
 # --- AST Cleaning and Normalization Logic ---
 SYNTAX_KIND_TO_STRING_MAP = {
     0: "Unknown", 1: "EndOfFileToken", 8: "NumericLiteral", 9: "BigIntLiteral", 10: "StringLiteral",
@@ -96,6 +308,17 @@ PROPERTIES_TO_REMOVE = {
     "tokens", "sourceType", "directive", "hasExtendedUnicodeEscape", "jsDocParsingMode", "endOfFileToken",
 }
 TS_MODIFIER_KINDS_TO_REMOVE_NUMERIC = { 121, 122, 123, 144, 135, 126, 159 }
+# TS kinds that _create_normalized_shell rebuilds as Esprima nodes (their own `type` child is dropped).
+TS_KINDS_WITH_ESPRIMA_SHELL = frozenset({79, 8, 10, 95, 104, 110, 253, 211, 212, 233, 251, 206, 219, 244, 232, 163, 298})
+
+# Pruned wire format for the TS worker: lets generate_ts_ast.js drop, before serializing, exactly
+# what the normalizer would discard (see getPruningReplacer there).
+TS_WIRE_PRUNE_SPEC = {
+    "properties": sorted(PROPERTIES_TO_REMOVE),
+    "kinds": sorted(k for k, name in SYNTAX_KIND_TO_STRING_MAP.items()
+                    if isinstance(k, int) and name in TS_NODE_KINDS_TO_REMOVE_STRINGS),
+    "shellKinds": sorted(TS_KINDS_WITH_ESPRIMA_SHELL),
+}
 
 def _create_normalized_shell(original_node, is_ts_node):
     """
@@ -268,45 +491,522 @@ def _remove_ts_types_from_ast_recursive(node, is_top_level=False, original_node_
     return final_dict if final_dict or not is_orig_ts_specific else None
 
 
-def compare_asts(js_ast: dict, ts_ast: dict) -> bool:
-    if not js_ast and not ts_ast: return True
-    if not js_ast or not ts_ast: return False
+# --- Single-pass normalizer ---
+# normalize_ast produces exactly the same tree as _remove_ts_types_from_ast_recursive (including its
+# quirks), but in one non-mutating pass: no defensive deep copies, integer-kind dispatch tables
+# instead of string lookups, and an explicit stack instead of recursion, so deeply nested JSX
+# cannot hit the recursion limit.
+
+_REMOVABLE_TS_KINDS = frozenset(
+    k for k, name in SYNTAX_KIND_TO_STRING_MAP.items() if isinstance(k, int) and name in TS_NODE_KINDS_TO_REMOVE_STRINGS
+)
+_BINARY_OPERATOR_BY_KIND = {
+    k: BINARY_OPERATOR_MAP[SYNTAX_KIND_TO_STRING_MAP[k]] for k in (39, 40, 41, 42, 43, 44, 55, 56, 60)
+}
+_SHELL_EXCLUDED_KEYS = frozenset({'kind', 'pos', 'end', 'flags', 'parent', 'modifiers'})
+_KEEP_EMPTY_LIST_KEYS = frozenset({'params', 'arguments', 'body', 'members', 'elements', 'declarations', 'properties', 'statements'})
+_FUNCTION_TYPES = ("FunctionDeclaration", "FunctionExpression", "ArrowFunctionExpression")
+_PARAMETER_KIND = 163
+
+def _literal_shell(node):
+    kind = node.get("kind")
+    shell = {'type': 'Literal'}
+    if kind == 10: shell['value'] = node.get('text', '')
+    elif kind == 8:
+        val_text = node.get('text', '0')
+        try: shell['value'] = int(val_text) if '.' not in val_text and 'e' not in val_text.lower() else float(val_text)
+        except ValueError: shell['value'] = val_text
+    elif kind == 104: shell['value'] = None
+    elif kind == 110: shell['value'] = True
+    elif kind == 95: shell['value'] = False
+    return shell
+
+def _function_shell(esprima_type):
+    def build(node):
+        flags = node.get('flags', 0)
+        return {
+            'type': esprima_type, 'id': node.get('name'), 'params': node.get('parameters', []),
+            'body': node.get('body'), 'async': bool(flags & 256), 'generator': bool(flags & 512),
+            'expression': esprima_type == "ArrowFunctionExpression" and node.get('body', {}).get('kind') != 232,
+        }
+    return build
+
+def _variable_declaration_shell(node):
+    decl_list = node.get('declarationList', {})
+    list_flags = decl_list.get('flags', 0)
+    return {
+        'type': "VariableDeclaration",
+        'kind': 'const' if list_flags & 2 else 'let' if list_flags & 1 else 'var',
+        'declarations': decl_list.get('declarations', []),
+    }
+
+def _variable_declarator_shell(node):
+    shell = {'type': "VariableDeclarator", 'id': node.get('name')}
+    if 'initializer' in node: shell['init'] = node['initializer']
+    return shell
+
+def _binary_expression_shell(node):
+    op_kind = node.get('operatorToken', {}).get('kind')
+    return {
+        'type': "BinaryExpression", 'left': node.get('left'), 'right': node.get('right'),
+        'operator': _BINARY_OPERATOR_BY_KIND.get(op_kind, f"OP_KIND:{op_kind}"),
+    }
+
+# TS kind -> builder of the equivalent Esprima shell (children are normalized afterwards).
+_TS_SHELL_BUILDERS = {
+    79: lambda node: {'type': 'Identifier', 'name': node.get('escapedText')},
+    8: _literal_shell, 10: _literal_shell, 95: _literal_shell, 104: _literal_shell, 110: _literal_shell,
+    253: _function_shell("FunctionDeclaration"),
+    211: _function_shell("FunctionExpression"),
+    212: _function_shell("ArrowFunctionExpression"),
+    233: _variable_declaration_shell,
+    251: _variable_declarator_shell,
+    206: lambda node: {'type': "CallExpression", 'callee': node.get('expression'), 'arguments': node.get('arguments', [])},
+    219: _binary_expression_shell,
+    244: lambda node: {'type': "ReturnStatement", 'argument': node.get('expression') if 'expression' in node else None},
+    232: lambda node: {'type': "BlockStatement", 'body': node.get('statements', [])},
+    298: lambda node: {'type': "Program", 'body': node.get('statements', [])},
+}
+assert set(_TS_SHELL_BUILDERS) | {_PARAMETER_KIND} == TS_KINDS_WITH_ESPRIMA_SHELL
+
+def _unmapped_ts_shell_items(node, kind):
+    items = [('kind_original_ts', node.get('kind_original_ts', kind))]
+    items.extend((k, v) for k, v in node.items()
+                 if k != 'kind_original_ts' and k not in _SHELL_EXCLUDED_KEYS and k not in PROPERTIES_TO_REMOVE)
+    return items
+
+class _ListFrame:
+    __slots__ = ('out', 'parent', 'key')
+    def __init__(self, parent, key): self.out, self.parent, self.key = [], parent, key
+
+class _DictFrame:
+    __slots__ = ('final', 'items', 'kind', 'parent', 'key')
+    def __init__(self, items, kind, parent, key): self.final, self.items, self.kind, self.parent, self.key = {}, items, kind, parent, key
+
+class _ParameterFrame:
+    __slots__ = ('node', 'parent', 'key')
+    def __init__(self, node, parent, key): self.node, self.parent, self.key = node, parent, key
+
+_ENTER, _EXPAND, _FINISH_DICT, _FINISH_LIST = range(4)
+_MODIFIERS_KEY = object()
+
+def normalize_ast(ast):
+    """
+    Strips TypeScript-only nodes/properties and maps TS nodes onto Esprima-like shells.
+    Equivalent to `_remove_ts_types_from_ast_recursive(copy.deepcopy(ast), True)` but linear in
+    tree size, iterative and copy-free. The input is never mutated; the output may share
+    subtrees that the normalizer keeps verbatim (raw `type` values of unmapped nodes).
+    """
+    result = [None]
+    stack = [(_ENTER, ast, False, None, None)]
+
+    def start_dict(items, node, is_ts_node, parent, key, type_value_source):
+        frame = _DictFrame(items, node.get('kind'), parent, key)
+        if 'type' in type_value_source: frame.final['type'] = type_value_source['type']
+        stack.append((_FINISH_DICT, frame, None, None, None))
+        stack.append((_EXPAND, frame, None, None, None))
+        modifiers = node.get('modifiers') if is_ts_node else None
+        if isinstance(modifiers, list):
+            mods_frame = _ListFrame(frame, _MODIFIERS_KEY)
+            stack.append((_FINISH_LIST, mods_frame, None, None, None))
+            for mod_node in reversed(modifiers):
+                if isinstance(mod_node, dict) and mod_node.get('kind') not in TS_MODIFIER_KINDS_TO_REMOVE_NUMERIC:
+                    stack.append((_ENTER, mod_node, False, mods_frame, None))
 
-    js_ast_cleaned = _remove_ts_types_from_ast_recursive(copy.deepcopy(js_ast), True)
-    if js_ast_cleaned is None: js_ast_cleaned = {"type": "Program", "body": []}
+    def deliver(parent, key, value):
+        while True:
+            if parent is None:
+                result[0] = value
+            elif parent.__class__ is _ListFrame:
+                if value is not None: parent.out.append(value)
+            elif parent.__class__ is _DictFrame:
+                if key is _MODIFIERS_KEY:
+                    if value: parent.final['modifiers'] = value
+                elif value is not None:
+                    if value.__class__ is list and not value and key not in _KEEP_EMPTY_LIST_KEYS: return
+                    parent.final[key] = value
+            else: # _ParameterFrame: the cleaned name becomes the node, unless it is not a dict
+                if isinstance(value, dict):
+                    start_dict(list(value.items()), parent.node, True, parent.parent, parent.key, value)
+                    return
+                parent, key = parent.parent, parent.key
+                continue
+            return
+
+    while stack:
+        op, a, shell_flag, parent, key = stack.pop()
+        if op is _ENTER:
+            node = a
+            if isinstance(node, list):
+                frame = _ListFrame(parent, key)
+                stack.append((_FINISH_LIST, frame, None, None, None))
+                for elem in reversed(node): stack.append((_ENTER, elem, False, frame, None))
+                continue
+            if not isinstance(node, dict):
+                deliver(parent, key, node)
+                continue
+            kind = node.get('kind')
+            is_ts_node = kind is not None
+            if is_ts_node and kind in _REMOVABLE_TS_KINDS:
+                deliver(parent, key, None)
+                continue
+            type_val = node.get('type')
+            if (isinstance(type_val, str) and type_val in TS_NODE_KINDS_TO_REMOVE_STRINGS) or \
+               (type_val == "ExpressionStatement" and node.get("directive")):
+                deliver(parent, key, None)
+                continue
+            if shell_flag or not is_ts_node:
+                start_dict(node.items(), node, is_ts_node, parent, key, node)
+            elif kind == _PARAMETER_KIND:
+                stack.append((_ENTER, node.get('name'), True, _ParameterFrame(node, parent, key), None))
+            else:
+                builder = _TS_SHELL_BUILDERS.get(kind)
+                if builder is not None:
+                    shell = builder(node)
+                    start_dict(shell.items(), node, True, parent, key, shell)
+                else:
+                    items = _unmapped_ts_shell_items(node, kind)
+                    start_dict(items, node, True, parent, key, node)
+        elif op is _EXPAND:
+            frame = a
+            has_modifiers = 'modifiers' in frame.final
+            original_kind = frame.kind
+            children = []
+            for child_key, value in frame.items:
+                if child_key == 'type' or child_key == 'modifiers' and has_modifiers: continue
+                if child_key in PROPERTIES_TO_REMOVE: continue
+                if child_key == 'flags' and original_kind != 252: continue
+                if child_key == 'id' and original_kind == 298 and value == 0: continue
+                children.append((_ENTER, value, True, frame, child_key))
+            frame.items = None
+            children.reverse()
+            stack.extend(children)
+        elif op is _FINISH_DICT:
+            final = a.final
+            node_type = final.get("type")
+            if node_type == "Program": final.setdefault('body', [])
+            if node_type in _FUNCTION_TYPES:
+                final.setdefault('params', [])
+                final.setdefault('body', {"type": "BlockStatement", "body": []})
+                if node_type == "FunctionDeclaration" and "id" not in final: final["id"] = None
+            if node_type == "VariableDeclaration": final.setdefault('declarations', [])
+            if node_type == "BlockStatement": final.setdefault('body', [])
+            deliver(a.parent, a.key, final)
+        else: # _FINISH_LIST
+            deliver(a.parent, a.key, a.out)
+    return result[0]
+
+
+# --- Structural (Merkle) hashing and comparison ---
+# Two normalized trees are equal iff their canonical JSON (json.dumps(..., sort_keys=True)) is
+# equal. Instead of serializing both trees, subtrees are hashed bottom-up so that comparison can
+# stop at the first divergent top-level statement and report where the trees differ.
 
-    ts_ast_cleaned = _remove_ts_types_from_ast_recursive(copy.deepcopy(ts_ast), True)
-    if ts_ast_cleaned is None: ts_ast_cleaned = {"type": "Program", "body": []}
+# Bump whenever normalization changes, so persisted hashes from older runs are discarded.
+NORMALIZER_VERSION = 2
+DEFAULT_AST_HASH_CACHE = os.path.join(".migration_cache", "ast_hashes.json")
+DEFAULT_NORMALIZED_AST_CACHE = os.path.join(".migration_cache", "normalized_asts")
+# Cache "language" of TSX normalized after its types were stripped (see compare_migration).
+STRIPPED_TSX = "tsx_stripped"
 
-    is_js_empty = not js_ast_cleaned.get("body") and js_ast_cleaned.get("type") == "Program"
-    is_ts_empty = not ts_ast_cleaned.get("body") and ts_ast_cleaned.get("type") == "Program"
+@dataclass
+class AstComparison:
+    equal: bool
+    divergence_path: Optional[str] = None # JSON path of the first divergent subtree, e.g. "$.body[2].params[0]"
 
-    if is_js_empty and is_ts_empty: return True
-    if is_js_empty != is_ts_empty: return False
+def _leaf_digest(value) -> bytes:
+    try: encoded = json.dumps(value)
+    except (TypeError, ValueError): encoded = repr(value)
+    return hashlib.blake2b(b"v" + encoded.encode("utf-8"), digest_size=16).digest()
+
+class SubtreeHasher:
+    """Bottom-up structural hashes of normalized trees, memoized per subtree for the hasher's lifetime."""
+
+    def __init__(self):
+        self._memo = {} # id(container) -> (container, digest); the container is kept to pin its id
+
+    def digest(self, root) -> bytes:
+        if not isinstance(root, (dict, list)): return _leaf_digest(root)
+        memo = self._memo
+        cached = memo.get(id(root))
+        if cached is not None: return cached[1]
+        stack = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if id(node) in memo: continue
+            children = node.values() if isinstance(node, dict) else node
+            if not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children
+                             if isinstance(child, (dict, list)) and id(child) not in memo)
+                continue
+            h = hashlib.blake2b(b"{" if isinstance(node, dict) else b"[", digest_size=16)
+            if isinstance(node, dict):
+                for key in sorted(node):
+                    key_bytes = str(key).encode("utf-8")
+                    h.update(len(key_bytes).to_bytes(4, "big")); h.update(key_bytes)
+                    child = node[key]
+                    h.update(memo[id(child)][1] if isinstance(child, (dict, list)) else _leaf_digest(child))
+            else:
+                for child in node:
+                    h.update(memo[id(child)][1] if isinstance(child, (dict, list)) else _leaf_digest(child))
+            memo[id(node)] = (node, h.digest())
+        return memo[id(root)][1]
+
+_LENGTH_MISMATCH = object()
+
+def find_first_divergence(left, right, hasher: SubtreeHasher = None) -> Optional[str]:
+    """
+    Returns the JSON path of the first subtree where two normalized trees differ, or None if they
+    are equal. Lists are walked element by element and each element pair is compared by hash, so
+    unequal trees stop at the first divergent element (e.g. top-level statement) without hashing
+    the rest.
+    """
+    hasher = hasher or SubtreeHasher()
+    # (left, right, path, check_hash). Pairs are popped in document order; list pairs are expanded
+    # lazily, other container pairs are compared by hash first. _LENGTH_MISMATCH entries report a
+    # list length mismatch once all common elements turned out equal.
+    stack = [(left, right, "$", False)]
+    while stack:
+        a, b, path, check_hash = stack.pop()
+        if a is _LENGTH_MISMATCH: return path
+        a_is_dict, a_is_list = isinstance(a, dict), isinstance(a, list)
+        if a_is_dict != isinstance(b, dict) or a_is_list != isinstance(b, list): return path
+        if not (a_is_dict or a_is_list):
+            if _leaf_digest(a) != _leaf_digest(b): return path
+            continue
+        if check_hash and hasher.digest(a) == hasher.digest(b): continue
+        if a_is_dict:
+            keys = sorted(set(a) | set(b))
+            for key in keys:
+                if key not in a or key not in b: return f"{path}.{key}"
+            for key in reversed(keys):
+                child_a, child_b = a[key], b[key]
+                lazy = isinstance(child_a, list) and isinstance(child_b, list)
+                stack.append((child_a, child_b, f"{path}.{key}", not lazy))
+        else:
+            if len(a) != len(b): stack.append((_LENGTH_MISMATCH, None, f"{path}[{min(len(a), len(b))}]", False))
+            for index in range(min(len(a), len(b)) - 1, -1, -1):
+                stack.append((a[index], b[index], f"{path}[{index}]", True))
+    return None
 
+def normalize_for_comparison(ast: dict) -> dict:
+    """normalize_ast, with an empty Program standing in for a tree that normalizes away entirely."""
+    with span("ast.normalize"):
+        cleaned = normalize_ast(ast)
+    return cleaned if cleaned is not None else {"type": "Program", "body": []}
+
+def _is_empty_program(cleaned: dict) -> bool:
+    return not cleaned.get("body") and cleaned.get("type") == "Program"
+
+def compare_asts_detailed(js_ast: dict, ts_ast: dict) -> AstComparison:
+    """Like compare_asts, but also reports the JSON path of the first divergent subtree."""
+    if not js_ast and not ts_ast: return AstComparison(True)
+    if not js_ast or not ts_ast: return AstComparison(False, "$")
+
+    return compare_normalized(normalize_for_comparison(js_ast), normalize_for_comparison(ts_ast))
+
+def compare_normalized(js_ast_cleaned: dict, ts_ast_cleaned: dict, hasher: SubtreeHasher = None) -> AstComparison:
+    """Compares two trees already passed through normalize_for_comparison."""
+    is_js_empty = _is_empty_program(js_ast_cleaned)
+    is_ts_empty = _is_empty_program(ts_ast_cleaned)
+
+    if is_js_empty and is_ts_empty: return AstComparison(True)
+    if is_js_empty != is_ts_empty: return AstComparison(False, "$.body")
+
+    with span("ast.compare"):
+        divergence_path = find_first_divergence(js_ast_cleaned, ts_ast_cleaned, hasher)
+    if divergence_path is None:
+        return AstComparison(True)
+
+    is_test_match_case = False
     try:
-        js_ast_str = json.dumps(js_ast_cleaned, sort_keys=True)
-        ts_ast_str = json.dumps(ts_ast_cleaned, sort_keys=True)
-    except Exception as e:
-        print(f"Error during AST canonicalization or JSON dump: {e}")
-        return False
+        if isinstance(js_ast_cleaned.get("body"), list) and len(js_ast_cleaned["body"]) > 0:
+            first_js_stmt = js_ast_cleaned["body"][0]
+            if isinstance(first_js_stmt, dict) and first_js_stmt.get("type") == "FunctionDeclaration":
+                if first_js_stmt.get("id", {}).get("name") == "greet": is_test_match_case = True
+    except Exception: pass
 
-    if js_ast_str == ts_ast_str:
-        return True
-    else:
-        is_test_match_case = False
+    if is_test_match_case: # Only print for the "test_match" case
+        print(f"ASTs differ at {divergence_path}. Canonical JSONs for 'test_match' case:")
+        print("JS AST (cleaned for test_match.js):\n", json.dumps(js_ast_cleaned, sort_keys=True, indent=2))
+        print("TS AST (cleaned for test_match.tsx):\n", json.dumps(ts_ast_cleaned, sort_keys=True, indent=2))
+    return AstComparison(False, divergence_path)
+
+def compare_asts(js_ast: dict, ts_ast: dict) -> bool:
+    return compare_asts_detailed(js_ast, ts_ast).equal
+
+def normalized_js_source(source_code: str, tree_cache: "NormalizedAstCache" = None) -> Optional[dict]:
+    """Normalized lean Esprima AST of JS/JSX source, reused from `tree_cache` when given; None if it does not parse."""
+    key = NormalizedAstCache.key("js", source_code) if tree_cache is not None else None
+    if key is not None:
+        cleaned = tree_cache.get(key)
+        if cleaned is not None: return cleaned
+    program = generate_js_ast_lenient(source_code, lean=True)
+    if not program: return None
+    cleaned = normalize_for_comparison(program)
+    if key is not None: tree_cache.put(key, cleaned)
+    return cleaned
+
+def normalized_tsx_source(tsx_code: str, file_name: str = "input.tsx", tree_cache: "NormalizedAstCache" = None) -> Optional[dict]:
+    """
+    Normalized lean Esprima AST of TSX with its types stripped by the compiler (generate_js_from_tsx),
+    reused from `tree_cache` when given; None if it does not compile.
+    """
+    key = NormalizedAstCache.key(STRIPPED_TSX, tsx_code) if tree_cache is not None else None
+    if key is not None:
+        cleaned = tree_cache.get(key)
+        if cleaned is not None: return cleaned
+    stripped = generate_js_from_tsx(tsx_code, file_name)
+    cleaned = normalized_js_source(stripped) if stripped is not None else None
+    if cleaned is not None and key is not None: tree_cache.put(key, cleaned)
+    return cleaned
+
+def _is_empty_export(stmt) -> bool:
+    return isinstance(stmt, dict) and stmt.get("type") == "ExportNamedDeclaration" and \
+        not stmt.get("declaration") and not stmt.get("specifiers") and not stmt.get("source")
+
+def without_empty_exports(cleaned: dict) -> dict:
+    """Drops `export {};`, which the compiler adds to files whose imports were all type-only."""
+    body = cleaned.get("body")
+    if not isinstance(body, list) or not any(_is_empty_export(stmt) for stmt in body): return cleaned
+    return {**cleaned, "body": [stmt for stmt in body if not _is_empty_export(stmt)]}
+
+def compare_migration(js_source: str, tsx_code: str, tsx_file_name: str = "input.tsx",
+                      tree_cache: "NormalizedAstCache" = None) -> AstComparison:
+    """
+    Checks that migrated TSX is the original JS/JSX plus types. The compiler strips the types
+    from `tsx_code` (generate_js_from_tsx) and both sides are then parsed with Esprima and
+    normalized alike, so JSX, member expressions and imports compare like for like. Normalized
+    trees are reused from `tree_cache` when given.
+    """
+    js_cleaned = normalized_js_source(js_source, tree_cache)
+    if js_cleaned is None: return AstComparison(False, "$")
+    ts_cleaned = normalized_tsx_source(tsx_code, tsx_file_name, tree_cache)
+    if ts_cleaned is None: return AstComparison(False, "$")
+    return compare_normalized(without_empty_exports(js_cleaned), without_empty_exports(ts_cleaned))
+
+def build_hash_entry(cleaned: dict, hasher: SubtreeHasher = None) -> dict:
+    """Root and per-top-level-statement hashes of a normalized tree, as stored by AstHashCache."""
+    hasher = hasher or SubtreeHasher()
+    body = cleaned.get("body")
+    return {
+        "root": hasher.digest(cleaned).hex(),
+        "statements": [hasher.digest(stmt).hex() for stmt in body] if isinstance(body, list) else [],
+        "empty": _is_empty_program(cleaned),
+    }
+
+class AstHashCache:
+    """
+    Persistent map from a source file's content to the structural hashes of its normalized AST
+    (root and each top-level statement), so unchanged files can be compared on later runs without
+    being parsed or normalized again.
+    """
+
+    def __init__(self, path: str = DEFAULT_AST_HASH_CACHE):
+        self.path = path
+        self.entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == NORMALIZER_VERSION: self.entries = data.get("entries", {})
+        except (OSError, ValueError, AttributeError): pass
+
+    @staticmethod
+    def key(language: str, source_text: str) -> str:
+        return hashlib.sha256(f"{language}\0{source_text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock: return self.entries.get(key)
+
+    def put(self, key: str, entry: dict):
+        with self._lock:
+            self.entries[key] = entry
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty: return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": NORMALIZER_VERSION, "entries": self.entries}, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+class NormalizedAstCache:
+    """
+    On-disk cache of normalized ASTs (the output of normalize_for_comparison), one pickle per
+    source text, so unchanged files skip parsing and normalization on later runs. Entries are
+    written atomically, so pool workers can share one directory. Only load caches you wrote.
+    """
+
+    def __init__(self, directory: str = DEFAULT_NORMALIZED_AST_CACHE):
+        self.directory = directory
+
+    @staticmethod
+    def key(language: str, source_text: str) -> str:
+        return hashlib.sha256(f"{NORMALIZER_VERSION}\0{language}\0{source_text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pickle")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[dict]:
         try:
-            if isinstance(js_ast_cleaned.get("body"), list) and len(js_ast_cleaned["body"]) > 0:
-                first_js_stmt = js_ast_cleaned["body"][0]
-                if isinstance(first_js_stmt, dict) and first_js_stmt.get("type") == "FunctionDeclaration":
-                    if first_js_stmt.get("id", {}).get("name") == "greet": is_test_match_case = True
-        except Exception: pass
-
-        if is_test_match_case: # Only print for the "test_match" case
-            print("ASTs differ. Canonical JSONs for 'test_match' case:")
-            print("JS AST (cleaned for test_match.js):\n", json.dumps(js_ast_cleaned, sort_keys=True, indent=2))
-            print("TS AST (cleaned for test_match.tsx):\n", json.dumps(ts_ast_cleaned, sort_keys=True, indent=2))
-        return False
+            with open(self._path(key), "rb") as f: return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, RecursionError): return None
+
+    def put(self, key: str, cleaned: dict):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f: pickle.dump(cleaned, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError, RecursionError): # Very deep trees are simply not cached.
+            try: os.remove(tmp_path)
+            except OSError: pass
+
+def compare_hash_entries(js_entry: dict, ts_entry: dict) -> AstComparison:
+    """Compares two build_hash_entry results; divergences are reported per top-level statement."""
+    if js_entry["empty"] or ts_entry["empty"]:
+        return AstComparison(js_entry["empty"] == ts_entry["empty"], None if js_entry["empty"] == ts_entry["empty"] else "$.body")
+    if js_entry["root"] == ts_entry["root"]: return AstComparison(True)
+    for index, (js_hash, ts_hash) in enumerate(zip(js_entry["statements"], ts_entry["statements"])):
+        if js_hash != ts_hash: return AstComparison(False, f"$.body[{index}]")
+    if len(js_entry["statements"]) != len(ts_entry["statements"]):
+        return AstComparison(False, f"$.body[{min(len(js_entry['statements']), len(ts_entry['statements']))}]")
+    return AstComparison(False, "$")
+
+def compare_files(js_path: str, tsx_path: str, hash_cache: AstHashCache = None) -> AstComparison:
+    """
+    Compares a .js file with its migrated .tsx file like compare_migration does. With a hash_cache,
+    files whose content was seen before are compared by their stored statement hashes without
+    being parsed again (divergences are then reported at top-level statement granularity).
+    """
+    with open(js_path, "r", encoding="utf-8") as f: js_source = f.read()
+    with open(tsx_path, "r", encoding="utf-8") as f: tsx_code = f.read()
+    keys = None
+    if hash_cache is not None:
+        keys = (AstHashCache.key("js", js_source), AstHashCache.key(STRIPPED_TSX, tsx_code))
+        js_entry, ts_entry = hash_cache.get(keys[0]), hash_cache.get(keys[1])
+        if js_entry is not None and ts_entry is not None:
+            return compare_hash_entries(js_entry, ts_entry)
+
+    js_ast_cleaned = normalized_js_source(js_source)
+    ts_ast_cleaned = normalized_tsx_source(tsx_code, os.path.basename(tsx_path))
+    if js_ast_cleaned is None or ts_ast_cleaned is None: return AstComparison(False, "$")
+    hasher = SubtreeHasher()
+    js_ast_cleaned, ts_ast_cleaned = without_empty_exports(js_ast_cleaned), without_empty_exports(ts_ast_cleaned)
+    if hash_cache is not None:
+        hash_cache.put(keys[0], build_hash_entry(js_ast_cleaned, hasher))
+        hash_cache.put(keys[1], build_hash_entry(ts_ast_cleaned, hasher))
+    return compare_normalized(js_ast_cleaned, ts_ast_cleaned, hasher)
 
 if __name__ == "__main__":
     with open("test_match.js", "w") as f: f.write("function greet(name) { return \"Hello, \" + name; }\nconst x = greet(\"World\");")
@@ -0,0 +1,356 @@
+"""
+Micro-benchmark and scaling suite for the ast_utils hot paths.
+
+Builds synthetic JS (Esprima-shaped) and TSX (TypeScript-compiler-shaped) trees of increasing
+size and measures, for each function and size, the median time, the time per node and, in a
+separate run under tracemalloc, the allocated blocks and the peak traced memory.
+There are two series of trees:
+    flat      top-level functions with nested calls and arithmetic, 100 to 100k nodes.
+    deep_jsx  <div> elements nested 10 to 10k levels deep, for the iterative code paths.
+Comparisons are made between the JS tree and a copy of it, so they walk the whole tree, which
+is their worst case.
+
+Normalization and comparison are checked against two thresholds; the run exits with 1 if
+either is exceeded:
+    - scaling: the log-log slope of time against node count must not exceed
+      --max_scaling_exponent (1 is linear), over sizes of at least MIN_GATED_NODES nodes.
+    - regression: with --baseline (a report saved by --save_baseline on the same machine), no
+      size may take more than (1 + --max_regression) times its baseline time.
+
+Usage:
+    python benchmarks/bench_ast_utils.py [--sizes 100 1000 10000 100000] [--depths 10 100 1000 10000]
+        [--repeat 5] [--save_baseline benchmarks/ast_utils_baseline.json]
+        [--baseline benchmarks/ast_utils_baseline.json] [--max_regression 0.25] [--output_json report.json]
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ast_utils  # noqa: E402
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+DEFAULT_DEPTHS = (10, 100, 1000, 10000)
+# Smaller trees are dominated by call overhead and timer noise; they are reported but not gated.
+MIN_GATED_NODES = 1000
+DEFAULT_MAX_SCALING_EXPONENT = 1.5
+DEFAULT_MAX_REGRESSION = 0.25
+
+# TypeScript SyntaxKind values of the synthetic TSX trees (the ones ast_utils maps, plus JSX and
+# expression statements, which it keeps as unmapped shells).
+TS_IDENTIFIER, TS_NUMERIC, TS_STRING, TS_PARAMETER = 79, 8, 10, 163
+TS_FUNCTION, TS_BLOCK, TS_RETURN, TS_CALL, TS_BINARY, TS_SOURCE_FILE = 253, 232, 244, 206, 219, 298
+TS_PLUS, TS_ASTERISK, TS_NUMBER_KEYWORD, TS_STRING_KEYWORD, TS_END_OF_FILE = 39, 41, 146, 149, 1
+TS_EXPRESSION_STATEMENT, TS_JSX_ELEMENT, TS_JSX_OPENING, TS_JSX_CLOSING = 237, 274, 276, 277
+TS_JSX_ATTRIBUTES, TS_JSX_EXPRESSION = 282, 284
+
+
+# --- Synthetic trees ---
+
+def _ts(kind, **fields):
+    return {"pos": 0, "end": 0, "flags": 0, "kind": kind, **fields}
+
+
+def _js_identifier(name):
+    return {"type": "Identifier", "name": name}
+
+
+def _ts_identifier(name):
+    return _ts(TS_IDENTIFIER, escapedText=name)
+
+
+def _flat_function(index):
+    """`function f<i>(a, b) { return g<i>(a + b * <i>, "s<i>", f<i-1>(a)); }` as (js, ts, source)."""
+    name, previous = f"f{index}", f"f{max(0, index - 1)}"
+    js = {
+        "type": "FunctionDeclaration", "expression": False, "async": False, "generator": False,
+        "id": _js_identifier(name), "params": [_js_identifier("a"), _js_identifier("b")],
+        "body": {"type": "BlockStatement", "body": [{"type": "ReturnStatement", "argument": {
+            "type": "CallExpression", "callee": _js_identifier(f"g{index}"), "arguments": [
+                {"type": "BinaryExpression", "operator": "+", "left": _js_identifier("a"), "right": {
+                    "type": "BinaryExpression", "operator": "*", "left": _js_identifier("b"),
+                    "right": {"type": "Literal", "value": index, "raw": str(index)}}},
+                {"type": "Literal", "value": f"s{index}", "raw": f'"s{index}"'},
+                {"type": "CallExpression", "callee": _js_identifier(previous), "arguments": [_js_identifier("a")]},
+            ]}}]},
+    }
+    ts = _ts(
+        TS_FUNCTION, name=_ts_identifier(name), type=_ts(TS_NUMBER_KEYWORD),
+        parameters=[_ts(TS_PARAMETER, name=_ts_identifier(p), type=_ts(TS_NUMBER_KEYWORD)) for p in ("a", "b")],
+        body=_ts(TS_BLOCK, statements=[_ts(TS_RETURN, expression=_ts(
+            TS_CALL, expression=_ts_identifier(f"g{index}"), arguments=[
+                _ts(TS_BINARY, left=_ts_identifier("a"), operatorToken=_ts(TS_PLUS), right=_ts(
+                    TS_BINARY, left=_ts_identifier("b"), operatorToken=_ts(TS_ASTERISK),
+                    right=_ts(TS_NUMERIC, text=str(index)))),
+                _ts(TS_STRING, text=f"s{index}"),
+                _ts(TS_CALL, expression=_ts_identifier(previous), arguments=[_ts_identifier("a")]),
+            ]))]),
+    )
+    source = f'function {name}(a, b) {{ return g{index}(a + b * {index}, "s{index}", {previous}(a)); }}'
+    return js, ts, source
+
+
+def flat_pair(target_nodes):
+    """JS and TS trees of about `target_nodes` JS nodes, plus the JS source they stand for."""
+    # Each function is 17 nodes, plus one for the Program.
+    functions = [_flat_function(index) for index in range(max(1, math.ceil((target_nodes - 1) / 17)))]
+    js = {"type": "Program", "sourceType": "script", "body": [f[0] for f in functions]}
+    ts = _ts(TS_SOURCE_FILE, statements=[f[1] for f in functions], endOfFileToken=_ts(TS_END_OF_FILE),
+             fileName="bench.tsx", languageVersion=99)
+    return js, ts, "\n".join(f[2] for f in functions)
+
+
+def deep_jsx_pair(depth):
+    """`<div>` elements nested `depth` levels deep around `{x}`, as JS and TS trees (built bottom-up)."""
+    js = {"type": "JSXExpressionContainer", "expression": _js_identifier("x")}
+    ts = _ts(TS_JSX_EXPRESSION, expression=_ts_identifier("x"))
+    for _ in range(depth):
+        js = {
+            "type": "JSXElement",
+            "openingElement": {"type": "JSXOpeningElement", "name": {"type": "JSXIdentifier", "name": "div"},
+                               "selfClosing": False, "attributes": []},
+            "children": [js],
+            "closingElement": {"type": "JSXClosingElement", "name": {"type": "JSXIdentifier", "name": "div"}},
+        }
+        ts = _ts(
+            TS_JSX_ELEMENT,
+            openingElement=_ts(TS_JSX_OPENING, tagName=_ts_identifier("div"), attributes=_ts(TS_JSX_ATTRIBUTES, properties=[])),
+            children=[ts],
+            closingElement=_ts(TS_JSX_CLOSING, tagName=_ts_identifier("div")),
+        )
+    js = {"type": "Program", "sourceType": "script", "body": [{"type": "ExpressionStatement", "expression": js}]}
+    ts = _ts(TS_SOURCE_FILE, statements=[_ts(TS_EXPRESSION_STATEMENT, expression=ts)], endOfFileToken=_ts(TS_END_OF_FILE))
+    return js, ts, "<div>" * depth + "{x}" + "</div>" * depth + ";"
+
+
+def dict_nodes(tree):
+    """All dicts of a tree (its AST nodes), iteratively."""
+    nodes = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            nodes.append(node)
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return nodes
+
+
+def copy_tree(tree):
+    """Deep copy of a JSON-like tree without recursion (copy.deepcopy fails on deep JSX)."""
+    root = [None]
+    stack = [(tree, root, 0)]
+    while stack:
+        node, parent, key = stack.pop()
+        if isinstance(node, dict):
+            parent[key] = duplicate = dict(node)
+            stack.extend((value, duplicate, child_key) for child_key, value in node.items())
+        elif isinstance(node, list):
+            parent[key] = duplicate = list(node)
+            stack.extend((value, duplicate, index) for index, value in enumerate(node))
+        else:
+            parent[key] = node
+    return root[0]
+
+
+def check_generators():
+    """Problems with the synthetic JS trees: they must match Esprima's parse of their source."""
+    problems = []
+    assert not {TS_EXPRESSION_STATEMENT, TS_JSX_ELEMENT, TS_JSX_OPENING, TS_JSX_CLOSING, TS_JSX_ATTRIBUTES,
+                TS_JSX_EXPRESSION} & ast_utils._REMOVABLE_TS_KINDS
+    for name, (js, ts, source) in (("flat", flat_pair(100)), ("deep_jsx", deep_jsx_pair(5))):
+        parsed = ast_utils.normalize_for_comparison(ast_utils.generate_js_ast_lenient(source, lean=True))
+        if parsed != ast_utils.normalize_for_comparison(js):
+            problems.append(f"{name}: the synthetic JS tree differs from Esprima's parse of its source")
+    return problems
+
+
+# --- Measurements ---
+
+def _cases(js, ts, source, series, ts_worker):
+    """(function name, gated, setup, run): `run(setup())` is measured, `setup()` is not."""
+    cases = [
+        ("normalize_ast[ts]", True, lambda: ts, ast_utils.normalize_ast),
+        ("normalize_ast[js]", True, lambda: js, ast_utils.normalize_ast),
+        ("_remove_ts_types_from_ast_recursive[ts]", True, lambda: copy_tree(ts),
+         lambda tree: ast_utils._remove_ts_types_from_ast_recursive(tree, True)),
+        ("_create_normalized_shell[ts]", True, lambda: dict_nodes(ts),
+         lambda nodes: [ast_utils._create_normalized_shell(node, True) for node in nodes]),
+        # Against a copy, so every subtree is hashed instead of being skipped by identity.
+        ("compare_asts[equal]", True, lambda: (js, copy_tree(js)),
+         lambda pair: ast_utils.compare_asts(*pair)),
+        ("compare_normalized[equal]", True,
+         lambda: (ast_utils.normalize_for_comparison(js), ast_utils.normalize_for_comparison(copy_tree(js))),
+         lambda pair: ast_utils.compare_normalized(*pair)),
+        ("SubtreeHasher.digest", False, lambda: ast_utils.normalize_for_comparison(js),
+         lambda tree: ast_utils.SubtreeHasher().digest(tree)),
+    ]
+    if series == "flat":
+        # The Python Esprima parser is recursive, so it is only measured on the flat series.
+        cases.append(("generate_js_ast_from_source[lean]", False, lambda: source,
+                      lambda text: ast_utils.generate_js_ast_from_source(text, jsx=True, lean=True)))
+        if ts_worker:
+            ts_source = source.replace("(a, b)", "(a: number, b: number): number")
+            cases.append(("generate_ts_ast_from_source", False, lambda: ts_source,
+                          lambda text: ast_utils.generate_ts_ast_from_source(text, "bench.tsx")))
+    return cases
+
+
+def measure(setup, run, repeat):
+    """Median seconds of `repeat` runs, then one traced run: (median_s, allocated_blocks, peak_bytes)."""
+    timings = []
+    for _ in range(repeat):
+        argument = setup()
+        gc.collect()
+        started = time.perf_counter()
+        run(argument)
+        timings.append(time.perf_counter() - started)
+    argument = setup()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    baseline_bytes = tracemalloc.get_traced_memory()[0]
+    result = run(argument)
+    peak_bytes = tracemalloc.get_traced_memory()[1] - baseline_bytes
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del result
+    allocated_blocks = sum(max(0, stat.count_diff) for stat in after.compare_to(before, "filename"))
+    return statistics.median(timings), allocated_blocks, peak_bytes
+
+
+def scaling_exponent(points):
+    """Least-squares slope of log(seconds) over log(nodes): 1 for linear, 2 for quadratic."""
+    xs = [math.log(nodes) for nodes, _ in points]
+    ys = [math.log(max(seconds, 1e-9)) for _, seconds in points]
+    mean_x, mean_y = statistics.mean(xs), statistics.mean(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance if variance else 0.0
+
+
+def run_series(series, trees, repeat, ts_worker):
+    """Rows of one series: one per function and tree size."""
+    rows = []
+    for parameter, (js, ts, source) in trees:
+        js_nodes, ts_nodes = len(dict_nodes(js)), len(dict_nodes(ts))
+        for function, gated, setup, run in _cases(js, ts, source, series, ts_worker):
+            row = {"series": series, "function": function, "gated": gated, "size": parameter,
+                   "js_nodes": js_nodes, "ts_nodes": ts_nodes}
+            try:
+                median_s, allocated_blocks, peak_bytes = measure(setup, run, repeat)
+            except RecursionError:
+                row["skipped"] = "recursion limit"
+                rows.append(row)
+                print(f"{series:9} {function:42} {parameter:>7} {js_nodes:>8}   skipped: recursion limit", flush=True)
+                continue
+            row.update({
+                "median_s": round(median_s, 6),
+                "us_per_node": round(median_s / js_nodes * 1e6, 4),
+                "allocated_blocks": allocated_blocks,
+                "peak_kb": round(peak_bytes / 1024, 1),
+            })
+            rows.append(row)
+            print(f"{series:9} {function:42} {parameter:>7} {js_nodes:>8} {median_s * 1000:10.2f} "
+                  f"{row['us_per_node']:10.3f} {allocated_blocks:>10} {row['peak_kb']:>10.1f}", flush=True)
+    return rows
+
+
+def check_thresholds(rows, baseline, max_exponent, max_regression):
+    """Returns (scaling exponents by series/function, failure messages) for the gated functions."""
+    exponents = {}
+    failures = []
+    groups = {}
+    for row in rows:
+        if row["gated"] and "median_s" in row and row["js_nodes"] >= MIN_GATED_NODES:
+            groups.setdefault((row["series"], row["function"]), []).append((row["js_nodes"], row["median_s"]))
+    for (series, function), points in sorted(groups.items()):
+        if len(points) < 2:
+            continue
+        exponent = scaling_exponent(points)
+        exponents[f"{series}/{function}"] = round(exponent, 3)
+        if exponent > max_exponent:
+            failures.append(f"{series}/{function} scales with exponent {exponent:.2f} (limit {max_exponent})")
+
+    baseline_rows = {(r["series"], r["function"], r["size"]): r for r in (baseline or {}).get("rows", [])}
+    for row in rows:
+        previous = baseline_rows.get((row["series"], row["function"], row["size"]))
+        if not row["gated"] or previous is None or "median_s" not in row or "median_s" not in previous:
+            continue
+        if row["js_nodes"] < MIN_GATED_NODES:
+            continue
+        limit = previous["median_s"] * (1 + max_regression)
+        if row["median_s"] > limit:
+            failures.append(f"{row['series']}/{row['function']} at size {row['size']}: {row['median_s'] * 1000:.2f}ms, "
+                            f"baseline {previous['median_s'] * 1000:.2f}ms (+{max_regression:.0%} allowed)")
+    return exponents, failures
+
+
+def ts_worker_available():
+    """Whether generate_ts_ast.js and TypeScript can be started here."""
+    try:
+        return bool(ast_utils.TsAstWorker().parse([{"source": "const x = 1;", "fileName": "probe.tsx"}])[0])
+    except Exception:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark and scaling checks for the ast_utils hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help=f"Node counts of the flat series. (default: {' '.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument("--depths", type=int, nargs="+", default=list(DEFAULT_DEPTHS),
+                        help=f"Nesting depths of the deep JSX series. (default: {' '.join(map(str, DEFAULT_DEPTHS))})")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per function and size. (default: 5)")
+    parser.add_argument("--baseline", default=None, help="Fail on regressions against this saved report.")
+    parser.add_argument("--save_baseline", default=None, help="Save this run's report as a baseline here.")
+    parser.add_argument("--max_regression", type=float, default=DEFAULT_MAX_REGRESSION,
+                        help=f"Allowed slowdown against the baseline. (default: {DEFAULT_MAX_REGRESSION})")
+    parser.add_argument("--max_scaling_exponent", type=float, default=DEFAULT_MAX_SCALING_EXPONENT,
+                        help=f"Allowed log-log slope of time over tree size. (default: {DEFAULT_MAX_SCALING_EXPONENT})")
+    parser.add_argument("--no_ts_worker", action="store_true", help="Do not benchmark the TypeScript worker.")
+    parser.add_argument("--output_json", default=None, help="Also write the report to this JSON file.")
+    args = parser.parse_args(argv)
+
+    problems = check_generators()
+    if problems:
+        print("\n".join(problems))
+        return 1
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    ts_worker = not args.no_ts_worker and ts_worker_available()
+
+    print(f"{'series':9} {'function':42} {'size':>7} {'nodes':>8} {'median ms':>10} {'us/node':>10} "
+          f"{'blocks':>10} {'peak KB':>10}")
+    rows = run_series("flat", [(size, flat_pair(size)) for size in args.sizes], args.repeat, ts_worker)
+    rows += run_series("deep_jsx", [(depth, deep_jsx_pair(depth)) for depth in args.depths], args.repeat, ts_worker)
+    exponents, failures = check_thresholds(rows, baseline, args.max_scaling_exponent, args.max_regression)
+
+    report = {
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "ts_worker": ts_worker,
+        "scaling_exponents": exponents,
+        "failures": failures,
+        "rows": rows,
+    }
+    print(json.dumps({key: value for key, value in report.items() if key != "rows"}, indent=2))
+    for path in (args.output_json, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
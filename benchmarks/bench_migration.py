@@ -0,0 +1,127 @@
+"""
+Offline end-to-end throughput benchmark of run_migration.py.
+
+Generates a synthetic corpus (generate_corpus.py), starts the fake chat completions server
+(fake_openai_server.py) in a subprocess, runs run_migration.main() against it and reports
+files/sec, p50/p95/p99 per-file latency and peak RSS. No API key or network access is needed.
+Arguments after `--` are passed to run_migration.py unchanged.
+
+Usage:
+    python benchmarks/bench_migration.py [--num_files 200] [--handlers 10] [--latency_ms 800]
+        [--jitter_ms 400] [--rate_limit_fraction 0.05] [--output_json baseline.json]
+        -- --concurrency 16 --requests_per_minute 3000
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import run_migration  # noqa: E402
+from generate_corpus import generate_corpus  # noqa: E402
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def start_fake_server(args):
+    command = [
+        sys.executable, os.path.join(BENCH_DIR, "fake_openai_server.py"), "--port", "0",
+        "--latency_ms", str(args.latency_ms), "--jitter_ms", str(args.jitter_ms),
+        "--rate_limit_fraction", str(args.rate_limit_fraction), "--retry_after", str(args.retry_after),
+        "--response_scale", str(args.response_scale),
+    ]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    base_url = server.stdout.readline().strip().rsplit(" ", 1)[-1]
+    if not base_url.startswith("http"):
+        server.kill()
+        raise RuntimeError("Fake server did not start.")
+    return server, base_url
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    migration_args = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, migration_args = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of run_migration.py.")
+    parser.add_argument("--num_files", type=int, default=200, help="Components in the corpus. (default: 200)")
+    parser.add_argument("--handlers", type=int, default=10, help="Average handlers per component. (default: 10)")
+    parser.add_argument("--input_dir", default=None, help="Use this corpus instead of generating one.")
+    parser.add_argument("--latency_ms", type=float, default=800.0, help="Fake server mean latency. (default: 800)")
+    parser.add_argument("--jitter_ms", type=float, default=400.0, help="Fake server latency jitter. (default: 400)")
+    parser.add_argument("--rate_limit_fraction", type=float, default=0.0,
+                        help="Fraction of requests the fake server rejects with a 429. (default: 0)")
+    parser.add_argument("--retry_after", type=float, default=1.0, help="Retry-After of injected 429s. (default: 1)")
+    parser.add_argument("--response_scale", type=float, default=1.0,
+                        help="Fake response size relative to the input. (default: 1.0)")
+    parser.add_argument("--output_json", default=None, help="Also write the report to this JSON file.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench_migration_") as workdir:
+        input_dir = args.input_dir or os.path.join(workdir, "extracted")
+        if not args.input_dir:
+            generate_corpus(input_dir, args.num_files, args.handlers)
+        output_dir = os.path.join(workdir, "migrated")
+
+        server, base_url = start_fake_server(args)
+        os.environ["OPENAI_API_KEY"] = "fake-benchmark-key"
+        os.environ["OPENAI_BASE_URL"] = base_url
+        try:
+            started = time.perf_counter()
+            results = run_migration.main(
+                ["--input_dir", input_dir, "--output_dir", output_dir, "--no_cache", "--force"] + migration_args
+            ) or []
+            wall_time = time.perf_counter() - started
+        finally:
+            server.send_signal(signal.SIGINT)
+            server.wait(timeout=10)
+
+    latencies = [result.elapsed for result in results if result.success]
+    report = {
+        "files": len(results),
+        "succeeded": len(latencies),
+        "wall_time_s": round(wall_time, 3),
+        "files_per_second": round(len(latencies) / wall_time, 3) if wall_time > 0 else 0.0,
+        "latency_p50_s": round(percentile(latencies, 0.50), 3) if latencies else None,
+        "latency_p95_s": round(percentile(latencies, 0.95), 3) if latencies else None,
+        "latency_p99_s": round(percentile(latencies, 0.99), 3) if latencies else None,
+        "latency_mean_s": round(statistics.mean(latencies), 3) if latencies else None,
+        "rate_limited_retries": run_migration.rate_limiter.rate_limited_count,
+        "rate_limited_failures": run_migration.rate_limiter.rate_limited_failures,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "fake_server": {
+            "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+            "rate_limit_fraction": args.rate_limit_fraction, "response_scale": args.response_scale,
+        },
+        "run_migration_args": migration_args,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if len(latencies) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
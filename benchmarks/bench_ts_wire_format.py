@@ -0,0 +1,86 @@
+"""
+Compares the full and pruned TypeScript AST wire formats of the generate_ts_ast.js worker.
+
+For every .tsx file in --input_dir (optionally scaled up by repeating its source to mimic large
+container components) it reports the bytes sent through the pipe and the parse + decode time of
+both formats, and checks that both normalize to the same tree.
+
+Usage:
+    python benchmarks/bench_ts_wire_format.py [--input_dir migrated] [--scale 20] [--repeat 5]
+"""
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ast_utils  # noqa: E402
+
+
+def measure(worker, source, file_name, prune_spec, repeat):
+    """Returns (bytes_on_wire, median_seconds, ast) for one source in one wire format."""
+    timings = []
+    ast = {}
+    for _ in range(repeat):
+        before = worker.bytes_received
+        started = time.perf_counter()
+        ast = worker.parse([{"source": source, "fileName": file_name}], prune_spec)[0]
+        timings.append(time.perf_counter() - started)
+        wire_bytes = worker.bytes_received - before
+    return wire_bytes, statistics.median(timings), ast
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the full vs pruned TS AST wire format.")
+    parser.add_argument("--input_dir", default="migrated", help="Directory of .tsx files. (default: 'migrated')")
+    parser.add_argument("--scale", type=int, default=1, help="Repeat each source this many times. (default: 1)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per file and format. (default: 5)")
+    args = parser.parse_args(argv)
+
+    files = sorted(f for f in os.listdir(args.input_dir) if f.endswith(".tsx"))
+    if not files:
+        print(f"No .tsx files found in '{args.input_dir}'.")
+        return 1
+
+    worker = ast_utils.TsAstWorker()
+    worker.parse([{"source": "", "fileName": "warmup.tsx"}])  # Exclude Node/TypeScript startup.
+
+    totals = {"full_bytes": 0, "pruned_bytes": 0, "full_s": 0.0, "pruned_s": 0.0}
+    mismatches = 0
+    print(f"{'file':40} {'full KB':>10} {'pruned KB':>10} {'full ms':>9} {'pruned ms':>10} {'same':>5}")
+    for name in files:
+        with open(os.path.join(args.input_dir, name), "r", encoding="utf-8") as f:
+            source = "\n".join([f.read()] * args.scale)
+        full_bytes, full_s, full_ast = measure(worker, source, name, None, args.repeat)
+        pruned_bytes, pruned_s, pruned_ast = measure(worker, source, name, ast_utils.TS_WIRE_PRUNE_SPEC, args.repeat)
+        same = ast_utils._remove_ts_types_from_ast_recursive(copy.deepcopy(full_ast), True) == \
+            ast_utils._remove_ts_types_from_ast_recursive(copy.deepcopy(pruned_ast), True)
+        mismatches += not same
+        totals["full_bytes"] += full_bytes
+        totals["pruned_bytes"] += pruned_bytes
+        totals["full_s"] += full_s
+        totals["pruned_s"] += pruned_s
+        print(f"{name[:40]:40} {full_bytes / 1024:10.1f} {pruned_bytes / 1024:10.1f} "
+              f"{full_s * 1000:9.2f} {pruned_s * 1000:10.2f} {'yes' if same else 'NO':>5}")
+    worker.close()
+
+    byte_ratio = totals["full_bytes"] / max(1, totals["pruned_bytes"])
+    time_ratio = totals["full_s"] / max(1e-9, totals["pruned_s"])
+    print(json.dumps({
+        "files": len(files),
+        "scale": args.scale,
+        "full_bytes": totals["full_bytes"],
+        "pruned_bytes": totals["pruned_bytes"],
+        "bytes_reduction": round(byte_ratio, 2),
+        "parse_speedup": round(time_ratio, 2),
+        "normalized_mismatches": mismatches,
+    }, indent=2))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint, for offline benchmarks.
+
+It answers POST /v1/chat/completions by echoing the JavaScript of the prompt back inside a
+```tsx fence (so the migrated output parses and verifies), after a configurable latency. It can
+inject 429s with a Retry-After header, inflate responses, and serve `stream=true` requests as
+server-sent events. Point run_migration.py at it with:
+
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python run_migration.py ...
+
+Usage:
+    python benchmarks/fake_openai_server.py [--port 8765] [--latency_ms 800] [--jitter_ms 400]
+        [--rate_limit_fraction 0.05] [--retry_after 1] [--response_scale 1.0]
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+# Markers after which the prompt templates of run_migration.py put the code.
+CODE_MARKERS = ("Code to convert:\n", "\n\n")
+STREAM_CHUNK_CHARS = 16
+
+
+def extract_code(prompt):
+    for marker in CODE_MARKERS:
+        if marker in prompt:
+            return prompt.split(marker, 1)[1]
+    return prompt
+
+
+class FakeCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set by make_server().
+    options = None
+    stats = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        options = self.options
+        with self.stats["lock"]:
+            self.stats["requests"] += 1
+
+        if random.random() < options.rate_limit_fraction:
+            with self.stats["lock"]:
+                self.stats["rate_limited"] += 1
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (fake server).", "type": "requests",
+                           "code": "rate_limit_exceeded"}},
+                {"retry-after": str(options.retry_after)},
+            )
+            return
+
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+        code = extract_code(prompt)
+        padding = int(len(code) * (options.response_scale - 1.0))
+        if padding > 0:
+            code += "\n" + "\n".join(["// padding"] * (padding // 11 + 1))
+        content = f"```tsx\n{code}\n```"
+        usage = {
+            "prompt_tokens": len(prompt) // CHARS_PER_TOKEN + 1,
+            "completion_tokens": len(content) // CHARS_PER_TOKEN + 1,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        delay = max(0.0, options.latency_ms + random.uniform(-options.jitter_ms, options.jitter_ms)) / 1000.0
+        if request.get("stream"):
+            self._stream(request, content, usage, delay)
+            return
+        time.sleep(delay)
+        self._send_json(200, {
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        })
+
+    def _stream(self, request, content, usage, delay):
+        """Sends the first chunk after half the latency and spreads the rest over the other half."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+        time.sleep(delay / 2)
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model", "fake")}
+        try:
+            for piece in pieces:
+                event = dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                self.wfile.write(b"data: " + json.dumps(event).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+                time.sleep(delay / 2 / max(1, len(pieces)))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                event = dict(base, choices=[], usage=usage)
+                self.wfile.write(b"data: " + json.dumps(event).encode("utf-8") + b"\n\n")
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client cut the stream off.
+
+
+def make_server(options, host="127.0.0.1"):
+    """Returns a ThreadingHTTPServer for `options` (argparse namespace of this module's flags)."""
+    handler = type("Handler", (FakeCompletionsHandler,), {
+        "options": options,
+        "stats": {"requests": 0, "rate_limited": 0, "lock": threading.Lock()},
+    })
+    server = ThreadingHTTPServer((host, options.port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server for benchmarks.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on; 0 picks a free one. (default: 8765)")
+    parser.add_argument("--latency_ms", type=float, default=800.0, help="Mean response latency. (default: 800)")
+    parser.add_argument("--jitter_ms", type=float, default=400.0, help="Uniform latency jitter. (default: 400)")
+    parser.add_argument("--rate_limit_fraction", type=float, default=0.0,
+                        help="Fraction of requests answered with a 429. (default: 0)")
+    parser.add_argument("--retry_after", type=float, default=1.0, help="Retry-After of injected 429s. (default: 1)")
+    parser.add_argument("--response_scale", type=float, default=1.0,
+                        help="Response size relative to the echoed code, padded with comments. (default: 1.0)")
+    return parser
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    server = make_server(options)
+    # The benchmark runner reads this line to learn the port.
+    print(f"Listening on http://127.0.0.1:{server.server_address[1]}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = server.RequestHandlerClass.stats
+        print(f"Served {stats['requests']} request(s), {stats['rate_limited']} rate limited.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
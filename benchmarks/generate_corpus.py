@@ -0,0 +1,104 @@
+"""
+Writes a synthetic corpus of React function components, shaped like the output of
+extractComponents.js, for the offline migration benchmarks.
+
+Each component has a few state hooks, `--handlers` event handlers, an effect that fetches data
+and a JSX return, so its size grows roughly linearly with --handlers.
+
+Usage:
+    python benchmarks/generate_corpus.py --output_dir /tmp/corpus [--num_files 200] [--handlers 10]
+"""
+import argparse
+import os
+import random
+
+COMPONENT_TEMPLATE = """function {name}({{ initialItems, title }}) {{
+  const [items, setItems] = useState(initialItems || []);
+  const [loading, setLoading] = useState(false);
+  const [filter, setFilter] = useState('');
+
+{handlers}
+
+  useEffect(() => {{
+    setLoading(true);
+    fetch('/api/{endpoint}')
+      .then(res => res.json())
+      .then(data => {{
+        setItems(data);
+        setLoading(false);
+      }})
+      .catch(err => {{
+        console.error('Failed to load {endpoint}:', err);
+        setLoading(false);
+      }});
+  }}, []);
+
+  const visibleItems = items.filter(item => item.name.toLowerCase().includes(filter.toLowerCase()));
+
+  return (
+    <div className="{css}">
+      <h1>{{title}}</h1>
+      <input value={{filter}} onChange={{handleFilterChange0}} placeholder="Filter..." />
+      {{loading ? <p>Loading...</p> : (
+        <ul>
+          {{visibleItems.map(item => <li key={{item.id}}>{{item.name}}</li>)}}
+        </ul>
+      )}}
+    </div>
+  );
+}}
+"""
+
+HANDLER_TEMPLATE = """  const handleFilterChange{index} = (event) => {{
+    const value = event.target.value.trim();
+    if (value.length > {limit}) {{
+      setFilter(value.slice(0, {limit}));
+    }} else {{
+      setFilter(value);
+    }}
+  }};"""
+
+
+def generate_component(index, handlers, rng):
+    name = f"Component{index:05d}"
+    return COMPONENT_TEMPLATE.format(
+        name=name,
+        endpoint=f"items/{index}",
+        css=name.lower(),
+        handlers="\n\n".join(
+            HANDLER_TEMPLATE.format(index=i, limit=rng.randint(8, 64)) for i in range(max(1, handlers))
+        ),
+    )
+
+
+def generate_corpus(output_dir, num_files, handlers, size_jitter=0.5, seed=0):
+    """Writes `num_files` components to `output_dir`; returns their paths."""
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for index in range(num_files):
+        spread = int(handlers * size_jitter)
+        path = os.path.join(output_dir, f"Component{index:05d}.js")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_component(index, handlers + rng.randint(-spread, spread), rng))
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic React component corpus.")
+    parser.add_argument("--output_dir", required=True, help="Directory to write the .js components to.")
+    parser.add_argument("--num_files", type=int, default=200, help="Number of components. (default: 200)")
+    parser.add_argument("--handlers", type=int, default=10, help="Average event handlers per component. (default: 10)")
+    parser.add_argument("--size_jitter", type=float, default=0.5,
+                        help="Relative spread of component sizes around --handlers. (default: 0.5)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed. (default: 0)")
+    args = parser.parse_args(argv)
+
+    paths = generate_corpus(args.output_dir, args.num_files, args.handlers, args.size_jitter, args.seed)
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    print(f"Wrote {len(paths)} components ({total_bytes / 1024:.1f} KB) to '{args.output_dir}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import re
+import textwrap
+from dataclasses import dataclass, field
+from typing import List
+
+try:
+    import tiktoken  # type: ignore
+except ImportError:  # Optional: fall back to a character-based estimate.
+    tiktoken = None
+
+import ast_utils
+
+CHARS_PER_TOKEN = 4
+# Context windows of the models we migrate with; prompts are sized against these.
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+# A chunk's code never gets less than this many tokens, however long the context header is.
+MIN_CHUNK_TOKENS = 256
+# Longest declaration line quoted in the type context header.
+MAX_CONTEXT_LINE_CHARS = 200
+
+FRAGMENT_MARKER = "// @@FRAGMENT_{id}@@"
+_FRAGMENT_MARKER_RE = re.compile(r"^([ \t]*)// @@FRAGMENT_(\d+)@@[ \t]*$", re.MULTILINE)
+
+_FUNCTION_TYPES = ("FunctionDeclaration", "FunctionExpression", "ArrowFunctionExpression")
+_CLASS_TYPES = ("ClassDeclaration", "ClassExpression")
+
+_encodings = {}
+
+
+class ChunkingError(Exception):
+    """A component could not be split into chunks, or the converted chunks could not be stitched."""
+
+
+def count_tokens(text, model="gpt-4"):
+    """Counts prompt tokens with tiktoken when it is installed, otherwise estimates them."""
+    if tiktoken is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+    return len(_encodings[model].encode(text, disallowed_special=()))
+
+
+def default_max_prompt_tokens(model):
+    """Largest prompt that leaves room in the context window for a completion of similar size."""
+    return MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS) * 2 // 5
+
+
+@dataclass
+class Chunk:
+    """
+    A piece of source converted by one request. `code` may contain fragment markers standing
+    for the `fragments` split out of it; `scope` lists the signatures of the enclosing code.
+    """
+    code: str
+    scope: List[str] = field(default_factory=list)
+    fragments: dict = field(default_factory=dict)
+
+
+@dataclass
+class ChunkPlan:
+    """
+    `root` is the file with every top-level group replaced by a marker; it is not converted.
+    `program` is the Esprima AST the plan was made from.
+    """
+    root: Chunk
+    context: str
+    program: dict
+
+    def chunks(self):
+        """Every chunk to convert, in source order."""
+        pending = list(self.root.fragments.values())
+        ordered = []
+        while pending:
+            chunk = pending.pop(0)
+            ordered.append(chunk)
+            pending[0:0] = chunk.fragments.values()
+        return ordered
+
+
+def _signature(source, node):
+    text = source[node["range"][0]:node["range"][1]]
+    line = text.split("\n", 1)[0].rstrip()
+    if len(line) > MAX_CONTEXT_LINE_CHARS:
+        line = line[:MAX_CONTEXT_LINE_CHARS] + " ..."
+    return line
+
+
+def inner_statements(node):
+    """Child nodes an oversized statement can be split into: function body statements or class members."""
+    node_type = node.get("type")
+    if node_type in _FUNCTION_TYPES:
+        body = node.get("body") or {}
+        return body.get("body") if body.get("type") == "BlockStatement" else None
+    if node_type in _CLASS_TYPES:
+        return (node.get("body") or {}).get("body")
+    if node_type in ("ExportNamedDeclaration", "ExportDefaultDeclaration"):
+        return inner_statements(node.get("declaration") or {})
+    if node_type == "VariableDeclaration":
+        declarations = node.get("declarations") or []
+        return inner_statements(declarations[0].get("init") or {}) if len(declarations) == 1 else None
+    if node_type == "MethodDefinition":
+        return inner_statements(node.get("value") or {})
+    if node_type in ("ExpressionStatement", "ReturnStatement"):
+        return inner_statements(node.get("expression") or node.get("argument") or {})
+    if node_type == "CallExpression":
+        # e.g. useEffect(() => { ... }, []) or a wrapped component: split the largest callback.
+        callbacks = [arg for arg in node.get("arguments") or [] if arg.get("type") in _FUNCTION_TYPES]
+        if callbacks:
+            return inner_statements(max(callbacks, key=lambda arg: arg["range"][1] - arg["range"][0]))
+    return None
+
+
+class _Splitter:
+    def __init__(self, source, max_tokens, count):
+        self.source = source
+        self.max_tokens = max_tokens
+        self.count = count
+        self.next_id = 0
+
+    def marker(self):
+        self.next_id += 1
+        return self.next_id, FRAGMENT_MARKER.format(id=self.next_id)
+
+    def line_start(self, node):
+        """Start of the node's line if only indentation precedes it there, else the node's start."""
+        start = node["range"][0]
+        line_start = self.source.rfind("\n", 0, start) + 1
+        return line_start if not self.source[line_start:start].strip() else start
+
+    def line_end(self, node):
+        """End of the node's line if only whitespace or a line comment follows it there, else the node's end."""
+        end = node["range"][1]
+        line_end = self.source.find("\n", end)
+        line_end = len(self.source) if line_end < 0 else line_end
+        rest = self.source[end:line_end].strip()
+        return line_end if not rest or rest.startswith("//") else end
+
+    def split(self, start, end, children, scope):
+        """
+        Returns a Chunk for source[start:end] in which consecutive `children` are grouped into
+        fragments of at most max_tokens, each replaced by a marker line. The whitespace and
+        comments between groups stay in the returned chunk.
+        """
+        source = self.source
+        starts = [self.line_start(child) for child in children]
+        ends = [self.line_end(child) for child in children]
+        chunk = Chunk(code="", scope=scope)
+        parts = [source[start:starts[0]]]
+        first = 0
+        for last in range(len(children)):
+            if last + 1 < len(children) and self.count(source[starts[first]:ends[last + 1]]) <= self.max_tokens:
+                continue  # The next child still fits in this group.
+            fragment_id, marker = self.marker()
+            chunk.fragments[fragment_id] = self.fragment(children[first:last + 1], starts[first], ends[last], scope)
+            between = source[ends[last]:starts[last + 1] if last + 1 < len(children) else end]
+            if between and not between.startswith("\n"):
+                between = "\n" + between  # The marker must stay alone on its line.
+            parts.append(source[starts[first]:children[first]["range"][0]] + marker + between)
+            first = last + 1
+        chunk.code = "".join(parts)
+        return chunk
+
+    def fragment(self, group, start, end, scope):
+        # Fragments are sent dedented; stitch_chunks indents them back to their marker.
+        text = self.source[start:end]
+        if len(group) > 1 or self.count(text) <= self.max_tokens:
+            return Chunk(code=textwrap.dedent(text), scope=scope)
+        node = group[0]
+        inner = inner_statements(node)
+        if not inner:
+            raise ChunkingError(
+                f"Statement at line {node['loc']['start']['line']} is too large to convert and has no "
+                f"function body or class members to split at."
+            )
+        chunk = self.split(start, end, inner, scope + [_signature(self.source, node)])
+        chunk.code = textwrap.dedent(chunk.code)
+        return chunk
+
+
+def parse_component(source):
+    """Esprima AST of an extracted component (JSX enabled, script or module), or {} if it does not parse."""
+    return ast_utils.generate_js_ast_lenient(source)
+
+
+def plan_chunks(source, max_tokens, count=count_tokens):
+    """
+    Splits a component that is too large for one request at top-level statement boundaries and,
+    for statements that are still too large, at inner function/method boundaries. Returns a
+    ChunkPlan whose `context` header (imports and the first line of every top-level declaration)
+    is sent with every chunk.
+    """
+    program = parse_component(source)
+    if not program:
+        raise ChunkingError("Could not parse the component to split it.")
+    body = program.get("body") or []
+    if not body:
+        raise ChunkingError("Component has no statements to split.")
+    context = "\n".join(
+        source[node["range"][0]:node["range"][1]] if node["type"] == "ImportDeclaration" else _signature(source, node)
+        for node in body
+    )
+    code_budget = max(MIN_CHUNK_TOKENS, max_tokens - count(context))
+    root = _Splitter(source, code_budget, count).split(0, len(source), body, [])
+    return ChunkPlan(root=root, context=context, program=program)
+
+
+def stitch_chunks(chunk, converted):
+    """
+    Rebuilds the file from the converted code of each chunk (`converted` maps id(chunk) -> code),
+    substituting fragment markers recursively and re-indenting fragments to their marker's
+    indentation. The root chunk itself is used unconverted.
+    """
+    def expand(code, fragments):
+        found = sorted(int(match.group(2)) for match in _FRAGMENT_MARKER_RE.finditer(code))
+        if found != sorted(fragments):
+            raise ChunkingError("A converted chunk lost or duplicated its fragment markers.")
+
+        def substitute(match):
+            fragment = fragments[int(match.group(2))]
+            fragment_code = expand(converted[id(fragment)], fragment.fragments).strip("\n")
+            return textwrap.indent(textwrap.dedent(fragment_code), match.group(1))
+
+        return _FRAGMENT_MARKER_RE.sub(substitute, code)
+
+    return expand(chunk.code, chunk.fragments)
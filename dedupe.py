@@ -0,0 +1,457 @@
+"""
+Near-duplicate detection: copy-pasted components that differ only in identifier names, string
+literals or formatting are migrated once, and the result is reused for the copies.
+
+A component's fingerprint is a hash of its normalized AST (ast_utils.normalize_for_comparison,
+so formatting and comments are already gone) with every locally bound identifier and string
+value replaced by its order of first appearance. `const [name, setName] = useState("")` and
+`const [title, setTitle] = useState("Untitled")` therefore get the same fingerprint. Free
+identifiers (imports, globals), property names and module specifiers stay literal: components
+that call different APIs or read different props may need different types. One
+representative per group of equal fingerprints is migrated. Its .tsx is rewritten for every
+copy by mapping the representative's identifiers and strings onto the copy's, in that same
+order, and the rewritten file is only used if ast_utils.compare_migration finds it identical
+to the copy.
+"""
+import ast
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+import ast_utils
+
+# Lowercase JSX names are DOM elements and attributes. They decide the TypeScript types (e.g.
+# HTMLDivElement), so components that differ in them are not treated as copies.
+_RENAMED_TYPES = ("Identifier", "JSXIdentifier")
+_STRING_VALUE_TYPES = ("Literal", "JSXText")
+
+STATUS_DERIVED = "derived"
+STATUS_FALLBACK = "fallback"
+STATUS_REPRESENTATIVE_FAILED = "representative_failed"
+
+
+@dataclass
+class Fingerprint:
+    digest: str
+    names: list  # Distinct locally bound identifiers, in order of first appearance.
+    strings: list  # Distinct string literals, template chunks and JSX texts, likewise.
+
+
+@dataclass
+class Copy:
+    item: object
+    fingerprint: Fingerprint
+    status: Optional[str] = None
+    divergence_path: Optional[str] = None
+
+
+@dataclass
+class DuplicateGroup:
+    """Items with equal fingerprints: `representative` is migrated, `copies` are derived from it."""
+    representative: object
+    fingerprint: Fingerprint
+    copies: list = field(default_factory=list)
+
+
+def _pattern_names(pattern):
+    """Names bound by a declaration's or parameter's pattern."""
+    stack = [pattern]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        node_type = node.get("type")
+        if node_type == "Identifier":
+            yield node.get("name")
+        elif node_type == "ObjectPattern":
+            stack.extend(prop.get("value") if prop.get("type") == "Property" else prop
+                         for prop in node.get("properties") or [])
+        elif node_type == "ArrayPattern":
+            stack.extend(node.get("elements") or [])
+        elif node_type == "AssignmentPattern":
+            stack.append(node.get("left"))
+        elif node_type == "RestElement":
+            stack.append(node.get("argument"))
+
+
+def _bindings(cleaned):
+    """
+    (names declared in the file, ids of the nodes kept literal). Imports are not local
+    bindings. Non-computed member and property keys, exported names and module specifiers
+    are kept literal wherever they appear.
+    """
+    local, literal = set(), set()
+    stack = [cleaned]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if not isinstance(node, dict):
+            continue
+        node_type = node.get("type")
+        if node_type == "VariableDeclarator":
+            local.update(_pattern_names(node.get("id")))
+        elif node_type in ("FunctionDeclaration", "FunctionExpression", "ArrowFunctionExpression"):
+            local.update(_pattern_names(node.get("id")))
+            for param in node.get("params") or []:
+                local.update(_pattern_names(param))
+        elif node_type in ("ClassDeclaration", "ClassExpression"):
+            local.update(_pattern_names(node.get("id")))
+        elif node_type == "CatchClause":
+            local.update(_pattern_names(node.get("param")))
+        elif node_type in ("MemberExpression", "JSXMemberExpression") and not node.get("computed"):
+            literal.add(id(node.get("property")))
+        elif node_type in ("Property", "MethodDefinition") and not node.get("computed"):
+            literal.add(id(node.get("key")))
+        elif node_type == "ExportSpecifier":
+            literal.add(id(node.get("exported")))
+        elif node_type in ("ImportDeclaration", "ExportNamedDeclaration", "ExportAllDeclaration"):
+            literal.add(id(node.get("source")))
+        elif node_type == "CallExpression":
+            callee = node.get("callee") or {}
+            if callee.get("type") == "Import" or callee.get("type") == "Identifier" and callee.get("name") == "require":
+                literal.update(id(arg) for arg in (node.get("arguments") or [])[:1])
+        stack.extend(value for value in node.values() if isinstance(value, (dict, list)))
+    return local, literal
+
+
+def _canonical(node, names, strings, local, literal):
+    """`node` with its identifier or string value replaced by its index in `names` or `strings`."""
+    if id(node) in literal:
+        return node
+    node_type = node.get("type")
+    if node_type in _RENAMED_TYPES and isinstance(node.get("name"), str):
+        name = node["name"]
+        if name not in local or node_type == "JSXIdentifier" and name[:1].islower():
+            return node
+        return {**node, "name": "\0n%d" % names.setdefault(name, len(names))}
+    if node_type in _STRING_VALUE_TYPES and isinstance(node.get("value"), str):
+        return {**node, "value": "\0s%d" % strings.setdefault(node["value"], len(strings))}
+    if node_type == "TemplateElement" and isinstance(node.get("value"), dict):
+        # Only the cooked text survives normalization; it equals the raw text unless escaped.
+        cooked = node["value"].get("cooked")
+        return {**node, "value": "\0s%d" % strings.setdefault(cooked, len(strings))}
+    return node
+
+
+def fingerprint_tree(cleaned):
+    """Fingerprint of a tree already passed through normalize_for_comparison."""
+    names, strings = {}, {}
+    local, literal = _bindings(cleaned)
+    digest = hashlib.blake2b(digest_size=16)
+    # Pre-order walk with dict keys sorted, so structurally equal trees number their
+    # identifiers and strings identically. Bytes on the stack are structure markers.
+    stack = [cleaned]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, bytes):
+            digest.update(node)
+        elif isinstance(node, dict):
+            node = _canonical(node, names, strings, local, literal)
+            digest.update(b"{")
+            stack.append(b"}")
+            for key in sorted(node, reverse=True):
+                stack.append(node[key])
+                key_bytes = str(key).encode("utf-8")
+                stack.append(b"k" + len(key_bytes).to_bytes(4, "big") + key_bytes)
+        elif isinstance(node, list):
+            digest.update(b"[")
+            stack.append(b"]")
+            stack.extend(reversed(node))
+        else:
+            digest.update(ast_utils._leaf_digest(node))
+    return Fingerprint(digest.hexdigest(), list(names), list(strings))
+
+
+def find_duplicates(sources, tree_cache=None):
+    """
+    Groups (item, source_text) pairs by fingerprint. Returns the DuplicateGroups with at least
+    one copy, in input order; the first item of each group is its representative. Sources that
+    do not parse are never grouped. `sources` may be a generator, so only one text is held at a time.
+    """
+    groups = {}
+    for item, source in sources:
+        cleaned = ast_utils.normalized_js_source(source, tree_cache)
+        if cleaned is None or ast_utils._is_empty_program(cleaned):
+            continue
+        fingerprint = fingerprint_tree(cleaned)
+        group = groups.get(fingerprint.digest)
+        if group is None:
+            groups[fingerprint.digest] = DuplicateGroup(item, fingerprint)
+        else:
+            group.copies.append(Copy(item, fingerprint))
+    return [group for group in groups.values() if group.copies]
+
+
+# --- Rewriting the representative's TSX ---
+
+_NAME_RE = re.compile(r"[A-Za-z_$\u0080-\uffff][\w$\u0080-\uffff]*")
+_JSX_NAME_RE = re.compile(r"[A-Za-z_$][\w$-]*")
+_NUMBER_RE = re.compile(r"\.?\d[\w.]*")
+# Words after which an expression starts, so `/` begins a regex and `<` a JSX element.
+_EXPRESSION_KEYWORDS = frozenset({
+    "return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw", "case", "do", "else",
+    "yield", "await", "default",
+})
+
+
+def _tsx_tokens(code):
+    """
+    Yields (kind, start, end) for the identifiers ("name"), string literals ("string"), JSX
+    attribute strings ("attribute"), template literal chunks ("template") and JSX texts ("text")
+    of TSX source, skipping comments. This is a small scanner, not a parser: `<` starts a JSX
+    element and `/` a regex only where an expression can start. A misread file fails the
+    verification of the rewritten copy, which is then migrated on its own.
+    """
+    length = len(code)
+    i = 0
+    # ["code", open braces] / ["template"] / ["tag", is_closing_tag] / ["children"]
+    modes = [["code", 0]]
+    after_value = False  # The previous code token ends an expression.
+    while i < length:
+        mode = modes[-1]
+        char = code[i]
+        if mode[0] == "template":
+            start = i
+            while i < length and code[i] != "`" and not code.startswith("${", i):
+                i += 2 if code[i] == "\\" else 1
+            i = min(i, length)
+            if i > start:
+                yield "template", start, i
+            if code.startswith("`", i):
+                modes.pop()
+                after_value = True
+                i += 1
+            elif i < length:
+                modes.append(["code", 0])
+                after_value = False
+                i += 2
+            continue
+        if mode[0] == "children":
+            if code.startswith("</", i):
+                modes[-1] = ["tag", True]
+                i += 2
+            elif char == "<":
+                modes.append(["tag", False])
+                i += 1
+            elif char == "{":
+                modes.append(["code", 0])
+                after_value = False
+                i += 1
+            else:
+                start = i
+                while i < length and code[i] not in "<{":
+                    i += 1
+                if code[start:i].strip():
+                    yield "text", start, i
+            continue
+
+        # "code" and "tag" modes
+        if char.isspace():
+            i += 1
+        elif code.startswith("//", i):
+            end = code.find("\n", i)
+            i = length if end < 0 else end
+        elif code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            i = length if end < 0 else end + 2
+        elif char in "'\"":
+            start = i
+            i += 1
+            while i < length and code[i] != char:
+                i += 2 if code[i] == "\\" and mode[0] == "code" else 1
+            i = min(i + 1, length)
+            yield "string" if mode[0] == "code" else "attribute", start, i
+            after_value = True
+        elif char.isdigit() or (char == "." and code[i + 1:i + 2].isdigit()):
+            i = _NUMBER_RE.match(code, i).end()
+            after_value = True
+        elif mode[0] == "tag":
+            match = _JSX_NAME_RE.match(code, i)
+            if match:
+                if "-" not in match.group():
+                    yield "name", i, match.end()
+                i = match.end()
+            elif char == "{":
+                modes.append(["code", 0])
+                after_value = False
+                i += 1
+            elif code.startswith("/>", i) or char == ">" and mode[1]:
+                modes.pop()
+                after_value = True
+                i += 2 if char == "/" else 1
+            elif char == ">":
+                modes[-1] = ["children"]
+                i += 1
+            else:
+                i += 1
+        else:
+            match = _NAME_RE.match(code, i)
+            if match:
+                yield "name", i, match.end()
+                after_value = match.group() not in _EXPRESSION_KEYWORDS
+                i = match.end()
+            elif char == "`":
+                modes.append(["template"])
+                i += 1
+            elif char == "{":
+                mode[1] += 1
+                after_value = False
+                i += 1
+            elif char == "}":
+                if mode[1] == 0 and len(modes) > 1:
+                    modes.pop()  # End of a ${...} or a JSX {...}.
+                else:
+                    mode[1] = max(0, mode[1] - 1)
+                after_value = False
+                i += 1
+            elif char == "<" and not after_value and (code[i + 1:i + 2].isalpha() or code.startswith("<>", i)):
+                modes.append(["tag", False])
+                i += 1
+            elif char == "/" and not after_value:
+                i = _regex_end(code, i)
+                after_value = True
+            else:
+                after_value = char in ")]"
+                i += 1
+
+
+def _regex_end(code, start):
+    """End of the regex literal (with its flags) starting at `start`."""
+    i = start + 1
+    in_class = False
+    while i < len(code) and code[i] != "\n":
+        char = code[i]
+        if char == "\\":
+            i += 1
+        elif char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            break
+        i += 1
+    match = _NAME_RE.match(code, i + 1)
+    return match.end() if match else min(i + 1, len(code))
+
+
+def _is_property_name(code, start):
+    """Whether the name at `start` follows a `.` (a member access, not a `...` spread)."""
+    i = start - 1
+    while i >= 0 and code[i].isspace():
+        i -= 1
+    return i >= 0 and code[i] == "." and (i < 2 or code[i - 2:i] != "..")
+
+
+def _mapping(old, new):
+    return {a: b for a, b in zip(old, new) if a != b}
+
+
+def _string_literal(text, strings):
+    """A rewritten quoted string literal, or None if its value is not mapped."""
+    try:
+        value = ast.literal_eval(text)  # Close enough to JavaScript's escapes for the usual strings.
+    except (ValueError, SyntaxError):
+        value = text[1:-1]
+    if not isinstance(value, str) or value not in strings:
+        return None
+    quote = text[0]
+    escaped = strings[value].replace("\\", "\\\\").replace(quote, "\\" + quote)
+    return quote + escaped.replace("\n", "\\n").replace("\r", "\\r") + quote
+
+
+def _attribute_literal(text, strings):
+    """A rewritten JSX attribute string (JSX has no escapes), or None if its value is not mapped."""
+    value = strings.get(text[1:-1])
+    if value is None:
+        return None
+    quote = "'" if '"' in value else '"'
+    return quote + value + quote
+
+
+def _jsx_text(text, strings, stripped_strings):
+    """A rewritten JSX text. The model may re-indent it, so texts also match without surrounding whitespace."""
+    if text in strings:
+        return strings[text]
+    core = text.strip()
+    if core not in stripped_strings:
+        return None
+    start = text.index(core)
+    return text[:start] + stripped_strings[core] + text[start + len(core):]
+
+
+def rewrite_for_copy(tsx_code, representative, copy):
+    """
+    Rewrites the migrated .tsx of `representative` (a Fingerprint) for `copy`: local identifiers
+    and strings of the representative become the copy's. Identifiers the model introduced that
+    contain a renamed component name (e.g. ButtonProps for Button) are renamed along with it.
+    """
+    names = _mapping(representative.names, copy.names)
+    strings = _mapping(representative.strings, copy.strings)
+    if not names and not strings:
+        return tsx_code
+    known_names = set(representative.names)
+    stripped_strings = {old.strip(): new.strip() for old, new in strings.items() if old.strip()}
+    components = sorted((name for name in names if name[:1].isupper()), key=len, reverse=True)
+    component_re = re.compile("|".join(f"{re.escape(name)}(?![a-z])" for name in components)) if components else None
+
+    parts = []
+    last = 0
+    for kind, start, end in _tsx_tokens(tsx_code):
+        text = tsx_code[start:end]
+        if kind == "name":
+            if _is_property_name(tsx_code, start):
+                replacement = None  # Property names are part of the fingerprint, never renamed.
+            elif text in known_names:
+                replacement = names.get(text)
+            elif component_re is not None:
+                replacement = component_re.sub(lambda match: names[match.group()], text)
+            else:
+                replacement = None
+        elif kind == "string":
+            replacement = _string_literal(text, strings)
+        elif kind == "attribute":
+            replacement = _attribute_literal(text, strings)
+        elif kind == "template":
+            replacement = strings.get(text)
+        else:
+            replacement = _jsx_text(text, strings, stripped_strings)
+        if replacement is not None and replacement != text:
+            parts.append(tsx_code[last:start])
+            parts.append(replacement)
+            last = end
+    parts.append(tsx_code[last:])
+    return "".join(parts)
+
+
+def verify_copy(copy_source, tsx_code, tsx_file_name="input.tsx", tree_cache=None):
+    """ast_utils.compare_migration of a rewritten .tsx against the copy's source."""
+    return ast_utils.compare_migration(copy_source, tsx_code, tsx_file_name, tree_cache)
+
+
+def build_report(groups, files, key=str):
+    """Summary of a deduplicated run over `files` files; `key` names an item in the report."""
+    copies = [copy for group in groups for copy in group.copies]
+    derived = sum(1 for copy in copies if copy.status == STATUS_DERIVED)
+    return {
+        "files": files,
+        "groups": len(groups),
+        "copies": len(copies),
+        "derived": derived,
+        "fallback": sum(1 for copy in copies if copy.status == STATUS_FALLBACK),
+        "representative_failed": sum(1 for copy in copies if copy.status == STATUS_REPRESENTATIVE_FAILED),
+        # Every derived copy is one conversion request that was not sent.
+        "api_calls_saved": derived,
+        "duplicate_groups": [
+            {
+                "representative": key(group.representative),
+                "copies": [
+                    {"file": key(copy.item), "status": copy.status, "divergence_path": copy.divergence_path}
+                    for copy in group.copies
+                ],
+            }
+            for group in sorted(groups, key=lambda group: -len(group.copies))
+        ],
+    }
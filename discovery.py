@@ -0,0 +1,174 @@
+import argparse
+import fnmatch
+import hashlib
+import logging
+import os
+import re
+
+DEFAULT_INCLUDE = ("*.js", "*.jsx")
+DEFAULT_EXCLUDE = ("node_modules/", ".git/")
+# Read in every scanned directory, like .gitignore files are by git.
+IGNORE_FILENAMES = (".gitignore", ".migrationignore")
+# Colliding files already warned about, so repeated scans (pipeline.py polls) warn once.
+_reported_collisions = set()
+
+
+def _translate(pattern):
+    """Regex for the path part of a gitignore pattern (`**` spans directories, `*` and `?` do not)."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            parts.append(fnmatch.translate(pattern[i:end + 1])[4:-3])  # fnmatch's character class
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(parts)
+
+
+class IgnoreRules:
+    """
+    gitignore-style patterns relative to `base` (a directory relative to the scan root):
+    `#` comments, `!` negation, a trailing `/` for directories only, a leading or inner `/` to
+    anchor the pattern at `base`, and `*`, `?`, `[...]` and `**` wildcards. The last matching
+    pattern wins.
+    """
+
+    def __init__(self, patterns, base=""):
+        self.base = base.strip("/")
+        self.rules = []
+        for line in patterns:
+            pattern = line.rstrip("\n").rstrip()
+            if not pattern or pattern.startswith("#"):
+                continue
+            negated = pattern.startswith("!")
+            if negated:
+                pattern = pattern[1:]
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if not pattern:
+                continue
+            anchored = "/" in pattern
+            regex = _translate(pattern.lstrip("/"))
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            self.rules.append((re.compile(regex + r"\Z"), negated, dir_only))
+
+    @classmethod
+    def from_file(cls, path, base=""):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return cls(f.readlines(), base)
+
+    def match(self, rel_path, is_dir):
+        """True if ignored, False if re-included by a `!` pattern, None if no pattern applies."""
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return None
+            rel_path = rel_path[len(self.base) + 1:]
+        result = None
+        for regex, negated, dir_only in self.rules:
+            if (is_dir or not dir_only) and regex.match(rel_path):
+                result = not negated
+        return result
+
+
+def parse_shard(value):
+    """Parses `--shard i/n` (1 <= i <= n) into (i, n)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT such as 3/16, got '{value}'")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and {count}, got {index}")
+    return index, count
+
+
+def shard_of(rel_path, count):
+    """1-based shard of `rel_path`; stable across machines, runs and file system order."""
+    digest = hashlib.sha256(rel_path.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def discover_sources(input_dir, include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE, use_ignore_files=True,
+                     shard=None, skip_dirs=(), recursive=True):
+    """
+    Lazily yields the paths (relative to `input_dir`, with `/` separators) of source files under
+    `input_dir` matching an `include` pattern, in a deterministic order. Files and directories
+    matching an `exclude` pattern or the rules of .gitignore/.migrationignore files are skipped.
+    With `shard` = (i, n) only the files of shard i of n are yielded. Files that would be migrated
+    to the same output (Foo.js and Foo.jsx) are reported, and only the first is yielded. Without
+    `recursive`, only the files directly in `input_dir` are listed. Raises FileNotFoundError if `input_dir` does not exist.
+    """
+    include_rules = IgnoreRules(include)
+    exclude_rules = IgnoreRules(exclude)
+    skip_dirs = {os.path.realpath(path) for path in skip_dirs}
+    # (directory, path relative to input_dir, ignore rules in effect there)
+    stack = [(input_dir, "", [])]
+    while stack:
+        directory, rel_dir, rules = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except (NotADirectoryError, PermissionError) as e:
+            logging.warning(f"Skipping '{directory}': {e}")
+            continue
+        except FileNotFoundError:
+            if not rel_dir:
+                raise
+            continue
+        if use_ignore_files:
+            names = {entry.name for entry in entries}
+            rules = rules + [IgnoreRules.from_file(os.path.join(directory, name), rel_dir)
+                             for name in IGNORE_FILENAMES if name in names]
+        subdirectories = []
+        stems = {}  # Path without extension -> the file yielded for it (see output_path_for).
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if exclude_rules.match(rel_path, is_dir) or _ignored(rules, rel_path, is_dir):
+                continue
+            if is_dir:
+                if recursive and os.path.realpath(entry.path) not in skip_dirs:
+                    subdirectories.append((entry.path, rel_path, rules))
+            elif entry.is_file() and include_rules.match(rel_path, False):
+                stem = os.path.splitext(rel_path)[0]
+                if stem in stems:
+                    # Checked before sharding: the two files may belong to different shards.
+                    collision = (os.path.realpath(entry.path), stems[stem])
+                    if collision not in _reported_collisions:
+                        _reported_collisions.add(collision)
+                        logging.warning(f"Skipping '{rel_path}': it would be migrated to the same output as "
+                                        f"'{stems[stem]}'. Rename one of them.")
+                    continue
+                stems[stem] = rel_path
+                if shard is None or shard_of(rel_path, shard[1]) == shard[0]:
+                    yield rel_path
+        stack.extend(reversed(subdirectories))
+
+
+def _ignored(rules, rel_path, is_dir):
+    """The verdict of the deepest ignore file with a matching pattern."""
+    for ignore_rules in reversed(rules):
+        verdict = ignore_rules.match(rel_path, is_dir)
+        if verdict is not None:
+            return verdict
+    return False
+
+
+def output_path_for(output_dir, rel_path, extension=".tsx"):
+    """Where the migration of `rel_path` goes: the same relative path under `output_dir`."""
+    return os.path.join(output_dir, *(os.path.splitext(rel_path)[0] + extension).split("/"))
@@ -1,19 +1,27 @@
 const fs = require('fs');
 const path = require('path');
 
+// Writes through a temp file and a rename so that a watcher (pipeline.py) never picks up a
+// half-written component.
+const writeFileAtomic = (filePath, code) => {
+  const tmpPath = `${filePath}.${process.pid}.tmp`;
+  fs.writeFileSync(tmpPath, code, 'utf8');
+  fs.renameSync(tmpPath, filePath);
+};
+
 module.exports = function transformer(file, api) {
   const j = api.jscodeshift;
   const root = j(file.source);
 
-  const outputDir = './extracted';
-  if (!fs.existsSync(outputDir)) fs.mkdirSync(outputDir);
+  const outputDir = process.env.EXTRACT_OUTPUT_DIR || './extracted';
+  if (!fs.existsSync(outputDir)) fs.mkdirSync(outputDir, { recursive: true });
 
   const fileName = path.basename(file.path).replace(/\.[jt]sx?$/, '');
 
   root.find(j.FunctionDeclaration).forEach(path => {
     const name = path.value.id?.name || 'Unnamed';
     const code = j(path).toSource();
-    fs.writeFileSync(`${outputDir}/${fileName}_${name}.js`, code, 'utf8');
+    writeFileAtomic(`${outputDir}/${fileName}_${name}.js`, code);
   });
 
   root.find(j.VariableDeclarator)
@@ -24,7 +32,7 @@ module.exports = function transformer(file, api) {
     .forEach(path => {
       const name = path.value.id.name;
       const code = j(path).toSource();
-      fs.writeFileSync(`${outputDir}/${fileName}_${name}.js`, code, 'utf8');
+      writeFileAtomic(`${outputDir}/${fileName}_${name}.js`, code);
     });
 
   return file.source;
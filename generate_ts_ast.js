@@ -1,18 +1,9 @@
 // Using absolute path for require as it was more reliable
-const { factory, createSourceFile, ScriptTarget, ScriptKind, SyntaxKind } = require('/app/node_modules/typescript');
+const ts = require('/app/node_modules/typescript');
+const { factory, createSourceFile, ScriptTarget, ScriptKind, SyntaxKind } = ts;
 
 const fs = require('fs');
-
-const filePath = process.argv[2];
-if (!filePath) {
-  console.error('Usage: node generate_ts_ast.js <file_path>');
-  process.exit(1);
-}
-
-const sourceCode = fs.readFileSync(filePath, 'utf8');
-// Pass undefined for setParentNodes so parent isn't set, reducing circularity issues early
-const sourceFile = createSourceFile(filePath, sourceCode, ScriptTarget.Latest, false, ScriptKind.TSX);
-
+const readline = require('readline');
 
 // Custom replacer function to handle circular references and filter nodes
 const getCircularReplacer = () => {
@@ -54,5 +45,180 @@ const getCircularReplacer = () => {
   };
 };
 
-// Output the raw AST; Python will handle cleaning and normalization.
-console.log(JSON.stringify(sourceFile, getCircularReplacer(), 2));
+// Replacer for the pruned wire format. `spec` comes from ast_utils (the single source of truth):
+//   properties - property names the Python normalizer discards anyway
+//   kinds      - type-only SyntaxKinds the normalizer removes together with their subtree
+//   shellKinds - kinds the normalizer rebuilds as Esprima nodes when they are the root or a list
+//                element; any other node keeps its `type` child verbatim, so that subtree is
+//                emitted untouched.
+// The normalized result is identical to that of the full format.
+const getPruningReplacer = (spec) => {
+  const removeProperties = new Set(spec.properties || []);
+  const removeKinds = new Set(spec.kinds || []);
+  const shellKinds = new Set(spec.shellKinds || []);
+  const baseReplacer = getCircularReplacer();
+  const verbatim = new WeakSet();
+  const rebuilt = new WeakSet();
+  let isRoot = true;
+  const isNode = (value) => value !== null && typeof value === 'object' && !Array.isArray(value);
+  const isRemovable = (value) => isNode(value) && removeKinds.has(value.kind);
+
+  return function (key, value) {
+    const keepVerbatim = verbatim.has(this) ||
+      (key === 'type' && !Array.isArray(this) && !(rebuilt.has(this) && shellKinds.has(this.kind)));
+    if (!keepVerbatim && (removeProperties.has(key) || isRemovable(value))) return;
+    value = baseReplacer.call(this, key, value);
+    if (value === null || typeof value !== 'object') return value;
+    if (keepVerbatim) {
+      verbatim.add(value);
+      return value;
+    }
+    if (isRoot) {
+      isRoot = false;
+      rebuilt.add(value);
+    }
+    if (!Array.isArray(value)) return value;
+    const kept = value.filter((element) => !isRemovable(element));
+    kept.forEach((element) => { if (isNode(element)) rebuilt.add(element); });
+    return kept;
+  };
+};
+
+// Pass undefined for setParentNodes so parent isn't set, reducing circularity issues early
+const parseSource = (filePath, sourceCode) =>
+  createSourceFile(filePath, sourceCode, ScriptTarget.Latest, false, ScriptKind.TSX);
+
+const serializeSourceFile = (sourceFile, space, pruneSpec) =>
+  JSON.stringify(sourceFile, pruneSpec ? getPruningReplacer(pruneSpec) : getCircularReplacer(), space);
+
+// --- Outline (op "outline") ---
+// Top-level statements, and recursively the statements of function bodies, with their source spans
+// (UTF-16 offsets, leading trivia excluded). incremental.py uses it to splice re-converted
+// declarations into an existing .tsx; the categories and names mirror its Esprima outline.
+const isFunctionLike = (node) => node && (ts.isFunctionDeclaration(node) || ts.isFunctionExpression(node) ||
+  ts.isArrowFunction(node));
+
+const statementCategory = (sourceFile, node) => {
+  if (ts.isImportDeclaration(node)) {
+    if (node.importClause && node.importClause.isTypeOnly) return ['type', []];
+    return ['import', [node.moduleSpecifier.text]];
+  }
+  if (ts.isFunctionDeclaration(node)) return ['function', [node.name ? node.name.text : 'default']];
+  if (ts.isClassDeclaration(node)) return ['class', [node.name ? node.name.text : 'default']];
+  if (ts.isVariableStatement(node)) {
+    return ['variable', node.declarationList.declarations.map((declaration) =>
+      ts.isIdentifier(declaration.name) ? declaration.name.text : declaration.name.getText(sourceFile).replace(/\s+/g, ''))];
+  }
+  if (ts.isInterfaceDeclaration(node) || ts.isTypeAliasDeclaration(node)) return ['type', []];
+  if (ts.isExportDeclaration(node)) return [node.isTypeOnly ? 'type' : 'export', []];
+  if (ts.isExportAssignment(node)) return ['export', ['default']];
+  return ['other', []];
+};
+
+// The statements an outline entry descends into (see chunking._inner_statements for the Esprima side).
+const innerStatements = (node) => {
+  if (!node) return undefined;
+  if (isFunctionLike(node)) return node.body && ts.isBlock(node.body) ? node.body.statements : undefined;
+  if (ts.isVariableStatement(node)) {
+    const declarations = node.declarationList.declarations;
+    return declarations.length === 1 ? innerStatements(declarations[0].initializer) : undefined;
+  }
+  if (ts.isExpressionStatement(node)) return innerStatements(node.expression);
+  if (ts.isReturnStatement(node)) return innerStatements(node.expression);
+  if (ts.isCallExpression(node)) {
+    const callbacks = node.arguments.filter(isFunctionLike);
+    if (!callbacks.length) return undefined;
+    return innerStatements(callbacks.reduce((a, b) => (b.end - b.pos > a.end - a.pos ? b : a)));
+  }
+  return undefined;
+};
+
+const outlineStatements = (sourceFile, statements) => statements.map((statement) => {
+  const [category, names] = statementCategory(sourceFile, statement);
+  const entry = { category, names, start: statement.getStart(sourceFile), end: statement.end };
+  const inner = innerStatements(statement);
+  if (inner) entry.body = outlineStatements(sourceFile, inner);
+  return entry;
+});
+
+const outlineSourceFile = (sourceFile) => JSON.stringify(outlineStatements(sourceFile, sourceFile.statements));
+
+// --- Type stripping (op "strip_types") ---
+// The TSX source as plain JSX: the compiler removes annotations, type-only declarations and imports
+// and unwraps `as`/`!`/`satisfies`, keeping the remaining syntax as written. ast_utils parses the
+// result with Esprima, so a migration is checked against its original with one parser and one
+// normalizer. null if the source has syntax errors.
+const STRIP_TYPES_OPTIONS = {
+  target: ScriptTarget.ESNext,
+  module: ts.ModuleKind.ESNext,
+  jsx: ts.JsxEmit.Preserve,
+  verbatimModuleSyntax: true,
+  useDefineForClassFields: true,
+  removeComments: true,
+};
+
+const stripTypes = (filePath, sourceCode) => {
+  const output = ts.transpileModule(sourceCode, {
+    compilerOptions: STRIP_TYPES_OPTIONS, fileName: filePath, reportDiagnostics: true,
+  });
+  return output.diagnostics && output.diagnostics.length ? null : output.outputText;
+};
+
+// Parses one worker request item ({path} or {source, fileName}) and returns its JSON-encoded result.
+const handleItem = (id, index, item, pruneSpec, op) => {
+  const prefix = `{"id":${JSON.stringify(id)},"index":${index}`;
+  try {
+    const filePath = item.path || item.fileName || 'input.tsx';
+    const sourceCode = item.source !== undefined ? item.source : fs.readFileSync(item.path, 'utf8');
+    if (op === 'outline') return `${prefix},"outline":${outlineSourceFile(parseSource(filePath, sourceCode))}}`;
+    if (op === 'strip_types') return `${prefix},"strip_types":${JSON.stringify(stripTypes(filePath, sourceCode))}}`;
+    return `${prefix},"ast":${serializeSourceFile(parseSource(filePath, sourceCode), undefined, pruneSpec)}}`;
+  } catch (err) {
+    return `${prefix},"error":${JSON.stringify(String(err && err.message ? err.message : err))}}`;
+  }
+};
+
+// Worker mode: TypeScript is loaded once and every stdin line is a request
+//   {"id": 1, "items": [{"path": "a.tsx"}, {"source": "...", "fileName": "b.tsx"}], "prune": {...}}
+// answered by one compact stdout line per item, as soon as it is parsed, then a terminator:
+//   {"id": 1, "index": 0, "ast": {...}}
+//   {"id": 1, "index": 1, "error": "..."}
+//   {"id": 1, "done": true}
+// "prune" is optional and selects the pruned wire format (see getPruningReplacer). With
+// "op": "outline" each item is answered with {"outline": [...]} instead (see outlineStatements),
+// with "op": "strip_types" with {"strip_types": "<code>" | null} (see stripTypes).
+const runWorker = () => {
+  const rl = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+  rl.on('line', (line) => {
+    if (!line.trim()) return;
+    let request;
+    try {
+      request = JSON.parse(line);
+    } catch (err) {
+      process.stdout.write(JSON.stringify({ id: null, done: true, error: `Invalid request: ${err.message}` }) + '\n');
+      return;
+    }
+    (request.items || []).forEach((item, index) => {
+      process.stdout.write(handleItem(request.id, index, item, request.prune, request.op) + '\n');
+    });
+    process.stdout.write(`{"id":${JSON.stringify(request.id)},"done":true}\n`);
+  });
+};
+
+if (require.main === module) {
+  const filePath = process.argv[2];
+  if (!filePath) {
+    console.error('Usage: node generate_ts_ast.js <file_path> | --worker');
+    process.exit(1);
+  }
+
+  if (filePath === '--worker') {
+    runWorker();
+  } else {
+    const sourceCode = fs.readFileSync(filePath, 'utf8');
+    // Output the raw AST; Python will handle cleaning and normalization.
+    console.log(serializeSourceFile(parseSource(filePath, sourceCode), 2));
+  }
+}
+
+module.exports = { parseSource, serializeSourceFile, getPruningReplacer, outlineSourceFile, stripTypes };
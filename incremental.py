@@ -0,0 +1,365 @@
+"""
+Diff-aware re-migration: when a component that was already migrated is edited, only the
+declarations that changed are sent to the model and spliced into the existing .tsx.
+
+The previous source (kept by MigrationManifest.save_source) and the edited source are outlined
+with Esprima, and the existing .tsx with the TypeScript worker (ast_utils.generate_ts_outline).
+An outline lists the top-level statements and, recursively, the statements of function bodies.
+Statements are matched by category and declared names. A statement whose normalized AST changed
+is re-converted; if only its body changed, the comparison descends into the body instead, so an
+edited handler inside a large component is re-converted on its own.
+"""
+import textwrap
+from dataclasses import dataclass, field
+from typing import Optional
+
+import ast_utils
+from chunking import MAX_CONTEXT_LINE_CHARS, inner_statements
+from request_packing import FILE_END_MARKER, FILE_START_MARKER
+
+# Above this share of the file changing, a full migration is cheaper than a diff.
+MAX_CHANGED_FRACTION = 0.6
+# TSX statements kept as is: they have no JavaScript counterpart.
+TYPE_CATEGORY = "type"
+PART_NAME = "part-{index}"
+_CLASS_MEMBER_TYPES = ("MethodDefinition", "PropertyDefinition", "ClassProperty")
+
+
+class NotIncrementalError(Exception):
+    """The edit cannot be applied as a diff; the file has to be migrated in full."""
+
+
+@dataclass
+class OutlineItem:
+    category: str
+    names: tuple
+    start: int
+    end: int
+    node: Optional[dict] = None  # Esprima node (JavaScript outlines only)
+    body: Optional[list] = None
+
+    def key(self):
+        return self.category, self.names
+
+
+@dataclass
+class Part:
+    """One changed or added JavaScript statement to convert."""
+    name: str
+    js_code: str
+    indent: str
+    scope: list
+    previous_tsx: Optional[str] = None
+
+
+@dataclass
+class IncrementalPlan:
+    program: dict  # Esprima AST of the edited source, to verify the spliced result against
+    prior_tsx: str
+    context: str
+    parts: list = field(default_factory=list)
+    # (start, end, [part names or literal strings]) replacements of prior_tsx, in any order.
+    edits: list = field(default_factory=list)
+
+
+def _js_category(source, node):
+    node_type = node.get("type")
+    if node_type == "ImportDeclaration":
+        return "import", (node["source"]["value"],)
+    if node_type in ("ExportNamedDeclaration", "ExportDefaultDeclaration"):
+        declaration = node.get("declaration") or {}
+        if declaration.get("type") in ("FunctionDeclaration", "ClassDeclaration", "VariableDeclaration"):
+            return _js_category(source, declaration)
+        return ("export", ("default",)) if node_type == "ExportDefaultDeclaration" else ("export", ())
+    if node_type == "ExportAllDeclaration":
+        return "export", ()
+    if node_type in ("FunctionDeclaration", "ClassDeclaration"):
+        category = "function" if node_type == "FunctionDeclaration" else "class"
+        return category, ((node.get("id") or {}).get("name") or "default",)
+    if node_type == "VariableDeclaration":
+        return "variable", tuple(_js_binding_name(source, declarator["id"]) for declarator in node["declarations"])
+    return "other", ()
+
+
+def _js_binding_name(source, pattern):
+    """Identifier name, or the whitespace-free source text of a destructuring pattern."""
+    if pattern.get("type") == "Identifier":
+        return pattern["name"]
+    start, end = pattern["range"]
+    return "".join(source[start:end].split())
+
+
+def _js_outline(source, statements):
+    items = []
+    for node in statements:
+        category, names = _js_category(source, node)
+        inner = inner_statements(node)
+        if inner is not None and any(child.get("type") in _CLASS_MEMBER_TYPES for child in inner):
+            inner = None  # Class bodies are converted as a whole.
+        item = OutlineItem(category, names, node["range"][0], node["range"][1], node)
+        if inner is not None:
+            item.body = _js_outline(source, inner)
+        items.append(item)
+    return items
+
+
+def js_outline(source):
+    """(Esprima program, outline) of JavaScript source; raises NotIncrementalError if it does not parse."""
+    program = ast_utils.generate_js_ast_lenient(source)
+    if not program:
+        raise NotIncrementalError("the source does not parse")
+    return program, _js_outline(source, program["body"])
+
+
+def ts_outline(source, file_name="input.tsx"):
+    entries = ast_utils.generate_ts_outline(source, file_name)
+    if entries is None:
+        raise NotIncrementalError("the existing .tsx does not parse")
+
+    def build(entries):
+        return [
+            OutlineItem(entry["category"], tuple(entry["names"]), entry["start"], entry["end"],
+                        body=build(entry["body"]) if "body" in entry else None)
+            for entry in entries
+        ]
+    return build(entries)
+
+
+def _keyed(items):
+    """Items keyed by (category, names, n): the n-th item with that category and those names."""
+    seen = {}
+    keyed = []
+    for item in items:
+        n = seen.get(item.key(), 0)
+        seen[item.key()] = n + 1
+        keyed.append((item.key() + (n,), item))
+    return keyed
+
+
+class _Digests:
+    """Structural hashes of normalized Esprima statements, with and without their outlined body."""
+
+    def __init__(self):
+        self.hasher = ast_utils.SubtreeHasher()
+
+    def _digest(self, node):
+        cleaned = ast_utils.normalize_ast(node)
+        return self.hasher.digest(cleaned) if cleaned is not None else b""
+
+    def full(self, item):
+        return self._digest(item.node)
+
+    def header(self, item):
+        """Digest with the outlined body statements left out."""
+        block = _body_block(item.node)
+        statements = block["body"]
+        block["body"] = []
+        try:
+            return self._digest(item.node)
+        finally:
+            block["body"] = statements
+
+
+def _body_block(node):
+    """The BlockStatement whose statements inner_statements returns for `node`."""
+    node_type = node.get("type")
+    if node_type in ("FunctionDeclaration", "FunctionExpression", "ArrowFunctionExpression"):
+        return node["body"]
+    if node_type in ("ExportNamedDeclaration", "ExportDefaultDeclaration"):
+        return _body_block(node["declaration"])
+    if node_type == "VariableDeclaration":
+        return _body_block(node["declarations"][0]["init"])
+    if node_type in ("ExpressionStatement", "ReturnStatement"):
+        return _body_block(node.get("expression") or node.get("argument"))
+    if node_type == "CallExpression":
+        callbacks = [arg for arg in node["arguments"]
+                     if arg.get("type") in ("FunctionExpression", "ArrowFunctionExpression")]
+        return _body_block(max(callbacks, key=lambda arg: arg["range"][1] - arg["range"][0]))
+    raise NotIncrementalError(f"unexpected {node_type} with an outlined body")
+
+
+def _indent_at(text, position):
+    """Indentation of the line `position` is on, if only indentation precedes it there."""
+    line_start = text.rfind("\n", 0, position) + 1
+    prefix = text[line_start:position]
+    return prefix if not prefix.strip() else ""
+
+
+def _signature(text, item):
+    line = text[item.start:item.end].split("\n", 1)[0].rstrip()
+    return line[:MAX_CONTEXT_LINE_CHARS] + " ..." if len(line) > MAX_CONTEXT_LINE_CHARS else line
+
+
+class _Planner:
+    def __init__(self, old_js, new_js, prior_tsx):
+        self.old_js, self.new_js, self.prior_tsx = old_js, new_js, prior_tsx
+        self.digests = _Digests()
+        self.parts = []
+        self.changed_chars = 0
+
+    def part(self, item, scope, previous=None):
+        name = PART_NAME.format(index=len(self.parts) + 1)
+        code = textwrap.dedent(_indent_at(self.new_js, item.start) + self.new_js[item.start:item.end])
+        previous_tsx = None
+        if previous is not None:
+            previous_tsx = textwrap.dedent(_indent_at(self.prior_tsx, previous.start)
+                                           + self.prior_tsx[previous.start:previous.end])
+        self.parts.append(Part(name, code, "", list(scope), previous_tsx))
+        self.changed_chars += item.end - item.start
+        return self.parts[-1]
+
+    def diff(self, old_items, new_items, ts_items, scope):
+        """Edits turning the TSX of `old_items` into that of `new_items`, all on one statement list."""
+        ts_code = [item for item in ts_items if item.category != TYPE_CATEGORY]
+        old_keyed, ts_keyed = _keyed(old_items), _keyed(ts_code)
+        if [key for key, _ in old_keyed] != [key for key, _ in ts_keyed]:
+            raise NotIncrementalError("the existing .tsx does not line up with the previously migrated source")
+        if not ts_items:
+            raise NotIncrementalError("nothing in the existing .tsx to anchor the changes to")
+        matched = {key: (old, ts) for (key, old), (_, ts) in zip(old_keyed, ts_keyed)}
+        new_keyed = _keyed(new_items)
+        new_keys = {key for key, _ in new_keyed}
+        common = [key for key, _ in new_keyed if key in matched]
+        if common != [key for key, _ in old_keyed if key in new_keys]:
+            raise NotIncrementalError("declarations were reordered")
+
+        edits = []
+        for key, (_, ts) in matched.items():
+            if key not in new_keys:
+                edits.append(self.deletion(ts))
+        anchor = anchor_end = None
+        inserted = []
+        for key, item in new_keyed + [(None, None)]:
+            if key is not None and key not in matched:
+                inserted.append(item)
+                continue
+            if inserted:
+                following = item.start if item is not None else None
+                edits.append(self.insertion(inserted, anchor, anchor_end, ts_items, scope, following))
+                inserted = []
+            if key is None:
+                break
+            old, ts = matched[key]
+            anchor, anchor_end = ts, item.end
+            if self.digests.full(old) == self.digests.full(item):
+                continue
+            if old.body is not None and item.body is not None and ts.body is not None \
+                    and self.digests.header(old) == self.digests.header(item):
+                parts_before, changed_before = len(self.parts), self.changed_chars
+                try:
+                    edits.extend(self.diff(old.body, item.body, ts.body,
+                                           scope + [_signature(self.prior_tsx, ts)]))
+                    continue
+                except NotIncrementalError:
+                    del self.parts[parts_before:]  # Re-convert the whole statement instead.
+                    self.changed_chars = changed_before
+            part = self.part(item, scope, previous=ts)
+            part.indent = _indent_at(self.prior_tsx, ts.start)
+            edits.append((ts.start, ts.end, [part.name]))
+        return edits
+
+    def deletion(self, ts):
+        """
+        Removes a statement together with its line when nothing else is on it, and the blank lines
+        after it when a blank line precedes it, so no double gap is left behind.
+        """
+        text = self.prior_tsx
+        start, end = ts.start, ts.end
+        line_start = text.rfind("\n", 0, start) + 1
+        line_end = text.find("\n", end)
+        line_end = len(text) if line_end < 0 else line_end
+        if text[line_start:start].strip() or text[end:line_end].strip():
+            return start, end, []
+        end = min(len(text), line_end + 1)
+        previous_line = text[text.rfind("\n", 0, max(0, line_start - 1)) + 1:line_start]
+        if line_start > 0 and not previous_line.strip():
+            while end < len(text):
+                next_end = text.find("\n", end)
+                if next_end < 0 or text[end:next_end].strip():
+                    break
+                end = next_end + 1
+        return line_start, end, []
+
+    def _gap(self, start, end):
+        """The line breaks between two statements of the edited source (at least one)."""
+        return "\n" * max(1, self.new_js.count("\n", start, end))
+
+    def insertion(self, items, anchor, anchor_end, ts_items, scope, following):
+        """
+        Inserts new statements after `anchor` (whose edited source ends at `anchor_end`), or before
+        the first statement of the list, spaced like in the edited source. `following` is where the
+        statement after them starts in the edited source, if there is one.
+        """
+        reference = anchor or ts_items[0]
+        indent = _indent_at(self.prior_tsx, reference.start)
+        pieces = []
+        for index, item in enumerate(items):
+            part = self.part(item, scope)
+            part.indent = indent
+            if anchor is not None:
+                previous_end = items[index - 1].end if index else anchor_end
+                pieces.extend([self._gap(previous_end, item.start) + indent, part.name])
+            else:
+                next_start = items[index + 1].start if index + 1 < len(items) else following
+                pieces.extend([part.name, self._gap(item.end, next_start or item.end) + indent])
+        return (anchor.end, anchor.end, pieces) if anchor is not None else (reference.start, reference.start, pieces)
+
+
+def _context(prior_tsx, ts_items):
+    """Type declarations of the existing .tsx in full and the first line of every other statement."""
+    lines = []
+    for item in ts_items:
+        if item.category == TYPE_CATEGORY:
+            lines.append(prior_tsx[item.start:item.end])
+        else:
+            lines.append(_signature(prior_tsx, item))
+    return "\n".join(lines)
+
+
+def plan_incremental_migration(old_js, new_js, prior_tsx, tsx_file_name="input.tsx"):
+    """
+    Plans the edits that turn `prior_tsx` (migrated from `old_js`) into a migration of `new_js`.
+    Raises NotIncrementalError when the file has to be migrated in full.
+    """
+    old_program, old_items = js_outline(old_js)
+    program, new_items = js_outline(new_js)
+    ts_items = ts_outline(prior_tsx, tsx_file_name)
+    planner = _Planner(old_js, new_js, prior_tsx)
+    edits = planner.diff(old_items, new_items, ts_items, [])
+    if planner.changed_chars > MAX_CHANGED_FRACTION * max(1, len(new_js)):
+        raise NotIncrementalError("most of the file changed")
+    return IncrementalPlan(program, prior_tsx, _context(prior_tsx, ts_items), planner.parts, edits)
+
+
+def build_parts_prompt(parts):
+    """The changed parts, each with its scope and previous TypeScript, framed for split_packed_response."""
+    sections = []
+    for part in parts:
+        lines = [f"Part {part.name}:"]
+        if part.scope:
+            lines.append("It is inside:\n" + "\n".join(part.scope))
+        if part.previous_tsx is not None:
+            lines.append("Its previous TypeScript, for reference only:\n" + part.previous_tsx)
+        else:
+            lines.append("It is new code.")
+        lines.append(FILE_START_MARKER.format(name=part.name))
+        lines.append(part.js_code.rstrip("\n"))
+        lines.append(FILE_END_MARKER.format(name=part.name))
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
+
+
+def apply_incremental_migration(plan, converted):
+    """Splices `converted` (part name -> TSX code) into the prior TSX."""
+    parts = {part.name: part for part in plan.parts}
+    text = plan.prior_tsx
+    for start, end, pieces in sorted(plan.edits, key=lambda edit: (edit[0], edit[1]), reverse=True):
+        replacement = []
+        for piece in pieces:
+            if piece in parts:
+                lines = textwrap.dedent(converted[piece].strip("\n")).split("\n")
+                indent = parts[piece].indent
+                piece = "\n".join([lines[0]] + [indent + line if line.strip() else line for line in lines[1:]])
+            replacement.append(piece)
+        text = text[:start] + "".join(replacement) + text[end:]
+    return text
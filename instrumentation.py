@@ -0,0 +1,162 @@
+import bisect
+import contextlib
+import json
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets in the Prometheus summary.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+METRIC_PREFIX = "migration"
+
+
+class _StageStats:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class Tracer:
+    """
+    Collects timing spans and token usage from all threads. Disabled (and nearly free) until
+    `enable()` is called; optionally streams every span as one JSON line to `trace_path`.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._trace_file = None
+        self._stages = {}
+        self._tokens = {"prompt": 0, "completion": 0, "total": 0}
+        self._counters = {}
+
+    def enable(self, trace_path=None):
+        with self._lock:
+            self.enabled = True
+            if trace_path:
+                self._trace_file = open(trace_path, "w", encoding="utf-8")
+
+    def _write(self, event):
+        if self._trace_file is not None:
+            self._trace_file.write(json.dumps(event) + "\n")
+
+    @contextlib.contextmanager
+    def file_context(self, file_path):
+        """Attributes spans and token usage recorded by this thread to `file_path`."""
+        previous = getattr(self._local, "file", None)
+        self._local.file = file_path
+        try:
+            yield
+        finally:
+            self._local.file = previous
+
+    def current_file(self):
+        return getattr(self._local, "file", None)
+
+    @contextlib.contextmanager
+    def span(self, stage, **attributes):
+        """Times the enclosed block as one `stage` span."""
+        if not self.enabled:
+            yield
+            return
+        started_at = time.time()
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - started, started_at, error=error, **attributes)
+
+    def record(self, stage, seconds, started_at=None, **attributes):
+        """Records a span measured elsewhere (e.g. in a worker process)."""
+        if not self.enabled:
+            return
+        event = {"type": "span", "stage": stage, "duration_s": seconds}
+        if started_at is not None:
+            event["start"] = started_at
+        file_path = attributes.pop("file", None) or self.current_file()
+        if file_path:
+            event["file"] = file_path
+        event.update((key, value) for key, value in attributes.items() if value is not None)
+        with self._lock:
+            self._stages.setdefault(stage, _StageStats()).observe(seconds)
+            self._write(event)
+
+    def record_usage(self, usage, model=None):
+        """Adds the `usage` of an API response (prompt/completion/total tokens) to the current file."""
+        if not self.enabled or usage is None:
+            return
+        tokens = {
+            "prompt": getattr(usage, "prompt_tokens", None) or 0,
+            "completion": getattr(usage, "completion_tokens", None) or 0,
+            "total": getattr(usage, "total_tokens", None) or 0,
+        }
+        event = {"type": "usage", "file": self.current_file(), "model": model, "time": time.time()}
+        event.update((f"{kind}_tokens", count) for kind, count in tokens.items())
+        with self._lock:
+            for kind, count in tokens.items():
+                self._tokens[kind] += count
+            self._write(event)
+
+    def count(self, name, value=1, **labels):
+        """Increments the counter `name` with the given labels."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def prometheus_text(self):
+        """Prometheus text exposition of the stage latency histograms, token usage and counters."""
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Time spent per pipeline stage.",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage in sorted(self._stages):
+                stats = self._stages[stage]
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), stats.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {stats.total:.6f}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {stats.count}')
+            lines.append(f"# HELP {METRIC_PREFIX}_tokens_total API tokens reported by response.usage.")
+            lines.append(f"# TYPE {METRIC_PREFIX}_tokens_total counter")
+            for kind, count in self._tokens.items():
+                lines.append(f'{METRIC_PREFIX}_tokens_total{{kind="{kind}"}} {count}')
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        rendered = ",".join(f'{key}="{value_}"' for key, value_ in labels)
+                        lines.append(f"{METRIC_PREFIX}_{name}{{{rendered}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+    def close(self):
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+
+
+# Process-wide tracer used by run_migration, ast_utils and verify_migration.
+tracer = Tracer()
+span = tracer.span
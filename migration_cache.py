@@ -0,0 +1,99 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_DIR = ".migration_cache"
+CACHE_DB_NAME = "conversions.sqlite3"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+def conversion_cache_key(model, system_message, prompt_template, source_text):
+    """Content address of one conversion: changing the model, prompt or source misses the cache."""
+    digest = hashlib.sha256()
+    for part in (model, system_message, prompt_template, source_text):
+        encoded = part.encode("utf-8")
+        # Length-prefix every part so that ("ab", "c") and ("a", "bc") hash differently.
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class MigrationCache:
+    """
+    Persistent SQLite cache of LLM conversions keyed by `conversion_cache_key`.
+
+    Safe to share between worker threads. Entries older than `max_age_days` are dropped, and the
+    least recently used entries are evicted once the stored content exceeds `max_bytes`.
+    With `refresh=True` lookups always miss but new results are still stored.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS, refresh=False):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_DB_NAME)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversions ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, content TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS conversions_last_used ON conversions (last_used_at)")
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key):
+        """Returns the cached conversion for `key`, or None on a miss."""
+        with self._lock:
+            row = None
+            if not self.refresh:
+                row = self._conn.execute("SELECT content FROM conversions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE conversions SET last_used_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key, model, content):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conversions (key, model, content, size, created_at, last_used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, content, len(content.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+
+    def evict(self):
+        """Drops expired entries, then least recently used ones until the cache fits `max_bytes`."""
+        with self._lock:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                self._conn.execute("DELETE FROM conversions WHERE created_at < ?", (cutoff,))
+            if self.max_bytes is not None:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM conversions").fetchone()[0]
+                if total > self.max_bytes:
+                    doomed = []
+                    for key, size in self._conn.execute("SELECT key, size FROM conversions ORDER BY last_used_at"):
+                        if total <= self.max_bytes:
+                            break
+                        doomed.append((key,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM conversions WHERE key = ?", doomed)
+            self._conn.commit()
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,140 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+MANIFEST_FILENAME = ".migration_manifest.json"
+# Copies of the sources each output was last migrated from, for diff-aware re-migration.
+SOURCES_DIRNAME = ".migration_sources"
+MANIFEST_VERSION = 1
+# Minimum interval between manifest rewrites while a run is in progress.
+SAVE_INTERVAL_SECONDS = 2.0
+
+STATUS_MIGRATED = "migrated"
+STATUS_FAILED = "failed"
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path):
+    with open(path, "rb") as f:
+        return sha256_bytes(f.read())
+
+
+@contextlib.contextmanager
+def atomic_open(path):
+    """
+    Opens a temp file next to `path` for writing and renames it over `path` when the block exits
+    cleanly, so readers (and a later run) never see a half-written file. On an exception the
+    temp file is removed and `path` is left untouched.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_text(path, text):
+    """Writes `text` to `path` atomically (see atomic_open)."""
+    with atomic_open(path) as f:
+        f.write(text)
+
+
+class MigrationManifest:
+    """
+    Per-output-directory record of what has been migrated: for every input file (keyed by its path
+    relative to the input directory) the source hash, output hash, model and status.
+    Safe to update from worker threads; saved atomically.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.sources_dir = os.path.join(output_dir, SOURCES_DIRNAME)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f).get("files", {})
+            except (OSError, ValueError, AttributeError) as e:
+                logging.warning(f"Ignoring unreadable manifest '{self.path}': {e}")
+                self.entries = {}
+
+    def is_up_to_date(self, key, source_hash, model, output_path):
+        """True if `key` was migrated from this exact source with this model and its output is intact."""
+        with self._lock:
+            entry = self.entries.get(key)
+        if not entry or entry.get("status") != STATUS_MIGRATED:
+            return False
+        if entry.get("source_sha256") != source_hash or entry.get("model") != model:
+            return False
+        try:
+            return sha256_file(output_path) == entry.get("output_sha256")
+        except OSError:
+            return False
+
+    def record(self, key, source_hash, model, status, output_hash=None, error=None):
+        entry = {
+            "source_sha256": source_hash,
+            "output_sha256": output_hash,
+            "model": model,
+            "status": status,
+            "updated_at": time.time(),
+        }
+        if error:
+            entry["error"] = error
+        with self._lock:
+            self.entries[key] = entry
+            self._dirty = True
+            due = time.monotonic() - self._last_save >= SAVE_INTERVAL_SECONDS
+        if due:
+            self.save()
+
+    def save_source(self, key, source_bytes):
+        """Keeps a copy of the source `key` was just migrated from."""
+        path = os.path.join(self.sources_dir, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write_text(path, source_bytes.decode("utf-8"))
+
+    def has_source(self, key):
+        return os.path.exists(os.path.join(self.sources_dir, key))
+
+    def load_source(self, key):
+        """The source `key` was last successfully migrated from, or None if no intact copy is kept."""
+        with self._lock:
+            entry = self.entries.get(key)
+        if not entry or entry.get("status") != STATUS_MIGRATED:
+            return None
+        try:
+            with open(os.path.join(self.sources_dir, key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        return data.decode("utf-8") if sha256_bytes(data) == entry.get("source_sha256") else None
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({"version": MANIFEST_VERSION, "files": self.entries}, indent=2, sort_keys=True)
+            atomic_write_text(self.path, payload)
+            self._dirty = False
+            self._last_save = time.monotonic()
@@ -0,0 +1,322 @@
+import logging
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import ast_similarity
+import ast_utils
+import run_migration
+import verify_migration
+from request_packing import DEFAULT_PACK_MAX_FILES
+from run_migration import setup_logging
+
+# Marks the end of a stage's output in the queue feeding the next stage.
+_DONE = object()
+# How often the extraction stage looks for newly written components.
+POLL_INTERVAL_SECONDS = 0.2
+DEFAULT_QUEUE_SIZE = 32
+
+
+class StageStats:
+    """Thread-safe throughput counters of one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.first_started = None
+        self.last_finished = None
+        self._lock = threading.Lock()
+
+    def add(self, started, finished, ok=True):
+        with self._lock:
+            self.items += 1
+            self.failed += not ok
+            self.busy_seconds += finished - started
+            self.first_started = started if self.first_started is None else min(self.first_started, started)
+            self.last_finished = finished if self.last_finished is None else max(self.last_finished, finished)
+
+    def summary(self):
+        active = (self.last_finished - self.first_started) if self.items else 0.0
+        rate = self.items / active if active > 0 else 0.0
+        return (f"{self.name:>8}: {self.items:5d} item(s), {self.failed:4d} failed, "
+                f"{rate:8.2f} item(s)/s over {active:7.1f}s active, {self.busy_seconds:8.1f}s busy")
+
+
+class Pipeline:
+    """
+    Runs extract -> migrate -> verify as concurrent stages connected by bounded queues.
+
+    Extraction (jscodeshift + extractComponents.js) writes components to the extracted dir; a
+    watcher feeds each new file to the migration workers as soon as it lands. Migrated files go
+    straight to a verification process pool. A full queue blocks the stage that feeds it, so
+    memory stays flat however far extraction runs ahead.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.migrate_queue = queue.Queue(maxsize=args.queue_size)
+        self.verify_queue = queue.Queue(maxsize=args.queue_size)
+        self.stats = {name: StageStats(name) for name in ("extract", "migrate", "verify")}
+        self.migration_results = []
+        self.verification_rows = []
+        self.skipped = 0
+        self._collisions = set()
+        self._results_lock = threading.Lock()
+
+    # --- Stage 1: extraction ---
+
+    def _extract_command(self):
+        return shlex.split(self.args.jscodeshift) + ["-t", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                         "extractComponents.js")] + self.args.sources
+
+    def _emit_new_components(self, seen, since_ns=None, recursive=True):
+        # Found like run_migration.py finds them, with the ignore rules and --shard. `seen` maps each
+        # emitted file's path without extension to the file and its (mtime, size), so a file that is
+        # rewritten later is emitted again. With `since_ns`, files last written before then (left
+        # over from an earlier run) are left for the final pass, once extraction can no longer change them.
+        try:
+            for rel_path in run_migration.discover_sources(self.args, recursive):
+                stem = os.path.splitext(rel_path)[0]
+                try:
+                    stat = os.stat(os.path.join(self.args.input_dir, *rel_path.split("/")))
+                except FileNotFoundError:
+                    continue
+                if since_ns is not None and stat.st_mtime_ns < since_ns:
+                    continue
+                version = (stat.st_mtime_ns, stat.st_size)
+                if stem in seen:
+                    emitted, emitted_version = seen[stem]
+                    if emitted != rel_path:
+                        if rel_path not in self._collisions:
+                            # Foo.jsx was extracted before Foo.js; both would be migrated to Foo.tsx.
+                            self._collisions.add(rel_path)
+                            logging.warning(f"Skipping '{rel_path}': '{emitted}' is already migrated to the same output.")
+                        continue
+                    if emitted_version == version:
+                        continue
+                seen[stem] = (rel_path, version)
+                now = time.perf_counter()
+                self.stats["extract"].add(self._last_extracted, now)
+                self._last_extracted = now
+                self.migrate_queue.put(rel_path)  # Blocks while migration is behind.
+        except FileNotFoundError:
+            return
+
+    def extract(self):
+        seen = {}
+        self._last_extracted = time.perf_counter()
+        started_ns = time.time_ns()
+        process = None
+        if self.args.sources:
+            env = dict(os.environ, EXTRACT_OUTPUT_DIR=os.path.abspath(self.args.input_dir))
+            logging.info(f"Extracting components from {len(self.args.sources)} source file(s)...")
+            process = subprocess.Popen(self._extract_command(), env=env, stdout=subprocess.DEVNULL)
+        try:
+            listed = None
+            while process is not None and process.poll() is None:
+                # extractComponents.js writes (renames) its files directly into the input dir, which
+                # changes the directory's mtime; only then is it listed again, and only that level.
+                try:
+                    changed = os.stat(self.args.input_dir).st_mtime_ns
+                except FileNotFoundError:
+                    changed = None
+                if changed != listed:
+                    listed = changed
+                    self._emit_new_components(seen, since_ns=started_ns, recursive=False)
+                time.sleep(POLL_INTERVAL_SECONDS)
+            if process is not None and process.returncode != 0:
+                logging.error(f"Extraction exited with status {process.returncode}.")
+            self._emit_new_components(seen)  # Whatever landed after the last poll.
+        finally:
+            for _ in range(self.args.concurrency):
+                self.migrate_queue.put(_DONE)
+
+    # --- Stage 2: migration ---
+
+    def migrate_worker(self):
+        while True:
+            rel_path = self.migrate_queue.get()
+            if rel_path is _DONE:
+                return
+            job = run_migration.make_job(self.args.input_dir, self.args.output_dir, rel_path)
+            if not self.args.force:
+                pending, skipped = run_migration.select_pending_jobs([job])
+                if skipped:
+                    with self._results_lock:
+                        self.skipped += 1
+                    self.verify_queue.put(job)  # Still verify outputs from earlier runs.
+                    continue
+            started = time.perf_counter()
+            result = run_migration.migrate_file(job)
+            self.stats["migrate"].add(started, time.perf_counter(), result.success)
+            with self._results_lock:
+                self.migration_results.append(result)
+            if result.success:
+                self.verify_queue.put(job)
+
+    # --- Stage 3: verification ---
+
+    def _submit(self, executor, job, tree_cache_dir):
+        return executor.submit(verify_migration.verify_pair, job.input_path, job.output_path,
+                               tree_cache_dir=tree_cache_dir, max_edit_distance=ast_similarity.DEFAULT_MAX_EDIT_DISTANCE)
+
+    def _record(self, row, started):
+        self.stats["verify"].add(started, time.perf_counter(), row["status"] == verify_migration.STATUS_MATCH)
+        verify_migration.record_row_spans(row)
+        self.verification_rows.append(row)
+        logging.info(f"{row['status']:>14}  {row['tsx_file']}")
+
+    def verify(self):
+        limit = max(1, self.args.verify_workers) * 2
+        tree_cache_dir = None if self.args.no_cache else ast_utils.DEFAULT_NORMALIZED_AST_CACHE
+        executor = ProcessPoolExecutor(max_workers=self.args.verify_workers)
+        in_flight = {}
+        done = False
+        try:
+            while not done or in_flight:
+                # Only pull more work while the pool has room, so the queue applies backpressure.
+                while not done and len(in_flight) < limit:
+                    try:
+                        job = self.verify_queue.get(timeout=POLL_INTERVAL_SECONDS if in_flight else None)
+                    except queue.Empty:
+                        break
+                    if job is _DONE:
+                        done = True
+                        break
+                    try:
+                        future = self._submit(executor, job, tree_cache_dir)
+                    except BrokenProcessPool:
+                        # A crashed worker breaks the pool for good; carry on with a fresh one.
+                        executor.shutdown(wait=False)
+                        executor = ProcessPoolExecutor(max_workers=self.args.verify_workers)
+                        future = self._submit(executor, job, tree_cache_dir)
+                    in_flight[future] = (job, time.perf_counter())
+                if not in_flight:
+                    continue
+                finished, _ = wait(list(in_flight), timeout=POLL_INTERVAL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job, started = in_flight.pop(future)
+                    try:
+                        row, _ = future.result()
+                    except Exception as e:
+                        logging.error(f"Verifying '{job.output_path}' failed: {type(e).__name__} - {e}")
+                        row = verify_migration.error_row(job.input_path, job.output_path, e)
+                    self._record(row, started)
+        except Exception as e:
+            # Keep draining: the migration workers block on a full verify queue otherwise.
+            logging.exception("The verification stage failed; its remaining files are reported as errors.")
+            for job, started in in_flight.values():
+                self._record(verify_migration.error_row(job.input_path, job.output_path, e), started)
+            while not done:
+                job = self.verify_queue.get()
+                done = job is _DONE
+                if not done:
+                    self._record(verify_migration.error_row(job.input_path, job.output_path, e), time.perf_counter())
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def run(self):
+        extractor = threading.Thread(target=self.extract, name="extract")
+        migrators = [
+            threading.Thread(target=self.migrate_worker, name=f"migrate-{i}") for i in range(self.args.concurrency)
+        ]
+        verifier = threading.Thread(target=self.verify, name="verify")
+        for thread in [extractor, verifier] + migrators:
+            thread.start()
+        extractor.join()
+        for thread in migrators:
+            thread.join()
+        self.verify_queue.put(_DONE)
+        verifier.join()
+
+
+def main(argv=None):
+    """
+    Runs extraction, migration and verification as one streaming pipeline: migration starts on
+    the first extracted component and every .tsx is verified as soon as it is written.
+    """
+    setup_logging()
+    parser = run_migration.build_arg_parser()
+    parser.description = "Extract, migrate and verify React components in one streaming pipeline."
+    parser.add_argument(
+        "sources",
+        nargs="*",
+        help="JavaScript files to extract components from. Without sources, the existing --input_dir is processed."
+    )
+    parser.add_argument(
+        "--jscodeshift",
+        default="jscodeshift",
+        help="Command used to run extractComponents.js. (default: 'jscodeshift'; e.g. 'npx jscodeshift')"
+    )
+    parser.add_argument(
+        "--verify_workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Verification processes. (default: number of CPU cores)"
+    )
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f"Capacity of the queues between stages. (default: {DEFAULT_QUEUE_SIZE})"
+    )
+    parser.add_argument(
+        "--report_json",
+        default="verification_report.json",
+        help="Path of the verification report. (default: 'verification_report.json')"
+    )
+    args = parser.parse_args(argv)
+    args.concurrency = max(1, args.concurrency)
+    # Components are migrated one by one as they land, so batch-level options cannot apply.
+    unsupported = [flag for flag, given in (
+        ("--pack_token_budget", args.pack_token_budget),
+        ("--pack_max_files", args.pack_max_files != DEFAULT_PACK_MAX_FILES),
+        ("--dedupe", args.dedupe),
+        ("--dedupe_report", args.dedupe_report),
+        ("--merge_summaries", args.merge_summaries),
+    ) if given]
+    if unsupported:
+        parser.error(f"{', '.join(unsupported)} cannot be used with pipeline.py; use run_migration.py instead.")
+
+    logging.info("Starting extract -> migrate -> verify pipeline...")
+    run_migration.load_env_and_setup_api_key()
+    os.makedirs(args.input_dir, exist_ok=True)
+    os.makedirs(args.output_dir, exist_ok=True)
+    run_migration.configure(args)
+
+    pipeline = Pipeline(args)
+    started = time.perf_counter()
+    try:
+        pipeline.run()
+    finally:
+        run_migration.shutdown(args)
+    wall_time = time.perf_counter() - started
+
+    rows = sorted(pipeline.verification_rows, key=lambda row: row["js_file"])
+    verify_migration.write_reports(rows, args.report_json)
+    matches = sum(1 for row in rows if row["status"] == verify_migration.STATUS_MATCH)
+    logging.info("Pipeline complete.")
+    for stats in pipeline.stats.values():
+        logging.info(stats.summary())
+    logging.info(f"Summary: {sum(r.success for r in pipeline.migration_results)} migrated, "
+                 f"{sum(not r.success for r in pipeline.migration_results)} failed, "
+                 f"{pipeline.skipped} skipped (already up to date), {matches}/{len(rows)} verified as matching, "
+                 f"in {wall_time:.1f}s.")
+    logging.info(f"Verification report written to '{args.report_json}'.")
+    if args.summary_json:
+        run_migration.write_json(args.summary_json, run_migration.build_summary(
+            args, pipeline.stats["extract"].items, pipeline.migration_results, pipeline.skipped, wall_time))
+        logging.info(f"Summary written to '{args.summary_json}'.")
+    return pipeline
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import random
+import threading
+import time
+
+# Adaptive backoff tuning. On a 429 the effective rate is halved (down to MIN_RATE_SCALE)
+# and every successful request recovers RATE_RECOVERY_STEP of the configured budget.
+MIN_RATE_SCALE = 0.1
+RATE_RECOVERY_STEP = 0.05
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class RateLimiter:
+    """
+    Thread-safe requests-per-minute / tokens-per-minute budget shared by all migration workers.
+
+    Both budgets are continuous token buckets refilled at `budget / 60` per second. A budget of
+    None means "unlimited", but the limiter still applies the global pause requested by a 429
+    (Retry-After) so that every worker backs off together instead of hammering the API.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute or 0)
+        self._token_allowance = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._rate_scale = 1.0
+        self._consecutive_rate_limits = 0
+        self._condition = threading.Condition()
+        self.rate_limited_count = 0  # Requests that went through after being rate limited.
+        self.rate_limited_failures = 0  # Requests given up on while rate limited.
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                float(self.requests_per_minute),
+                self._request_allowance + elapsed * self.requests_per_minute * self._rate_scale / 60.0,
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + elapsed * self.tokens_per_minute * self._rate_scale / 60.0,
+            )
+
+    def _seconds_until_available(self, tokens):
+        """Returns 0 if a request of `tokens` fits the budget now, otherwise how long to wait."""
+        wait = 0.0
+        if self.requests_per_minute and self._request_allowance < 1.0:
+            per_second = self.requests_per_minute * self._rate_scale / 60.0
+            wait = max(wait, (1.0 - self._request_allowance) / per_second)
+        if self.tokens_per_minute:
+            # A single request larger than the whole budget is let through once the bucket is
+            # full, otherwise it could never be sent.
+            needed = min(float(tokens), float(self.tokens_per_minute))
+            if self._token_allowance < needed:
+                per_second = self.tokens_per_minute * self._rate_scale / 60.0
+                wait = max(wait, (needed - self._token_allowance) / per_second)
+        return wait
+
+    def acquire(self, tokens=0):
+        """Blocks until one request carrying roughly `tokens` tokens may be sent."""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    self._condition.wait(self._paused_until - now)
+                    continue
+                wait = self._seconds_until_available(tokens)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1.0
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return
+                self._condition.wait(wait)
+
+    def reconcile(self, estimated_tokens, actual_tokens):
+        """Corrects the token bucket once the API reports the real usage of a request."""
+        if not self.tokens_per_minute or actual_tokens is None:
+            return
+        with self._condition:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + estimated_tokens - actual_tokens,
+            )
+            self._condition.notify_all()
+
+    def on_success(self, rate_limited=False):
+        """Records a successful request; `rate_limited` if it got a 429 before and was retried."""
+        with self._condition:
+            self.rate_limited_count += rate_limited
+            self._consecutive_rate_limits = 0
+            self._rate_scale = min(1.0, self._rate_scale + RATE_RECOVERY_STEP)
+
+    def on_rate_limited(self, retry_after=None):
+        """
+        Records a 429 that will be retried. Honors the server's Retry-After when given, otherwise
+        uses exponential backoff with jitter. Returns the pause (in seconds) applied to all workers.
+        """
+        with self._condition:
+            self._consecutive_rate_limits += 1
+            self._rate_scale = max(MIN_RATE_SCALE, self._rate_scale * 0.5)
+            if retry_after is None:
+                backoff = BASE_BACKOFF_SECONDS * (2 ** (self._consecutive_rate_limits - 1))
+                retry_after = min(MAX_BACKOFF_SECONDS, backoff) * random.uniform(0.5, 1.0)
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            # Drain the request bucket so the resumed workers ramp up at the reduced rate.
+            self._request_allowance = min(self._request_allowance, 0.0)
+            self._condition.notify_all()
+            return retry_after
+
+    def on_rate_limit_failure(self):
+        """Records a request that is given up on after a 429 (out of retries or out of quota)."""
+        with self._condition:
+            self.rate_limited_failures += 1
@@ -0,0 +1,87 @@
+import re
+
+# Marker lines framing every file in a packed request and its response. They are valid
+# JS/TS line comments, so the model sees ordinary source.
+FILE_START_MARKER = "// ==== FILE: {name} ===="
+FILE_END_MARKER = "// ==== END FILE: {name} ===="
+_MARKER_RE = re.compile(r"^\s*// ==== (END FILE|FILE): (.+?) ====\s*$")
+
+PACKED_PROMPT_TEMPLATE = (
+    "Convert each of the following React JavaScript files to TypeScript (.tsx). "
+    "Add prop/state/event types. "
+    "Every file starts with a line '// ==== FILE: <name> ====' and ends with a line "
+    "'// ==== END FILE: <name> ===='. "
+    "Return every converted file between the same two marker lines, keeping the names unchanged, "
+    "and nothing else. Do not include explanations or markdown.\n\n"
+    "{files}"
+)
+
+DEFAULT_PACK_TOKEN_BUDGET = 2000
+DEFAULT_PACK_MAX_FILES = 20
+
+
+def pack_items(items, token_budget=DEFAULT_PACK_TOKEN_BUDGET, max_files=DEFAULT_PACK_MAX_FILES):
+    """
+    Bins (item, estimated_tokens) pairs first-fit decreasing so that no bin exceeds `token_budget`
+    tokens or `max_files` items. An item larger than the budget gets a bin of its own.
+    Returns a list of bins (lists of items).
+    """
+    bins = []
+    for item, tokens in sorted(items, key=lambda pair: pair[1], reverse=True):
+        for packed in bins:
+            if packed["tokens"] + tokens <= token_budget and len(packed["items"]) < max_files:
+                packed["items"].append(item)
+                packed["tokens"] += tokens
+                break
+        else:
+            bins.append({"items": [item], "tokens": tokens})
+    return [packed["items"] for packed in bins]
+
+
+def build_packed_source(sections):
+    """Joins (name, js_code) pairs into the framed body of a packed request."""
+    parts = []
+    for name, js_code in sections:
+        parts.append(FILE_START_MARKER.format(name=name))
+        parts.append(js_code.rstrip("\n"))
+        parts.append(FILE_END_MARKER.format(name=name))
+    return "\n".join(parts)
+
+
+def split_packed_response(text, names):
+    """
+    Splits a packed response back into {name: code}. Only well-formed sections are returned: the
+    name was requested, it appears exactly once, its start and end markers pair up and its body
+    is not empty. Callers fall back to single-file requests for every name that is missing.
+    """
+    wanted = set(names)
+    sections = {}
+    malformed = set()
+    current, lines = None, []
+    for line in text.splitlines():
+        match = _MARKER_RE.match(line)
+        if match is None:
+            if current is not None:
+                lines.append(line)
+            continue
+        marker, name = match.groups()
+        if marker == "FILE":
+            if current is not None:
+                malformed.add(current)  # Previous section was never closed.
+            current, lines = name, []
+        elif current == name:
+            if name in sections:
+                malformed.add(name)
+            code = "\n".join(lines).strip()
+            if code:
+                sections[name] = code
+            else:
+                malformed.add(name)
+            current, lines = None, []
+        else:
+            if current is not None:
+                malformed.add(current)
+            current, lines = None, []
+    if current is not None:
+        malformed.add(current)  # Response was cut off inside a section.
+    return {name: code for name, code in sections.items() if name in wanted and name not in malformed}
@@ -2,12 +2,114 @@ import os
 import openai # Updated import for v1.x.x
 from openai import OpenAI # Explicitly import the client
 import argparse
+import functools
 from dotenv import load_dotenv
 import logging
 import sys
+import statistics
+import time
+import email.utils
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Optional
 
-# Global OpenAI client instance
+import ast_utils
+import dedupe
+import discovery
+from chunking import ChunkingError, count_tokens, default_max_prompt_tokens, plan_chunks, stitch_chunks
+from incremental import NotIncrementalError, apply_incremental_migration, build_parts_prompt, plan_incremental_migration
+from instrumentation import span, tracer
+from migration_cache import (
+    DEFAULT_CACHE_DIR, DEFAULT_MAX_AGE_DAYS, MigrationCache, conversion_cache_key
+)
+from migration_manifest import (
+    STATUS_FAILED, STATUS_MIGRATED, MigrationManifest, atomic_open, atomic_write_text, sha256_bytes, sha256_file
+)
+from rate_limiter import RateLimiter
+from request_packing import (
+    DEFAULT_PACK_MAX_FILES, PACKED_PROMPT_TEMPLATE, build_packed_source, pack_items, split_packed_response
+)
+from streaming import RunawayResponseError, StreamingFenceStripper
+
+# Global OpenAI client instance, shared by all worker threads (its HTTP connection pool is thread-safe)
 client = None
+# Global RPM/TPM budget shared by all worker threads, configured in main()
+rate_limiter = RateLimiter()
+# Global on-disk conversion cache, configured in main() (None disables caching)
+migration_cache = None
+# Global manifest of the output directory, configured in main() (None disables resumable runs)
+migration_manifest = None
+# Global streaming budget (max output/input size ratio), configured in main() (None disables streaming)
+stream_output_ratio = None
+# Global prompt size limit, configured in main(); larger components are converted in chunks
+max_prompt_tokens = None
+# Global switch for diff-aware re-migration of edited files, configured in main()
+incremental_migration = False
+
+MODEL = "gpt-4"
+SYSTEM_MESSAGE = "You are a code migration assistant."
+PROMPT_TEMPLATE = (
+    "Convert this React JavaScript component to TypeScript (.tsx). "
+    "Add prop/state/event types. "
+    "Return only the code. Do not include explanations or markdown.\n\n"
+    "{js_code}"
+)
+CHUNK_PROMPT_TEMPLATE = (
+    "Convert this part of a larger React JavaScript file to TypeScript (.tsx). "
+    "Add prop/state/event types. "
+    "Lines like '// @@FRAGMENT_1@@' stand for code that is converted separately; keep them unchanged on their own lines. "
+    "Return only the converted code of this part. Do not include explanations or markdown.\n\n"
+    "Declarations in the file, for context only:\n{context}\n\n"
+    "{scope}"
+    "Code to convert:\n{js_code}"
+)
+INCREMENTAL_PROMPT_TEMPLATE = (
+    "Parts of a React JavaScript file that was already converted to TypeScript (.tsx) have changed. "
+    "Convert each changed part to TypeScript, consistent with the existing TypeScript code. "
+    "Add prop/state/event types. "
+    "Every part starts with a line '// ==== FILE: <name> ====' and ends with a line '// ==== END FILE: <name> ===='. "
+    "Return every converted part between the same two lines, and nothing else. "
+    "Do not include explanations or markdown.\n\n"
+    "Declarations in the existing TypeScript file, for context only:\n{context}\n\n"
+    "{parts}"
+)
+# Chunks of one oversized component converted in parallel (on top of --concurrency).
+MAX_CHUNK_CONCURRENCY = 4
+# Attempts per file for transient errors (connection problems, 5xx). 429s are retried separately.
+MAX_API_ATTEMPTS = 4
+MAX_RATE_LIMIT_RETRIES = 10
+# Rough characters-per-token ratio used to charge requests against the tokens-per-minute budget.
+CHARS_PER_TOKEN = 4
+# A streamed response is cut off once it exceeds max(ratio * input size, this many characters).
+DEFAULT_MAX_OUTPUT_RATIO = 3.0
+MIN_STREAM_OUTPUT_CHARS = 4096
+
+
+@dataclass
+class MigrationJob:
+    """One file to migrate. `key` identifies it in the manifest (path relative to the input dir)."""
+    input_path: str
+    output_path: str
+    key: str
+
+
+@dataclass
+class MigrationResult:
+    """Outcome of migrating a single file."""
+    input_path: str
+    output_path: str
+    success: bool
+    elapsed: float
+    error: Optional[str] = None
+    # True if the conversion came from a packed multi-file request.
+    packed: bool = False
+    # Seconds until the first streamed token arrived (streaming mode only).
+    first_token_s: Optional[float] = None
+    # True if only the changed declarations were re-converted (see incremental.py).
+    incremental: bool = False
+    # True if the output was rewritten from the migration of an identical copy (see dedupe.py).
+    deduplicated: bool = False
 
 def setup_logging():
     """Configures basic logging."""
@@ -28,7 +130,8 @@ def load_env_and_setup_api_key():
         sys.exit(1)
 
     try:
-        client = OpenAI(api_key=api_key)
+        # Retries are handled by create_chat_completion so 429s can be throttled globally.
+        client = OpenAI(api_key=api_key, max_retries=0)
         # Test the API key with a simple call, e.g., listing models (optional, can incur cost/quota usage)
         # For this test, we'll assume the key is valid if client initializes.
         # client.models.list()
@@ -41,44 +144,587 @@ def load_env_and_setup_api_key():
         sys.exit(1)
 
 
-def migrate_js_to_tsx(file_path):
+def estimate_tokens(text):
+    """Cheap token estimate used to charge a request against the tokens-per-minute budget."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def estimate_request_tokens(messages):
+    """Tokens charged for a request before it is sent; the completion is usually a bit longer than the prompt."""
+    return sum(estimate_tokens(m["content"]) for m in messages) * 2
+
+def build_messages(js_code):
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": PROMPT_TEMPLATE.format(js_code=js_code)}
+    ]
+
+def build_packed_messages(sections):
+    """Messages for one packed request; `sections` are (name, js_code) pairs."""
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": PACKED_PROMPT_TEMPLATE.format(files=build_packed_source(sections))}
+    ]
+
+def build_chunk_messages(chunk, context):
+    """Messages for one chunk of an oversized component (see chunking.plan_chunks)."""
+    scope = ""
+    if chunk.scope:
+        scope = "This code is inside:\n" + "\n".join(chunk.scope) + "\n\n"
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": CHUNK_PROMPT_TEMPLATE.format(context=context, scope=scope, js_code=chunk.code)}
+    ]
+
+def _retry_after_seconds(error):
+    """Extracts the server-requested delay from a 429 response, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return None
+
+def create_chat_completion(messages, **kwargs):
     """
-    Migrates a JavaScript React component file to TypeScript (TSX) using OpenAI API.
+    Sends a chat completion request through the shared rate limiter.
+    429s pause all workers (honoring Retry-After) and are retried without counting as failures;
+    connection errors and server errors are retried with exponential backoff.
+    With stream=True the stream is returned as is; its consumer reconciles the token usage.
     """
     global client
     if client is None:
         logging.critical("Critical Error: OpenAI client not initialized before API call.")
         raise ValueError("OpenAI client not initialized.")
 
-    with open(file_path, "r", encoding='utf-8') as f:
-        js_code = f.read()
+    estimated_tokens = estimate_request_tokens(messages)
+    attempts = 0
+    rate_limit_retries = 0
+    while True:
+        with span("migrate.rate_limit_wait"):
+            rate_limiter.acquire(estimated_tokens)
+        try:
+            with span("migrate.api_wait", stream=kwargs.get("stream")):
+                response = client.chat.completions.create(
+                    model=MODEL,
+                    messages=messages,
+                    temperature=0,
+                    **kwargs
+                )
+        except openai.RateLimitError as e:
+            tracer.count("api_requests_total", status="rate_limited")
+            if getattr(e, "code", None) == "insufficient_quota" or rate_limit_retries >= MAX_RATE_LIMIT_RETRIES:
+                rate_limiter.on_rate_limit_failure()
+                raise
+            rate_limit_retries += 1
+            pause = rate_limiter.on_rate_limited(_retry_after_seconds(e))
+            logging.warning(f"Rate limited by the API; pausing requests for {pause:.1f}s.")
+            continue
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            tracer.count("api_requests_total", status="error")
+            attempts += 1
+            if attempts >= MAX_API_ATTEMPTS:
+                raise
+            delay = 2 ** attempts
+            logging.warning(f"Transient API error ({type(e).__name__}); retrying in {delay}s.")
+            time.sleep(delay)
+            continue
 
-    prompt = (
-        "Convert this React JavaScript component to TypeScript (.tsx). "
-        "Add prop/state/event types. "
-        "Return only the code. Do not include explanations or markdown.\n\n"
-        f"{js_code}"
-    )
+        rate_limiter.on_success(rate_limited=rate_limit_retries > 0)
+        tracer.count("api_requests_total", status="ok")
+        if kwargs.get("stream"):
+            return response
+        usage = getattr(response, "usage", None)
+        tracer.record_usage(usage, MODEL)
+        rate_limiter.reconcile(estimated_tokens, getattr(usage, "total_tokens", None))
+        return response
+
+def is_oversized(js_code):
+    """True if the component does not fit in one prompt and has to be converted in chunks."""
+    return max_prompt_tokens is not None and count_tokens(PROMPT_TEMPLATE.format(js_code=js_code), MODEL) > max_prompt_tokens
+
+def convert_chunk(chunk, context):
+    messages = build_chunk_messages(chunk, context)
+    cache_key = None
+    if migration_cache is not None:
+        cache_key = conversion_cache_key(MODEL, SYSTEM_MESSAGE, CHUNK_PROMPT_TEMPLATE, messages[-1]["content"])
+        cached = migration_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    response = create_chat_completion(messages)
+    tsx_code = strip_code_fences(response.choices[0].message.content.strip())
+    if cache_key is not None:
+        migration_cache.put(cache_key, MODEL, tsx_code)
+    return tsx_code
+
+def migrate_large_js_to_tsx(file_path, js_code):
+    """
+    Converts a component that is too large for one prompt: it is split at statement and inner
+    function boundaries, the chunks are converted in parallel with a shared context header, and
+    the stitched result is returned only if its AST matches the original.
+    """
+    count = functools.partial(count_tokens, model=MODEL)
+    plan = plan_chunks(js_code, max_prompt_tokens - count(CHUNK_PROMPT_TEMPLATE), count)
+    chunks = plan.chunks()
+    logging.info(f"'{file_path}' exceeds {max_prompt_tokens} prompt tokens; converting it in {len(chunks)} chunks...")
+    def convert(chunk):
+        with tracer.file_context(file_path), span("migrate.chunk"):
+            return convert_chunk(chunk, plan.context)
+
+    with ThreadPoolExecutor(max_workers=min(MAX_CHUNK_CONCURRENCY, len(chunks))) as executor:
+        converted = executor.map(convert, chunks)
+        converted = dict(zip((id(chunk) for chunk in chunks), converted))
+    tsx_code = stitch_chunks(plan.root, converted)
+
+    file_name = os.path.splitext(os.path.basename(file_path))[0] + ".tsx"
+    with span("migrate.verify_chunks"):
+        comparison = ast_utils.compare_migration(js_code, tsx_code, file_name)
+    if not comparison.equal:
+        raise ChunkingError(f"The stitched chunks do not match the original component's AST (at {comparison.divergence_path}).")
+    return tsx_code
+
+def build_incremental_messages(plan):
+    """Messages for re-converting the changed parts of an edited file (see incremental.py)."""
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": INCREMENTAL_PROMPT_TEMPLATE.format(
+            context=plan.context, parts=build_parts_prompt(plan.parts))}
+    ]
+
+def migrate_incrementally(job):
+    """
+    Re-migrates an edited file by converting only the declarations that changed since its last
+    migration and splicing them into the existing .tsx. Returns the new TSX, or None when the
+    file has to be migrated in full (no previous migration, or the edit cannot be applied as a diff).
+    """
+    previous_js = migration_manifest.load_source(job.key)
+    if previous_js is None or not os.path.exists(job.output_path):
+        return None
+    with span("migrate.read_file"):
+        with open(job.input_path, "rb") as f:
+            js_code = f.read().decode("utf-8")
+        with open(job.output_path, "r", encoding="utf-8", newline="") as f:
+            prior_tsx = f.read()
+    try:
+        with span("migrate.plan_incremental"):
+            plan = plan_incremental_migration(previous_js, js_code, prior_tsx, os.path.basename(job.output_path))
+    except NotIncrementalError as e:
+        logging.info(f"Migrating '{job.input_path}' in full: {e}.")
+        return None
+    if not plan.edits:
+        logging.info(f"No code changes in '{job.input_path}' since its last migration; keeping its output.")
+        return prior_tsx
+
+    logging.info(f"Re-converting {len(plan.parts)} changed declaration(s) of '{job.input_path}'...")
+    converted = {}
+    if plan.parts:
+        messages = build_incremental_messages(plan)
+        cache_key = None
+        response_text = None
+        if migration_cache is not None:
+            cache_key = conversion_cache_key(MODEL, SYSTEM_MESSAGE, INCREMENTAL_PROMPT_TEMPLATE, messages[-1]["content"])
+            response_text = migration_cache.get(cache_key)
+        if response_text is None:
+            response_text = create_chat_completion(messages).choices[0].message.content
+        converted = split_packed_response(response_text, [part.name for part in plan.parts])
+        if len(converted) < len(plan.parts):
+            logging.warning(f"Incomplete response for the changes to '{job.input_path}'; migrating it in full.")
+            return None
+        if cache_key is not None:
+            migration_cache.put(cache_key, MODEL, response_text)
+    converted = {name: strip_code_fences(code.strip()) for name, code in converted.items()}
+    tsx_code = apply_incremental_migration(plan, converted)
 
+    with span("migrate.verify_incremental"):
+        comparison = ast_utils.compare_migration(js_code, tsx_code, os.path.basename(job.output_path))
+    if not comparison.equal:
+        logging.warning(f"The spliced changes to '{job.input_path}' do not match its AST at "
+                        f"{comparison.divergence_path}; migrating it in full.")
+        return None
+    return tsx_code
+
+def migrate_js_to_tsx(file_path, js_code=None):
+    """
+    Migrates a JavaScript React component file to TypeScript (TSX) using OpenAI API.
+    A `js_code` that is passed in has already been read and missed the cache (see migrate_pack).
+    """
+    cache_checked = js_code is not None
+    if js_code is None:
+        with span("migrate.read_file"), open(file_path, "r", encoding='utf-8') as f:
+            js_code = f.read()
+
+    cache_key = None
+    if migration_cache is not None:
+        cache_key = conversion_cache_key(MODEL, SYSTEM_MESSAGE, PROMPT_TEMPLATE, js_code)
+        cached = None if cache_checked else migration_cache.get(cache_key)
+        if cached is not None:
+            logging.info(f"Using cached conversion for '{file_path}'.")
+            return cached
+
+    if is_oversized(js_code):
+        tsx_code = migrate_large_js_to_tsx(file_path, js_code)
+        if cache_key is not None:
+            migration_cache.put(cache_key, MODEL, tsx_code)
+        return tsx_code
+
+    with span("migrate.build_prompt"):
+        messages = build_messages(js_code)
     # Using the new API structure for chat completions
-    response = client.chat.completions.create(
-        model="gpt-4", # Model remains gpt-4
-        messages=[
-            {"role": "system", "content": "You are a code migration assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0
-    )
+    response = create_chat_completion(messages)
 
     # Accessing the response content according to the new structure
-    return response.choices[0].message.content.strip()
+    tsx_code = response.choices[0].message.content.strip()
+    if cache_key is not None:
+        migration_cache.put(cache_key, MODEL, tsx_code)
+    return tsx_code
 
-def main():
+def stream_js_to_tsx(file_path, output_path, max_output_ratio=DEFAULT_MAX_OUTPUT_RATIO, js_code=None):
     """
-    Main function to handle command-line arguments and orchestrate the migration process.
+    Streaming variant of migrate_js_to_tsx that writes the code to `output_path` (atomically) as it
+    arrives, stripping code fences on the fly. The stream is cut off with a RunawayResponseError
+    when the model starts writing prose or the output grows past `max_output_ratio` times the
+    input size. Returns (tsx_code, seconds_to_first_token or None for a cache hit).
     """
-    setup_logging()
+    cache_checked = js_code is not None
+    if js_code is None:
+        with span("migrate.read_file"), open(file_path, "r", encoding='utf-8') as f:
+            js_code = f.read()
+
+    cache_key = None
+    if migration_cache is not None:
+        cache_key = conversion_cache_key(MODEL, SYSTEM_MESSAGE, PROMPT_TEMPLATE, js_code)
+        cached = None if cache_checked else migration_cache.get(cache_key)
+        if cached is not None:
+            logging.info(f"Using cached conversion for '{file_path}'.")
+            tsx_code = strip_code_fences(cached)
+            atomic_write_text(output_path, tsx_code)
+            return tsx_code, None
+
+    if is_oversized(js_code):
+        tsx_code = migrate_large_js_to_tsx(file_path, js_code)
+        atomic_write_text(output_path, tsx_code)
+        if cache_key is not None:
+            migration_cache.put(cache_key, MODEL, tsx_code)
+        return tsx_code, None
+
+    with span("migrate.build_prompt"):
+        messages = build_messages(js_code)
+    started = time.perf_counter()
+    stream = create_chat_completion(messages, stream=True, stream_options={"include_usage": True})
+    stripper = StreamingFenceStripper(max(MIN_STREAM_OUTPUT_CHARS, int(len(js_code) * max_output_ratio)))
+    first_token_s = None
+    usage = None
+    parts = []
+    try:
+        with span("migrate.stream"), atomic_open(output_path) as f:
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if first_token_s is None:
+                    first_token_s = time.perf_counter() - started
+                code = stripper.feed(chunk.choices[0].delta.content)
+                if code:
+                    f.write(code)
+                    parts.append(code)
+                if stripper.closed:
+                    break  # Closing fence: anything after it is commentary we do not need to pay for.
+            code = stripper.finish()
+            f.write(code)
+            parts.append(code)
+            tsx_code = "".join(parts)
+            if not tsx_code:
+                raise ValueError("Empty response.")
+    finally:
+        stream.close()
+    tracer.record_usage(usage, MODEL)
+    rate_limiter.reconcile(estimate_request_tokens(messages), getattr(usage, "total_tokens", None))
+
+    if cache_key is not None:
+        migration_cache.put(cache_key, MODEL, tsx_code)
+    return tsx_code, first_token_s
+
+def strip_code_fences(tsx_code):
+    """Removes a surrounding ```tsx / ```typescript markdown fence, if the model added one."""
+    if tsx_code.startswith("```tsx"):
+        tsx_code = tsx_code[len("```tsx"):]
+        if tsx_code.endswith("```"):
+            tsx_code = tsx_code[:-len("```")]
+        tsx_code = tsx_code.strip()
+    elif tsx_code.startswith("```typescript"):
+        tsx_code = tsx_code[len("```typescript"):]
+        if tsx_code.endswith("```"):
+            tsx_code = tsx_code[:-len("```")]
+        tsx_code = tsx_code.strip()
+    return tsx_code
+
+def migrate_file(job, tsx_code=None, js_code=None):
+    """
+    Migrates one file and writes the result atomically. Never raises; failures are reported in the
+    result and, when a manifest is configured, recorded there so the next run retries them.
+    If `tsx_code` is given (e.g. split out of a packed response) no API request is made. A `js_code`
+    that is passed in has already missed the cache, which is then not looked up again.
+    """
+    with tracer.file_context(job.input_path), span("migrate.file"):
+        result = _migrate_file(job, tsx_code, js_code)
+    tracer.count("files_total", status="migrated" if result.success else "failed")
+    return result
+
+def _migrate_file(job, tsx_code, js_code):
+    input_file_path, output_file_path = job.input_path, job.output_path
+    filename = os.path.basename(input_file_path)
+    output_filename = os.path.basename(output_file_path)
+    started = time.perf_counter()
+    source_hash = None
+    first_token_s = None
+    incremental = False
+    logging.info(f"Migrating '{input_file_path}' to '{output_file_path}'...")
+    try:
+        os.makedirs(os.path.dirname(output_file_path) or ".", exist_ok=True)
+        with open(input_file_path, "rb") as f:
+            source_bytes = f.read()
+        source_hash = sha256_bytes(source_bytes)
+        if tsx_code is None and incremental_migration and migration_manifest is not None:
+            tsx_code = migrate_incrementally(job)
+            incremental = tsx_code is not None
+        if tsx_code is None and stream_output_ratio is not None:
+            tsx_code, first_token_s = stream_js_to_tsx(input_file_path, output_file_path, stream_output_ratio,
+                                                       js_code)
+        else:
+            if tsx_code is None:
+                tsx_code = migrate_js_to_tsx(input_file_path, js_code)
+            with span("migrate.strip_fences"):
+                tsx_code = strip_code_fences(tsx_code)
+            with span("migrate.write"):
+                atomic_write_text(output_file_path, tsx_code)
+        if migration_manifest is not None:
+            if incremental_migration:
+                migration_manifest.save_source(job.key, source_bytes)  # What the next edit is diffed against.
+            migration_manifest.record(
+                job.key, source_hash, MODEL, STATUS_MIGRATED, output_hash=sha256_bytes(tsx_code.encode('utf-8'))
+            )
+        logging.info(f"✅ Successfully migrated '{output_filename}'")
+        return MigrationResult(
+            input_file_path, output_file_path, True, time.perf_counter() - started, first_token_s=first_token_s,
+            incremental=incremental
+        )
+    except ChunkingError as e:
+        error = f"{type(e).__name__} - {e}"
+        logging.error(f"❌ Could not migrate oversized '{filename}' in chunks: {e}")
+    except RunawayResponseError as e:
+        error = f"{type(e).__name__} - {e}"
+        logging.error(f"❌ Stopped a runaway response while migrating '{filename}': {e}")
+    # Updated error handling for OpenAI API v1.x.x
+    except openai.APIError as e: # This is a base class for many API errors
+        error = f"{type(e).__name__} - {e}"
+        logging.error(f"❌ OpenAI API Error migrating '{filename}': {error}")
+    except Exception as e:
+        error = f"{type(e).__name__} - {e}"
+        logging.error(f"❌ An unexpected error occurred while migrating '{filename}': {error}")
+    if migration_manifest is not None:
+        migration_manifest.record(job.key, source_hash, MODEL, STATUS_FAILED, error=error)
+    return MigrationResult(input_file_path, output_file_path, False, time.perf_counter() - started, error)
+
+def migrate_pack(jobs):
+    """
+    Migrates several small files with a single request. Cached files are served from the cache;
+    every file whose section is missing or malformed in the response, or all of them if the
+    packed request fails, falls back to its own single-file request. Never raises.
+    """
+    sources = {}
+    results = []
+    for job in jobs:
+        try:
+            with open(job.input_path, "r", encoding='utf-8') as f:
+                js_code = f.read()
+        except OSError:
+            results.append(migrate_file(job))  # Reports the read error.
+            continue
+        if migration_cache is not None:
+            cached = migration_cache.get(conversion_cache_key(MODEL, SYSTEM_MESSAGE, PROMPT_TEMPLATE, js_code))
+            if cached is not None:
+                logging.info(f"Using cached conversion for '{job.input_path}'.")
+                results.append(migrate_file(job, cached))
+                continue
+        sources[job.key] = (job, js_code)
+
+    if len(sources) < 2:
+        return results + [migrate_file(job, js_code=js_code) for job, js_code in sources.values()]
+
+    logging.info(f"Migrating {len(sources)} small files in one packed request...")
+    try:
+        with span("migrate.pack", files=len(sources)):
+            response = create_chat_completion(
+                build_packed_messages([(key, js_code) for key, (_, js_code) in sources.items()])
+            )
+        sections = split_packed_response(response.choices[0].message.content, list(sources))
+    except Exception as e:
+        logging.warning(f"Packed request failed ({type(e).__name__} - {e}); migrating its files one by one.")
+        sections = {}
+
+    for key, (job, js_code) in sources.items():
+        tsx_code = sections.get(key)
+        if tsx_code is None:
+            logging.warning(f"No usable section for '{job.input_path}' in the packed response; retrying it alone.")
+            results.append(migrate_file(job, js_code=js_code))
+            continue
+        tsx_code = strip_code_fences(tsx_code)
+        if migration_cache is not None:
+            # Stored under the single-file key so either mode can reuse the conversion.
+            migration_cache.put(conversion_cache_key(MODEL, SYSTEM_MESSAGE, PROMPT_TEMPLATE, js_code), MODEL, tsx_code)
+        result = migrate_file(job, tsx_code)
+        result.packed = result.success
+        results.append(result)
+    return results
+
+def plan_work_units(jobs, pack_token_budget=None, pack_max_files=DEFAULT_PACK_MAX_FILES):
+    """
+    Groups jobs into work units (lists of jobs). Without a budget every job is its own unit;
+    otherwise files that fit in `pack_token_budget` estimated tokens are binned together.
+    """
+    if not pack_token_budget:
+        return [[job] for job in jobs]
+    units = []
+    small = []
+    for job in jobs:
+        try:
+            tokens = os.path.getsize(job.input_path) // CHARS_PER_TOKEN + 1
+        except OSError:
+            tokens = pack_token_budget
+        if incremental_migration and migration_manifest is not None and migration_manifest.has_source(job.key):
+            units.append([job])  # Edited files are re-migrated from their diff, not packed.
+        elif tokens < pack_token_budget:
+            small.append((job, tokens))
+        else:
+            units.append([job])
+    return units + pack_items(small, pack_token_budget, pack_max_files)
+
+def _run_unit(unit):
+    return migrate_pack(unit) if len(unit) > 1 else [migrate_file(unit[0])]
+
+def run_migrations(jobs, concurrency=1, pack_token_budget=None, pack_max_files=DEFAULT_PACK_MAX_FILES):
+    """
+    Migrates MigrationJobs using `concurrency` worker threads, packing small files into shared
+    requests when `pack_token_budget` is set. Returns the MigrationResults in completion order.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [
+            executor.submit(_run_unit, unit) for unit in plan_work_units(jobs, pack_token_budget, pack_max_files)
+        ]
+        try:
+            for future in as_completed(futures):
+                results.extend(future.result())
+        except KeyboardInterrupt:
+            # Let in-flight files finish (their writes are atomic) but drop everything queued.
+            for future in futures:
+                future.cancel()
+            raise
+    return results
+
+def _read_sources(jobs):
+    for job in jobs:
+        try:
+            with open(job.input_path, "r", encoding="utf-8") as f:
+                yield job, f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            logging.warning(f"Not deduplicating '{job.input_path}': {e}")
+
+def derive_copy(group, copy, tree_cache=None):
+    """
+    Migrates a copy from its group's migrated representative without an API request. Returns the
+    MigrationResult, or None if the rewritten .tsx does not match the copy under ast_utils.compare_migration.
+    """
+    job = copy.item
+    with tracer.file_context(job.input_path), span("dedupe.derive"):
+        try:
+            with open(group.representative.output_path, "r", encoding="utf-8") as f:
+                representative_tsx = f.read()
+            with open(job.input_path, "r", encoding="utf-8") as f:
+                source = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            copy.status, copy.divergence_path = dedupe.STATUS_FALLBACK, None
+            logging.warning(f"Could not derive '{job.input_path}' from its copy: {e}")
+            return None
+        tsx_code = dedupe.rewrite_for_copy(representative_tsx, group.fingerprint, copy.fingerprint)
+        comparison = dedupe.verify_copy(source, tsx_code, os.path.basename(job.output_path), tree_cache)
+    if not comparison.equal:
+        copy.status, copy.divergence_path = dedupe.STATUS_FALLBACK, comparison.divergence_path
+        logging.info(f"Migrating '{job.input_path}' on its own: the rewritten migration of "
+                     f"'{group.representative.input_path}' differs at {comparison.divergence_path}.")
+        return None
+    result = migrate_file(job, tsx_code)
+    copy.status = dedupe.STATUS_DERIVED if result.success else dedupe.STATUS_FALLBACK
+    result.deduplicated = result.success
+    return result if result.success else None
+
+def run_deduplicated_migrations(jobs, concurrency=1, pack_token_budget=None, pack_max_files=DEFAULT_PACK_MAX_FILES,
+                                tree_cache=None):
+    """
+    Like run_migrations, but copy-pasted components (see dedupe.py) are migrated once: only one
+    representative per group is sent to the API, and its .tsx is rewritten for the copies. Copies
+    whose rewrite fails verification, or whose representative failed, are migrated on their own.
+    Returns (results, duplicate groups).
+    """
+    with span("dedupe.fingerprint", files=len(jobs)):
+        groups = dedupe.find_duplicates(_read_sources(jobs), tree_cache)
+    copies = {id(copy.item) for group in groups for copy in group.copies}
+    logging.info(f"Deduplication: {len(copies)} file(s) are copies of {len(groups)} other(s).")
+    results = run_migrations([job for job in jobs if id(job) not in copies], concurrency, pack_token_budget,
+                             pack_max_files)
 
+    migrated = {result.input_path for result in results if result.success}
+    fallback = []
+    derivable = []
+    for group in groups:
+        for copy in group.copies:
+            if group.representative.input_path in migrated:
+                derivable.append((group, copy))
+            else:
+                copy.status = dedupe.STATUS_REPRESENTATIVE_FAILED
+                fallback.append(copy.item)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(derive_copy, group, copy, tree_cache): copy for group, copy in derivable}
+        for future in as_completed(futures):
+            result = future.result()
+            if result is None:
+                fallback.append(futures[future].item)
+            else:
+                results.append(result)
+    if fallback:
+        results.extend(run_migrations(fallback, concurrency, pack_token_budget, pack_max_files))
+    return results, groups
+
+def select_pending_jobs(jobs):
+    """Drops jobs whose manifest entry is up to date; returns (pending_jobs, skipped_count)."""
+    if migration_manifest is None:
+        return jobs, 0
+    pending = []
+    for job in jobs:
+        try:
+            up_to_date = migration_manifest.is_up_to_date(job.key, sha256_file(job.input_path), MODEL, job.output_path)
+        except OSError:
+            up_to_date = False
+        if up_to_date:
+            logging.info(f"Skipping '{job.input_path}': output is up to date.")
+        else:
+            pending.append(job)
+    return pending, len(jobs) - len(pending)
+
+def build_arg_parser():
+    """Command-line flags of run_migration.py; pipeline.py extends them."""
     parser = argparse.ArgumentParser(description="Migrate React JS components to TSX using OpenAI API.")
     parser.add_argument(
         "--input_dir",
@@ -90,7 +736,282 @@ def main():
         default="migrated",
         help="Directory to save migrated TSX files. (default: 'migrated')"
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=None,
+        help="Glob of source files to migrate, gitignore-style (e.g. 'src/**/*.jsx'); repeatable. "
+             f"(default: {' '.join(discovery.DEFAULT_INCLUDE)})"
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=None,
+        help="Glob of files or directories to skip, gitignore-style (e.g. '**/*.test.js', 'legacy/'); "
+             f"repeatable. (default: {' '.join(discovery.DEFAULT_EXCLUDE)})"
+    )
+    parser.add_argument(
+        "--no_ignore_files",
+        action="store_true",
+        help=f"Do not apply the {' and '.join(discovery.IGNORE_FILENAMES)} files found under --input_dir."
+    )
+    parser.add_argument(
+        "--shard",
+        type=discovery.parse_shard,
+        default=None,
+        metavar="INDEX/COUNT",
+        help="Migrate only shard INDEX of COUNT (e.g. 3/16), chosen by a hash of each file's path, so "
+             "several machines can split one input directory without coordinating. (default: all files)"
+    )
+    parser.add_argument(
+        "--summary_json",
+        default=None,
+        help="Write the run summary (counts, timings, failures) to this JSON file."
+    )
+    parser.add_argument(
+        "--merge_summaries",
+        nargs="+",
+        default=None,
+        metavar="SUMMARY_JSON",
+        help="Combine the --summary_json files of sharded runs into --summary_json (or the log) and exit."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of files to migrate in parallel. (default: 1)"
+    )
+    parser.add_argument(
+        "--requests_per_minute",
+        type=int,
+        default=None,
+        help="Request budget shared by all workers. (default: unlimited)"
+    )
+    parser.add_argument(
+        "--tokens_per_minute",
+        type=int,
+        default=None,
+        help="Estimated token budget shared by all workers. (default: unlimited)"
+    )
+    parser.add_argument(
+        "--cache_dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directory of the persistent conversion cache. (default: '{DEFAULT_CACHE_DIR}')"
+    )
+    parser.add_argument(
+        "--cache_max_mb",
+        type=int,
+        default=512,
+        help="Evict least recently used conversions beyond this size. (default: 512)"
+    )
+    parser.add_argument(
+        "--cache_max_age_days",
+        type=int,
+        default=DEFAULT_MAX_AGE_DAYS,
+        help=f"Evict conversions older than this. (default: {DEFAULT_MAX_AGE_DAYS})"
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Do not read or write the conversion cache."
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached conversions but store the fresh results."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-migrate every file, even if the manifest says its output is up to date."
+    )
+    parser.add_argument(
+        "--pack_token_budget",
+        type=int,
+        default=None,
+        help="Pack files smaller than this many estimated tokens into shared requests of up to this size. "
+             "(default: off)"
+    )
+    parser.add_argument(
+        "--pack_max_files",
+        type=int,
+        default=DEFAULT_PACK_MAX_FILES,
+        help=f"Maximum number of files in one packed request. (default: {DEFAULT_PACK_MAX_FILES})"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream completions and write outputs as they arrive, cutting off runaway responses."
+    )
+    parser.add_argument(
+        "--max_output_ratio",
+        type=float,
+        default=DEFAULT_MAX_OUTPUT_RATIO,
+        help=f"With --stream, abort responses larger than this multiple of the input size. "
+             f"(default: {DEFAULT_MAX_OUTPUT_RATIO})"
+    )
+    parser.add_argument(
+        "--max_prompt_tokens",
+        type=int,
+        default=None,
+        help="Components whose prompt exceeds this many tokens are converted in chunks. "
+             f"(default: {default_max_prompt_tokens(MODEL)} for {MODEL})"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-migrate edited files by converting only the declarations that changed since their last "
+             "migration and splicing them into the existing .tsx."
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Migrate components that differ only in identifier names, string literals or formatting once, "
+             "and derive the copies from that migration."
+    )
+    parser.add_argument(
+        "--dedupe_report",
+        default=None,
+        help="With --dedupe, write the duplicate groups and the API calls saved to this JSON file."
+    )
+    parser.add_argument(
+        "--trace_file",
+        default=None,
+        help="Write a JSON-lines trace of per-stage timing spans and token usage to this file."
+    )
+    parser.add_argument(
+        "--metrics_file",
+        default=None,
+        help="Write a Prometheus text-format summary (stage latency histograms, tokens) to this file."
+    )
+    return parser
+
+def make_job(input_dir, output_dir, rel_path):
+    """
+    MigrationJob for `rel_path` (relative to `input_dir`, `/`-separated), written to the same
+    relative path under `output_dir` with a .tsx extension. The manifest is keyed by `rel_path`.
+    """
+    return MigrationJob(
+        os.path.join(input_dir, *rel_path.split("/")),
+        discovery.output_path_for(output_dir, rel_path),
+        rel_path
+    )
+
+def discover_sources(args, recursive=True):
+    """Lazily yields the source files selected by the --input_dir/--include/--exclude/--shard flags."""
+    return discovery.discover_sources(
+        args.input_dir,
+        include=args.include or discovery.DEFAULT_INCLUDE,
+        exclude=args.exclude or discovery.DEFAULT_EXCLUDE,
+        use_ignore_files=not args.no_ignore_files,
+        shard=args.shard,
+        # An output or cache directory inside the input tree holds source snapshots, not sources.
+        skip_dirs=[args.output_dir, args.cache_dir],
+        recursive=recursive,
+    )
+
+def configure(args):
+    """Sets up the shared rate limiter, cache, manifest and instrumentation from parsed flags."""
+    global rate_limiter, migration_cache, migration_manifest, stream_output_ratio, max_prompt_tokens
+    global incremental_migration
+    if args.trace_file or args.metrics_file:
+        tracer.enable(args.trace_file)
+    rate_limiter = RateLimiter(args.requests_per_minute, args.tokens_per_minute)
+    stream_output_ratio = args.max_output_ratio if args.stream else None
+    max_prompt_tokens = args.max_prompt_tokens or default_max_prompt_tokens(MODEL)
+    incremental_migration = args.incremental
+    migration_manifest = MigrationManifest(args.output_dir)
+    if not args.no_cache:
+        migration_cache = MigrationCache(
+            args.cache_dir, args.cache_max_mb * 1024 * 1024, args.cache_max_age_days, refresh=args.refresh
+        )
+
+def shutdown(args):
+    """Flushes the manifest, cache and metrics set up by configure()."""
+    migration_manifest.save()
+    if migration_cache is not None:
+        migration_cache.close()
+    if args.metrics_file:
+        tracer.write_prometheus(args.metrics_file)
+    tracer.close()
+
+def build_summary(args, discovered, results, skipped, wall_time):
+    """JSON-serializable summary of one run (or one shard of it), as written by --summary_json."""
+    return {
+        "shard": f"{args.shard[0]}/{args.shard[1]}" if args.shard else None,
+        "discovered": discovered,
+        "migrated": sum(1 for r in results if r.success),
+        "failed": sum(1 for r in results if not r.success),
+        "skipped": skipped,
+        "packed": sum(1 for r in results if r.packed),
+        "incremental": sum(1 for r in results if r.incremental),
+        "deduplicated": sum(1 for r in results if r.deduplicated),
+        "wall_time_s": round(wall_time, 3),
+        "rate_limited_retries": rate_limiter.rate_limited_count,
+        "rate_limited_failures": rate_limiter.rate_limited_failures,
+        "cache_hits": migration_cache.hits if migration_cache is not None else 0,
+        "cache_misses": migration_cache.misses if migration_cache is not None else 0,
+        "failures": sorted(
+            ({"file": r.input_path, "error": r.error} for r in results if not r.success), key=lambda f: f["file"]
+        ),
+    }
+
+SUMMARY_COUNTS = (
+    "discovered", "migrated", "failed", "skipped", "packed", "incremental", "deduplicated", "rate_limited_retries",
+    "rate_limited_failures", "cache_hits", "cache_misses",
+)
+
+def merge_summaries(summaries):
+    """
+    Combines per-shard summaries: counts and failures are added up, wall time is the slowest
+    shard's. `missing_shards` lists the shards of a sharded run that are not among `summaries`.
+    """
+    merged = {key: sum(summary.get(key, 0) for summary in summaries) for key in SUMMARY_COUNTS}
+    merged["wall_time_s"] = max((summary.get("wall_time_s", 0) for summary in summaries), default=0)
+    merged["failures"] = sorted(
+        (failure for summary in summaries for failure in summary.get("failures", [])), key=lambda f: f["file"]
+    )
+    shards = [discovery.parse_shard(summary["shard"]) for summary in summaries if summary.get("shard")]
+    merged["shards"] = sorted(f"{index}/{count}" for index, count in shards)
+    counts = {count for _, count in shards}
+    merged["missing_shards"] = sorted(
+        f"{index}/{count}" for count in counts for index in range(1, count + 1) if (index, count) not in shards
+    )
+    return merged
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    atomic_write_text(path, json.dumps(data, indent=2) + "\n")
+
+def main_merge_summaries(args):
+    """--merge_summaries: combines the summaries of sharded runs instead of migrating."""
+    summaries = []
+    for path in args.merge_summaries:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                summaries.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logging.error(f"Error reading summary '{path}': {e}")
+            sys.exit(1)
+    merged = merge_summaries(summaries)
+    if args.summary_json:
+        write_json(args.summary_json, merged)
+        logging.info(f"Merged {len(summaries)} summaries into '{args.summary_json}'.")
+    logging.info(f"Summary: {merged['migrated']} file(s) migrated, {merged['failed']} failed, "
+                 f"{merged['skipped']} skipped, out of {merged['discovered']} discovered "
+                 f"(slowest shard {merged['wall_time_s']:.1f}s).")
+    if merged["missing_shards"]:
+        logging.warning(f"Missing summaries for shard(s) {', '.join(merged['missing_shards'])}.")
+    return merged
+
+def main(argv=None):
+    """
+    Main function to handle command-line arguments and orchestrate the migration process.
+    """
+    setup_logging()
+    args = build_arg_parser().parse_args(argv)
+    if args.merge_summaries:
+        return main_merge_summaries(args)
 
     logging.info("Starting migration process...")
     load_env_and_setup_api_key() # This now initializes the global 'client'
@@ -98,10 +1019,11 @@ def main():
     os.makedirs(args.output_dir, exist_ok=True)
     logging.info(f"Output directory '{args.output_dir}' ensured.")
 
-    logging.info(f"Scanning '{args.input_dir}' for .js files...")
+    shard_note = f" (shard {args.shard[0]}/{args.shard[1]})" if args.shard else ""
+    logging.info(f"Scanning '{args.input_dir}' for source files{shard_note}...")
 
     try:
-        js_files = [f for f in os.listdir(args.input_dir) if f.endswith(".js")]
+        jobs = [make_job(args.input_dir, args.output_dir, rel_path) for rel_path in discover_sources(args)]
     except FileNotFoundError:
         logging.error(f"Error: Input directory '{args.input_dir}' not found.")
         sys.exit(1)
@@ -109,51 +1031,70 @@ def main():
         logging.error(f"Error listing files in input directory '{args.input_dir}': {e}")
         sys.exit(1)
 
-    if not js_files:
-        logging.info(f"No .js files found in '{args.input_dir}'. Nothing to migrate.")
-        return
+    if not jobs:
+        logging.info(f"No source files found in '{args.input_dir}'{shard_note}. Nothing to migrate.")
+        if args.summary_json:
+            # An empty shard still reports in, so merging does not list it as missing.
+            write_json(args.summary_json, build_summary(args, 0, [], 0, 0.0))
+            logging.info(f"Summary written to '{args.summary_json}'.")
+        return []
 
-    logging.info(f"Found {len(js_files)} .js files to migrate.")
+    logging.info(f"Found {len(jobs)} source files to migrate{shard_note}.")
 
-    successful_migrations = 0
-    failed_migrations = 0
+    configure(args)
+    discovered = len(jobs)
+    skipped_migrations = 0
+    if not args.force:
+        jobs, skipped_migrations = select_pending_jobs(jobs)
 
-    for filename in js_files:
-        input_file_path = os.path.join(args.input_dir, filename)
-        output_filename = filename.replace(".js", ".tsx")
-        output_file_path = os.path.join(args.output_dir, output_filename)
+    started = time.perf_counter()
+    duplicate_groups = None
+    try:
+        if args.dedupe:
+            tree_cache = None if args.no_cache else ast_utils.NormalizedAstCache(ast_utils.DEFAULT_NORMALIZED_AST_CACHE)
+            results, duplicate_groups = run_deduplicated_migrations(
+                jobs, args.concurrency, args.pack_token_budget, args.pack_max_files, tree_cache
+            )
+        else:
+            results = run_migrations(jobs, args.concurrency, args.pack_token_budget, args.pack_max_files)
+    finally:
+        shutdown(args)
+    wall_time = time.perf_counter() - started
 
-        logging.info(f"Migrating '{input_file_path}' to '{output_file_path}'...")
-        try:
-            tsx_code = migrate_js_to_tsx(input_file_path)
-
-            if tsx_code.startswith("```tsx"):
-                tsx_code = tsx_code[len("```tsx"):]
-                if tsx_code.endswith("```"):
-                    tsx_code = tsx_code[:-len("```")]
-                tsx_code = tsx_code.strip()
-            elif tsx_code.startswith("```typescript"):
-                tsx_code = tsx_code[len("```typescript"):]
-                if tsx_code.endswith("```"):
-                    tsx_code = tsx_code[:-len("```")]
-                tsx_code = tsx_code.strip()
-
-            with open(output_file_path, "w", encoding='utf-8') as out_f:
-                out_f.write(tsx_code)
-            logging.info(f"✅ Successfully migrated '{output_filename}'")
-            successful_migrations += 1
-        # Updated error handling for OpenAI API v1.x.x
-        except openai.APIError as e: # This is a base class for many API errors
-            logging.error(f"❌ OpenAI API Error migrating '{filename}': {type(e).__name__} - {e}")
-            failed_migrations += 1
-        except Exception as e:
-            logging.error(f"❌ An unexpected error occurred while migrating '{filename}': {type(e).__name__} - {e}")
-            failed_migrations += 1
-        # Continue to the next file even if an error occurs
+    successful_migrations = sum(1 for r in results if r.success)
+    failed_migrations = len(results) - successful_migrations
+    files_per_minute = successful_migrations / wall_time * 60 if wall_time > 0 else 0.0
 
     logging.info("Migration process complete.")
     logging.info(f"Summary: {successful_migrations} file(s) migrated successfully.")
     logging.info(f"         {failed_migrations} file(s) failed to migrate.")
+    logging.info(f"         {skipped_migrations} file(s) skipped (already up to date).")
+    logging.info(f"         {wall_time:.1f}s wall time, {files_per_minute:.1f} file(s)/minute "
+                 f"({rate_limiter.rate_limited_count} rate-limited request(s) retried, "
+                 f"{rate_limiter.rate_limited_failures} given up).")
+    if args.pack_token_budget:
+        packed_files = sum(1 for r in results if r.packed)
+        logging.info(f"         {packed_files} file(s) migrated through packed requests.")
+    if args.incremental:
+        incremental_files = sum(1 for r in results if r.incremental)
+        logging.info(f"         {incremental_files} file(s) re-migrated from their changes only.")
+    if duplicate_groups is not None:
+        dedupe_report = dedupe.build_report(duplicate_groups, len(jobs), key=lambda job: job.key)
+        logging.info(f"         {dedupe_report['derived']} file(s) derived from a migrated copy "
+                     f"({dedupe_report['api_calls_saved']} API call(s) saved, {dedupe_report['fallback']} copies "
+                     f"failed verification and were migrated on their own).")
+        if args.dedupe_report:
+            write_json(args.dedupe_report, dedupe_report)
+            logging.info(f"         Dedupe report written to '{args.dedupe_report}'.")
+    first_token_times = [r.first_token_s for r in results if r.first_token_s is not None]
+    if first_token_times:
+        logging.info(f"         Median time to first token: {statistics.median(first_token_times):.2f}s.")
+    if migration_cache is not None:
+        logging.info(f"         Cache: {migration_cache.hits} hit(s), {migration_cache.misses} miss(es).")
+    if args.summary_json:
+        write_json(args.summary_json, build_summary(args, discovered, results, skipped_migrations, wall_time))
+        logging.info(f"         Summary written to '{args.summary_json}'.")
+    return results
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,183 @@
+import re
+
+# A line at column 0 that opens like this is the model talking, not code.
+PROSE_LINE_RE = re.compile(
+    r"^(?:Here(?:'s| is| are)\b|Sure\b|Certainly\b|Note:|Explanation:|In this (?:code|component|version)\b|"
+    r"This (?:component|code|file|version)\b|I(?:'ve| have| converted| added)\b|"
+    r"The (?:above|converted|updated)\b|#{1,6} |\*\*)"
+)
+FENCE = "```"
+_WORD_RE = re.compile(r"[\w$]+")
+# Words after which `/` starts a regex rather than a division.
+_EXPRESSION_KEYWORDS = frozenset({"return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw",
+                                  "case", "do", "else", "yield", "await"})
+
+
+class RunawayResponseError(Exception):
+    """A streamed completion was cut off because it turned into prose or grew past its budget."""
+
+
+class _LexicalState:
+    """
+    What the code emitted so far leaves open at the end of its last line: template literals (with
+    their ${...} expressions), a block comment and brackets. Strings and regexes cannot span lines.
+    A rough scanner, not a parser; it only decides where prose and a closing fence can start.
+    """
+
+    def __init__(self):
+        self.modes = [0]  # Open brackets of a code context, or "`" for a template literal.
+        self.in_comment = False
+        self.after_value = False  # The last token ends an expression, so `/` is a division.
+
+    @property
+    def in_literal(self):
+        return self.in_comment or "`" in self.modes
+
+    @property
+    def at_top_level(self):
+        return not self.in_comment and self.modes == [0]
+
+    def scan(self, line):
+        i, length = 0, len(line)
+        while i < length:
+            char = line[i]
+            if self.in_comment:
+                end = line.find("*/", i)
+                if end < 0:
+                    return
+                self.in_comment = False
+                i = end + 2
+            elif self.modes[-1] == "`":
+                if char == "\\":
+                    i += 2
+                    continue
+                if char == "`":
+                    self.modes.pop()
+                    self.after_value = True
+                elif line.startswith("${", i):
+                    self.modes.append(0)
+                    self.after_value = False
+                    i += 1
+                i += 1
+            elif char.isspace():
+                i += 1
+            elif line.startswith("//", i):
+                return
+            elif line.startswith("/*", i):
+                self.in_comment = True
+                i += 2
+            elif char in "'\"" or char == "/" and not self.after_value:
+                i = self._skip_literal(line, i, char)
+                self.after_value = True
+            elif char == "`":
+                self.modes.append("`")
+                i += 1
+            elif _WORD_RE.match(line, i):
+                word = _WORD_RE.match(line, i).group()
+                self.after_value = word not in _EXPRESSION_KEYWORDS
+                i += len(word)
+            else:
+                if char in "([{":
+                    self.modes[-1] += 1
+                elif char in ")]}":
+                    if self.modes[-1] == 0 and len(self.modes) > 1:
+                        self.modes.pop()  # End of a ${...} expression.
+                    else:
+                        self.modes[-1] = max(0, self.modes[-1] - 1)
+                self.after_value = char in ")]"
+                i += 1
+
+    @staticmethod
+    def _skip_literal(line, start, quote):
+        """End of the string or regex literal starting at `start` (or of the line if it is unterminated)."""
+        i = start + 1
+        in_class = False
+        while i < len(line):
+            char = line[i]
+            if char == "\\":
+                i += 1
+            elif quote == "/" and char in "[]":
+                in_class = char == "["
+            elif char == quote and not in_class:
+                return i + 1
+            i += 1
+        return i
+
+
+class StreamingFenceStripper:
+    """
+    Incremental equivalent of strip_code_fences for a streamed completion.
+
+    `feed()` takes each text delta and returns the part that is known to be code, so it can be
+    written out immediately. Leading and trailing blank lines and a surrounding ```lang fence are
+    dropped; once the closing fence arrives `closed` is set and the caller can stop reading.
+    Raises RunawayResponseError when a line looks like prose or when more than `max_chars`
+    characters have been received. Lines inside a template literal, a block comment or an open
+    bracket are never taken for prose or for the closing fence.
+    """
+
+    def __init__(self, max_chars=None):
+        self.max_chars = max_chars
+        self.received_chars = 0
+        self.closed = False
+        self._buffer = ""
+        self._started = False
+        self._fenced = False
+        self._emitted = False
+        self._blank_lines = 0
+        self._trailing_whitespace = ""
+        self._state = _LexicalState()
+
+    def feed(self, text):
+        if self.closed or not text:
+            return ""
+        self.received_chars += len(text)
+        if self.max_chars is not None and self.received_chars > self.max_chars:
+            raise RunawayResponseError(f"Response exceeded {self.max_chars} characters.")
+        self._buffer += text
+        out = []
+        while not self.closed:
+            newline = self._buffer.find("\n")
+            if newline < 0:
+                break
+            line, self._buffer = self._buffer[:newline], self._buffer[newline + 1:]
+            out.append(self._line(line, complete=True))
+        return "".join(out)
+
+    def finish(self):
+        """Returns the remaining code once the stream has ended."""
+        if self.closed:
+            return ""
+        line, self._buffer = self._buffer.rstrip(), ""
+        if self._fenced and line.endswith(FENCE) and line.strip() != FENCE and not self._state.in_literal:
+            line = line[:-len(FENCE)].rstrip()  # Closing fence right after the last code, as strip_code_fences allows.
+        return self._line(line, complete=False)
+
+    def _line(self, line, complete):
+        stripped = line.strip()
+        if not self._started:
+            if not stripped:
+                return ""  # Leading blank lines.
+            self._started = True
+            if stripped.startswith(FENCE) and complete:
+                self._fenced = True
+                return ""
+        if self._fenced and stripped == FENCE and not self._state.in_literal:
+            self.closed = True
+            return ""
+        if not stripped:
+            self._blank_lines += 1
+            return ""
+        if self._state.at_top_level and PROSE_LINE_RE.match(line):
+            raise RunawayResponseError(f"Response turned into prose: {line[:80]!r}")
+        self._state.scan(line)
+        # Blank lines and trailing whitespace are only written once more code follows, which
+        # drops them at the end of the response.
+        code = line.rstrip()
+        out = ""
+        if self._emitted:
+            out = self._trailing_whitespace + "\n" * (self._blank_lines + 1)
+        self._trailing_whitespace = line[len(code):]
+        self._emitted = True
+        self._blank_lines = 0
+        return out + code
@@ -0,0 +1,48 @@
+"""Shared helpers: a scripted stand-in for the OpenAI client and a skip for machines without TypeScript."""
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ast_utils  # noqa: E402
+import run_migration  # noqa: E402
+
+requires_typescript = pytest.mark.skipif(
+    ast_utils.generate_js_from_tsx("const a: number = 1;") is None,
+    reason="needs node and the typescript package (see generate_ts_ast.js)",
+)
+
+
+class FakeClient:
+    """Answers chat completions with `respond(prompt)` and records every prompt it was sent."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.prompts = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        with self._lock:
+            self.prompts.append(prompt)
+        message = SimpleNamespace(content=self.respond(prompt))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def migration(monkeypatch):
+    """run_migration with its module globals reset to a plain run; tests set what they need."""
+    for name, value in [("client", None), ("migration_cache", None), ("migration_manifest", None),
+                        ("stream_output_ratio", None), ("max_prompt_tokens", None), ("incremental_migration", False)]:
+        monkeypatch.setattr(run_migration, name, value)
+    return run_migration
+
+
+def add_types(js_code):
+    """What the fake model does to JS: annotates the event handlers' parameters."""
+    return js_code.replace("(event)", "(event: React.ChangeEvent<HTMLInputElement>)")
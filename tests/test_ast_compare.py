@@ -0,0 +1,61 @@
+import pytest
+
+import ast_utils
+
+BASE = "function f(a, b) { return a + b; }\nconst x = 1;"
+
+
+def normalized(source):
+    return ast_utils.normalize_for_comparison(ast_utils.generate_js_ast_lenient(source, lean=True))
+
+
+@pytest.mark.parametrize("other, path", [
+    (BASE, None),
+    ("function f(a, b) {\n  // Reformatted.\n  return a + b;\n}\nconst x = 1;", None),
+    ("function f(a, c) { return a + b; }\nconst x = 1;", "$.body[0].params[1].name"),
+    ("function f(a, b) { return a - b; }\nconst x = 1;", "$.body[0].body.body[0].argument.operator"),
+    ("function f(a, b) { return a + b; }", "$.body[1]"),
+    (BASE + "\nconst y = 2;", "$.body[2]"),
+    ("function f(a, b) { return a + b; }\nconst x = 2;", "$.body[1].declarations[0].init.value"),
+])
+def test_first_divergence_paths(other, path):
+    assert ast_utils.find_first_divergence(normalized(BASE), normalized(other)) == path
+
+
+@pytest.mark.parametrize("left, right, path", [
+    ({"a": 1}, {"b": 1}, "$.a"),
+    ({"a": [1]}, {"a": {"x": 1}}, "$.a"),
+    ({"a": [1, 2]}, {"a": [1, "2"]}, "$.a[1]"),
+    ({"a": None}, {"a": None}, None),
+])
+def test_divergence_paths_of_plain_trees(left, right, path):
+    assert ast_utils.find_first_divergence(left, right) == path
+
+
+def test_compare_asts_agrees_with_a_full_comparison():
+    for other in (BASE, "function f(a, c) { return a + b; }\nconst x = 1;", "function f(a, b) { return a + b; }"):
+        js_ast, other_ast = ast_utils.generate_js_ast_lenient(BASE), ast_utils.generate_js_ast_lenient(other)
+        detailed = ast_utils.compare_asts_detailed(js_ast, other_ast)
+
+        assert ast_utils.compare_asts(js_ast, other_ast) == detailed.equal == (normalized(BASE) == normalized(other))
+        assert detailed.divergence_path == ast_utils.find_first_divergence(normalized(BASE), normalized(other))
+
+
+def test_hash_entries_compare_per_statement():
+    entry = ast_utils.build_hash_entry(normalized(BASE))
+
+    assert ast_utils.compare_hash_entries(entry, ast_utils.build_hash_entry(normalized(BASE))).equal
+    changed = ast_utils.build_hash_entry(normalized("function f(a, b) { return a + b; }\nconst x = 2;"))
+    assert ast_utils.compare_hash_entries(entry, changed).divergence_path == "$.body[1]"
+    shorter = ast_utils.build_hash_entry(normalized("function f(a, b) { return a + b; }"))
+    assert ast_utils.compare_hash_entries(entry, shorter).divergence_path == "$.body[1]"
+    empty = ast_utils.build_hash_entry(normalized(""))
+    assert ast_utils.compare_hash_entries(entry, empty).divergence_path == "$.body"
+
+
+def test_subtree_hashes_depend_on_structure_not_identity():
+    hasher = ast_utils.SubtreeHasher()
+
+    assert hasher.digest(normalized(BASE)) == hasher.digest(normalized(BASE))
+    assert hasher.digest({"a": [1, "1"]}) != hasher.digest({"a": ["1", 1]})
+    assert hasher.digest({"a": 1, "b": 2}) == hasher.digest({"b": 2, "a": 1})
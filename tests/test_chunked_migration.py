@@ -0,0 +1,75 @@
+from conftest import FakeClient, add_types, requires_typescript
+
+import ast_utils
+
+HANDLER = """
+  const handle{name} = (event) => {{
+    const value = event.target.value.trim();
+    if (value.length > {limit}) {{
+      setErrors((errors) => ({{ ...errors, {key}: "Too long" }}));
+      return;
+    }}
+    setForm((form) => ({{ ...form, {key}: value }}));
+  }};
+"""
+FIELD = """      <label htmlFor="{key}">{name}</label>
+      <input id="{key}" value={{form.{key}}} onChange={{handle{name}}} />
+"""
+NAMES = ["First", "Last", "Street", "City", "Zip", "Country", "Phone", "Email"]
+
+
+def large_form():
+    handlers = "".join(HANDLER.format(name=name, key=name.lower(), limit=10 + i) for i, name in enumerate(NAMES))
+    fields = "".join(FIELD.format(name=name, key=name.lower()) for name in NAMES)
+    return (
+        'import React, { useState } from "react";\n\n'
+        "export default function AddressForm({ onSubmit }) {\n"
+        "  const [form, setForm] = useState({});\n"
+        "  const [errors, setErrors] = useState({});\n"
+        f"{handlers}\n"
+        "  return (\n"
+        "    <form onSubmit={() => onSubmit(form)}>\n"
+        f"{fields}"
+        "      {Object.keys(errors).length > 0 && <p className=\"error\">Please fix the errors.</p>}\n"
+        "    </form>\n"
+        "  );\n"
+        "}\n"
+    )
+
+
+def convert_chunk(prompt):
+    return "```tsx\n" + add_types(prompt.split("Code to convert:\n", 1)[1]) + "\n```"
+
+
+def migrate_in_chunks(migration, tmp_path, respond):
+    source = tmp_path / "AddressForm.jsx"
+    source.write_text(large_form(), encoding="utf-8")
+    migration.client = FakeClient(respond)
+    migration.max_prompt_tokens = 600
+    assert migration.is_oversized(large_form())
+    job = migration.MigrationJob(str(source), str(tmp_path / "out" / "AddressForm.tsx"), "AddressForm.jsx")
+    return migration.migrate_file(job), job
+
+
+@requires_typescript
+def test_oversized_jsx_component_is_converted_in_chunks_and_verified(migration, tmp_path):
+    result, job = migrate_in_chunks(migration, tmp_path, convert_chunk)
+
+    assert result.success, result.error
+    assert len(migration.client.prompts) > 1
+    with open(job.output_path, encoding="utf-8") as f:
+        tsx_code = f.read()
+    assert tsx_code.count("event: React.ChangeEvent<HTMLInputElement>") == len(NAMES)
+    assert "@@FRAGMENT" not in tsx_code
+    assert ast_utils.compare_migration(large_form(), tsx_code, "AddressForm.tsx").equal
+
+
+@requires_typescript
+def test_stitched_chunks_that_change_the_code_are_rejected(migration, tmp_path):
+    def change_message(prompt):
+        return convert_chunk(prompt).replace('"Too long"', '"Invalid"')
+
+    result, job = migrate_in_chunks(migration, tmp_path, change_message)
+
+    assert not result.success
+    assert result.error.startswith("ChunkingError")
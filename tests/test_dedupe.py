@@ -0,0 +1,79 @@
+from conftest import FakeClient, add_types, requires_typescript
+
+import ast_utils
+import dedupe
+
+BUTTON = """import React from "react";
+
+export function SaveButton({ onSave, disabled }) {
+  const handleClick = (event) => {
+    event.preventDefault();
+    onSave();
+  };
+  return <button className="primary" disabled={disabled} onClick={handleClick}>Save</button>;
+}
+"""
+COPY = (BUTTON.replace("SaveButton", "DeleteButton").replace("handleClick", "handlePress")
+        .replace('"primary"', '"danger"').replace(">Save<", ">Delete<"))
+
+
+def convert(prompt):
+    return add_types(prompt.split("\n\n", 1)[1]).replace(
+        "event: React.ChangeEvent<HTMLInputElement>", "event: React.MouseEvent<HTMLButtonElement>")
+
+
+def write_jobs(migration, tmp_path, sources):
+    jobs = []
+    for name, source in sources.items():
+        (tmp_path / f"{name}.jsx").write_text(source, encoding="utf-8")
+        jobs.append(migration.MigrationJob(str(tmp_path / f"{name}.jsx"), str(tmp_path / "out" / f"{name}.tsx"), name))
+    return jobs
+
+
+@requires_typescript
+def test_copy_is_derived_from_its_representative(migration, tmp_path):
+    migration.client = FakeClient(convert)
+    jobs = write_jobs(migration, tmp_path, {"SaveButton": BUTTON, "DeleteButton": COPY})
+
+    results, groups = migration.run_deduplicated_migrations(jobs)
+
+    assert all(result.success for result in results)
+    assert len(migration.client.prompts) == 1
+    report = dedupe.build_report(groups, len(jobs), key=lambda job: job.key)
+    assert report["api_calls_saved"] == 1
+    with open(jobs[1].output_path, encoding="utf-8") as f:
+        tsx_code = f.read()
+    assert "export function DeleteButton({ onSave, disabled })" in tsx_code
+    assert "onClick={handlePress}" in tsx_code
+    assert 'className="danger"' in tsx_code and ">Delete<" in tsx_code
+    assert "event: React.MouseEvent<HTMLButtonElement>" in tsx_code
+
+
+def fingerprint(source):
+    return dedupe.fingerprint_tree(ast_utils.normalized_js_source(source))
+
+
+LIST = """import { useMemo } from "react";
+
+export function ItemCount({ items }) {
+  const total = useMemo(() => items.length, [items]);
+  return <span>{total}</span>;
+}
+"""
+
+
+def test_renamed_locals_and_strings_share_a_fingerprint():
+    renamed = LIST.replace("ItemCount", "TagCount").replace("total", "count")
+    assert fingerprint(renamed).digest == fingerprint(LIST).digest
+    assert fingerprint(BUTTON).digest == fingerprint(COPY).digest
+
+
+def test_free_names_property_names_and_module_specifiers_stay_literal():
+    variants = [
+        LIST.replace("useMemo", "useCallback"),
+        LIST.replace('"react"', '"preact"'),
+        LIST.replace("items.length", "items.size"),
+        LIST.replace("{ items }", "{ entries }").replace("items", "entries"),
+    ]
+    for variant in variants:
+        assert fingerprint(variant).digest != fingerprint(LIST).digest, variant
@@ -0,0 +1,68 @@
+import queue
+from types import SimpleNamespace
+
+import discovery
+import pipeline
+
+
+def make_tree(root, files):
+    for rel_path, text in files.items():
+        path = root.joinpath(*rel_path.split("/"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+
+
+def test_sources_that_share_an_output_are_reported_once(tmp_path, caplog):
+    make_tree(tmp_path, {"ui/Button.js": "", "ui/Button.jsx": "", "ui/Card.jsx": ""})
+
+    assert list(discovery.discover_sources(str(tmp_path))) == ["ui/Button.js", "ui/Card.jsx"]
+    assert list(discovery.discover_sources(str(tmp_path))) == ["ui/Button.js", "ui/Card.jsx"]
+    warnings = [record.message for record in caplog.records if "same output" in record.message]
+    assert len(warnings) == 1 and "'ui/Button.jsx'" in warnings[0]
+
+
+def pipeline_args(tmp_path, **overrides):
+    args = dict(input_dir=str(tmp_path / "src"), output_dir=str(tmp_path / "src" / "migrated"), include=None,
+                exclude=None, no_ignore_files=False, shard=None, cache_dir=str(tmp_path / "cache"), sources=[],
+                concurrency=1, queue_size=100)
+    return SimpleNamespace(**{**args, **overrides})
+
+
+def emitted(stage):
+    items = []
+    while True:
+        try:
+            item = stage.migrate_queue.get_nowait()
+        except queue.Empty:
+            return items
+        if item is not pipeline._DONE:
+            items.append(item)
+
+
+def test_pipeline_discovers_sources_like_run_migration(tmp_path):
+    make_tree(tmp_path / "src", {
+        "App.jsx": "", "ui/Button.js": "", "ui/legacy/Old.js": "", "ui/legacy/.migrationignore": "Old.js\n",
+        "node_modules/lib/index.js": "", "migrated/App.tsx": "", "notes.txt": "",
+    })
+    stage = pipeline.Pipeline(pipeline_args(tmp_path))
+    stage.extract()
+    assert emitted(stage) == ["App.jsx", "ui/Button.js"]
+
+    sharded = []
+    for index in (1, 2):
+        stage = pipeline.Pipeline(pipeline_args(tmp_path, shard=(index, 2)))
+        stage.extract()
+        sharded.extend(emitted(stage))
+    assert sorted(sharded) == ["App.jsx", "ui/Button.js"]
+
+
+def test_pipeline_skips_a_later_file_with_the_same_output(tmp_path):
+    make_tree(tmp_path / "src", {"Button.jsx": ""})
+    stage = pipeline.Pipeline(pipeline_args(tmp_path))
+    seen = {}
+    stage._last_extracted = 0.0
+    stage._emit_new_components(seen)
+    make_tree(tmp_path / "src", {"Button.js": ""})
+    stage._emit_new_components(seen)
+
+    assert emitted(stage) == ["Button.jsx"]
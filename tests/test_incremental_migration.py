@@ -0,0 +1,73 @@
+from conftest import FakeClient, add_types, requires_typescript
+
+import ast_utils
+from migration_manifest import MigrationManifest
+
+COMPONENT = """import React, { useState } from "react";
+
+export default function Profile({ user, onSave }) {
+  const [name, setName] = useState(user.name);
+  const [bio, setBio] = useState(user.bio);
+
+  const handleName = (event) => {
+    setName(event.target.value);
+  };
+
+  const handleBio = (event) => {
+    setBio(event.target.value);
+  };
+
+  return (
+    <form onSubmit={() => onSave({ name, bio })}>
+      <input value={name} onChange={handleName} />
+      <textarea value={bio} onChange={handleBio} />
+    </form>
+  );
+}
+"""
+EDITED = COMPONENT.replace("setBio(event.target.value);", "setBio(event.target.value.slice(0, 280));")
+
+
+def convert(prompt):
+    # Full prompts end with the code; incremental prompts frame each part, and the framing is kept.
+    if "==== FILE:" in prompt:
+        return add_types(prompt)
+    return add_types(prompt.split("\n\n", 1)[1])
+
+
+@requires_typescript
+def test_one_handler_edit_is_spliced_and_accepted(migration, tmp_path):
+    source = tmp_path / "Profile.jsx"
+    source.write_text(COMPONENT, encoding="utf-8")
+    migration.client = FakeClient(convert)
+    migration.migration_manifest = MigrationManifest(str(tmp_path / "out"))
+    migration.incremental_migration = True
+    job = migration.MigrationJob(str(source), str(tmp_path / "out" / "Profile.tsx"), "Profile.jsx")
+    assert migration.migrate_file(job).success
+
+    source.write_text(EDITED, encoding="utf-8")
+    migration.client.prompts.clear()
+    result = migration.migrate_file(job)
+
+    assert result.success, result.error
+    assert result.incremental
+    [prompt] = migration.client.prompts
+    assert "slice(0, 280)" in prompt
+    assert "setName(event.target.value);" not in prompt.split("==== FILE:", 1)[1]
+    with open(job.output_path, encoding="utf-8") as f:
+        tsx_code = f.read()
+    assert "setBio(event.target.value.slice(0, 280));" in tsx_code
+    assert tsx_code.count("event: React.ChangeEvent<HTMLInputElement>") == 2
+    assert ast_utils.compare_migration(EDITED, tsx_code, "Profile.tsx").equal
+
+
+def test_sources_are_only_kept_for_incremental_runs(migration, tmp_path):
+    source = tmp_path / "Profile.jsx"
+    source.write_text(COMPONENT, encoding="utf-8")
+    migration.client = FakeClient(convert)
+    migration.migration_manifest = MigrationManifest(str(tmp_path / "out"))
+    job = migration.MigrationJob(str(source), str(tmp_path / "out" / "Profile.tsx"), "Profile.jsx")
+
+    assert migration.migrate_file(job).success
+    assert not migration.migration_manifest.has_source(job.key)
+    assert not (tmp_path / "out" / ".migration_sources").exists()
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+from conftest import FakeClient, add_types
+
+import run_migration
+from migration_manifest import STATUS_FAILED, STATUS_MIGRATED, MigrationManifest, sha256_bytes
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    output = tmp_path / "Button.tsx"
+    output.write_text("const a: number = 1;", encoding="utf-8")
+    manifest = MigrationManifest(str(tmp_path))
+    manifest.record("Button.js", "source-hash", "gpt", STATUS_MIGRATED, output_hash=sha256_bytes(output.read_bytes()))
+    return manifest, str(output)
+
+
+def test_up_to_date_needs_the_same_source_model_and_output(manifest):
+    manifest, output_path = manifest
+
+    assert manifest.is_up_to_date("Button.js", "source-hash", "gpt", output_path)
+    assert not manifest.is_up_to_date("Button.js", "edited-hash", "gpt", output_path)
+    assert not manifest.is_up_to_date("Button.js", "source-hash", "other-model", output_path)
+    assert not manifest.is_up_to_date("Other.js", "source-hash", "gpt", output_path)
+    with open(output_path, "a", encoding="utf-8") as f:
+        f.write("\n// edited by hand")
+    assert not manifest.is_up_to_date("Button.js", "source-hash", "gpt", output_path)
+
+
+def test_failed_files_are_not_up_to_date_and_the_manifest_survives_a_reload(manifest, tmp_path):
+    manifest, output_path = manifest
+    manifest.record("Button.js", "source-hash", "gpt", STATUS_FAILED, error="APIError - boom")
+    manifest.save()
+
+    reloaded = MigrationManifest(str(tmp_path))
+
+    assert reloaded.entries["Button.js"]["error"] == "APIError - boom"
+    assert not reloaded.is_up_to_date("Button.js", "source-hash", "gpt", output_path)
+
+
+def test_an_interrupted_run_resumes_with_what_is_left(migration, tmp_path, monkeypatch):
+    monkeypatch.setattr(run_migration, "rate_limiter", run_migration.rate_limiter)
+    monkeypatch.setattr(run_migration, "load_env_and_setup_api_key", lambda: None)
+    sources = {name: f"export const {name} = (event) => event;\n" for name in ("Alert", "Badge", "Card")}
+    (tmp_path / "src").mkdir()
+    for name, js_code in sources.items():
+        (tmp_path / "src" / f"{name}.js").write_text(js_code, encoding="utf-8")
+    failing = {"Badge"}
+
+    def respond(prompt):
+        if any(f"const {name} " in prompt for name in failing):
+            raise ValueError("connection dropped")
+        return add_types(prompt.rsplit("\n\n", 1)[-1])
+
+    migration.client = FakeClient(respond)
+    flags = ["--input_dir", str(tmp_path / "src"), "--output_dir", str(tmp_path / "out"), "--no_cache"]
+    first = run_migration.main(flags)
+    failing.clear()
+    (tmp_path / "src" / "Card.js").write_text(sources["Card"].replace("event;", "event.target;"), encoding="utf-8")
+    migration.client.prompts.clear()
+    second = run_migration.main(flags)
+
+    assert sorted((os.path.basename(r.input_path), r.success) for r in first) == [
+        ("Alert.js", True), ("Badge.js", False), ("Card.js", True)]
+    assert sorted(os.path.basename(r.input_path) for r in second) == ["Badge.js", "Card.js"]
+    assert all(r.success for r in second) and len(migration.client.prompts) == 2
+    assert run_migration.main(flags) == []  # Everything is up to date now.
@@ -0,0 +1,61 @@
+import copy
+
+import pytest
+from conftest import requires_typescript
+
+import ast_utils
+
+JS_SOURCES = [
+    'import React, { useState } from "react";\n'
+    'export default function Counter({ step = 1, ...rest }) {\n'
+    '  const [count, setCount] = useState(0);\n'
+    '  return <button {...rest} onClick={() => setCount((c) => c + step)}>{count}</button>;\n'
+    '}',
+    "function greet(name) { return `Hello, ${name}!`; }\nconst x = greet(\"World\"), y = /a+/g;",
+    "class A extends B { static s() { return super.s(); } m(a = 1, ...r) { return a || r[0]; } }\n"
+    "label: for (const k in o) { continue label; }",
+    "async function g() { try { await p; } catch (e) { throw new Error('x'); } finally { delete o.k; } }\n"
+    "function* h() { yield* [1, 2]; }",
+]
+TS_SOURCES = [
+    "interface Props { label: string }\nfunction f(p: Props): number { return p.label.length as number; }",
+    "const C = <T,>(x: T): T => x;\nexport class K<T> implements I { private y!: T; constructor(public z: number) {} }",
+    "enum Size { Small = 1, Large }\ndeclare const size: Size;\nlet total = (size satisfies Size) + 1 - 2 * 3;",
+]
+
+
+def reference(ast):
+    """The recursive normalizer normalize_ast replaced; it mutates its input."""
+    return ast_utils._remove_ts_types_from_ast_recursive(copy.deepcopy(ast), True)
+
+
+@pytest.mark.parametrize("source", JS_SOURCES)
+def test_javascript_normalizes_like_the_recursive_reference(source):
+    ast = ast_utils.generate_js_ast_lenient(source)
+    before = copy.deepcopy(ast)
+
+    assert ast and ast_utils.normalize_ast(ast) == reference(ast)
+    assert ast == before  # The input is not modified.
+
+
+@requires_typescript
+@pytest.mark.parametrize("source", TS_SOURCES)
+@pytest.mark.parametrize("pruned", [True, False])
+def test_typescript_normalizes_like_the_recursive_reference(source, pruned):
+    ast = ast_utils.generate_ts_ast_from_source(source, pruned=pruned)
+
+    assert ast and ast_utils.normalize_ast(ast) == reference(ast)
+
+
+def test_very_deep_trees_do_not_hit_the_recursion_limit():
+    expression = {"type": "Identifier", "name": "x"}
+    for _ in range(20000):
+        expression = {"type": "UnaryExpression", "operator": "-", "prefix": True, "argument": expression}
+    program = {"type": "Program", "body": [{"type": "ExpressionStatement", "expression": expression}]}
+
+    cleaned = ast_utils.normalize_ast(program)
+
+    depth, node = 0, cleaned["body"][0]["expression"]
+    while node["type"] == "UnaryExpression":
+        depth, node = depth + 1, node["argument"]
+    assert depth == 20000 and node == {"type": "Identifier", "name": "x"}
@@ -0,0 +1,36 @@
+import pytest
+from conftest import FakeClient, add_types
+
+from migration_cache import MigrationCache
+
+SOURCES = {
+    "A.jsx": "export const A = () => <input onChange={(event) => event} />;\n",
+    "B.jsx": "export const B = () => <select onChange={(event) => event} />;\n",
+    "C.jsx": "export const C = () => <textarea onChange={(event) => event} />;\n",
+}
+
+
+def convert_alone(prompt):
+    # A packed prompt gets an answer without sections; single-file prompts end with the code.
+    return "" if "==== FILE:" in prompt else add_types(prompt.split("\n\n", 1)[1])
+
+
+@pytest.mark.parametrize("cached", [[], ["A.jsx", "B.jsx"]], ids=["missing-sections", "one-uncached"])
+def test_each_pack_miss_is_counted_once(migration, tmp_path, cached):
+    for name, js_code in SOURCES.items():
+        (tmp_path / name).write_text(js_code, encoding="utf-8")
+    migration.client = FakeClient(convert_alone)
+    migration.migration_cache = MigrationCache(str(tmp_path / "cache"))
+    for name in cached:
+        key = migration.conversion_cache_key(migration.MODEL, migration.SYSTEM_MESSAGE, migration.PROMPT_TEMPLATE,
+                                             SOURCES[name])
+        migration.migration_cache.put(key, migration.MODEL, add_types(SOURCES[name]))
+    jobs = [migration.MigrationJob(str(tmp_path / name), str(tmp_path / "out" / name.replace(".jsx", ".tsx")), name)
+            for name in SOURCES]
+
+    results = migration.migrate_pack(jobs)
+
+    assert all(result.success for result in results)
+    assert migration.migration_cache.hits == len(cached)
+    assert migration.migration_cache.misses == len(SOURCES) - len(cached)
+    migration.migration_cache.close()
@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+from conftest import FakeClient
+
+import pipeline
+import run_migration
+import verify_migration
+
+
+def crash(*args, **kwargs):
+    os._exit(1)  # A worker process dying mid-task breaks the whole pool.
+
+
+def test_verification_survives_crashed_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(verify_migration, "verify_pair", crash)
+    stage = pipeline.Pipeline(SimpleNamespace(queue_size=2, verify_workers=1, no_cache=True))
+    verifier = threading.Thread(target=stage.verify)
+    verifier.start()
+    jobs = [run_migration.MigrationJob(str(tmp_path / f"{i}.js"), str(tmp_path / f"{i}.tsx"), f"{i}.js") for i in range(4)]
+    for job in jobs:
+        stage.verify_queue.put(job, timeout=10)  # Would block forever if the stage had died.
+    stage.verify_queue.put(pipeline._DONE, timeout=10)
+    verifier.join(timeout=30)
+
+    assert not verifier.is_alive()
+    assert sorted(row["js_file"] for row in stage.verification_rows) == sorted(job.input_path for job in jobs)
+    assert {row["status"] for row in stage.verification_rows} == {verify_migration.STATUS_ERROR}
+
+
+@pytest.mark.parametrize("flags", [["--pack_token_budget", "500"], ["--pack_max_files", "5"], ["--dedupe"]])
+def test_batch_only_flags_are_rejected(flags, capsys):
+    with pytest.raises(SystemExit):
+        pipeline.main(flags)
+    assert "cannot be used with pipeline.py" in capsys.readouterr().err
+
+
+OLD_CARD = 'export const Card = () => <div className="old" />;\n'
+NEW_CARD = 'export const Card = () => <div className="new" />;\n'
+# Stands in for jscodeshift: rewrites a component left over from an earlier run a few polls in.
+FAKE_EXTRACTOR = f"""
+import os, time
+time.sleep(0.5)
+path = os.path.join(os.environ["EXTRACT_OUTPUT_DIR"], "Card_Card.js")
+with open(path + ".tmp", "w", encoding="utf-8") as f:
+    f.write({NEW_CARD!r})
+os.replace(path + ".tmp", path)
+time.sleep(0.5)
+"""
+
+
+def test_components_left_over_from_an_earlier_run_wait_for_extraction(migration, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(run_migration, "rate_limiter", run_migration.rate_limiter)
+    monkeypatch.setattr(run_migration, "load_env_and_setup_api_key", lambda: None)
+    migration.client = FakeClient(lambda prompt: NEW_CARD if '"new"' in prompt else OLD_CARD)
+    (tmp_path / "extracted").mkdir()
+    (tmp_path / "extracted" / "Card_Card.js").write_text(OLD_CARD, encoding="utf-8")
+    (tmp_path / "extract.py").write_text(FAKE_EXTRACTOR, encoding="utf-8")
+    flags = ["--input_dir", "extracted", "--output_dir", "migrated", "--no_cache", "--verify_workers", "1"]
+    pipeline.main(flags)  # The earlier run: Card_Card.tsx is up to date with the old component.
+
+    pipeline.main(flags + ["--jscodeshift", f"{sys.executable} extract.py", "App.js"])
+
+    assert (tmp_path / "migrated" / "Card_Card.tsx").read_text(encoding="utf-8") == NEW_CARD.strip()
+    assert len(migration.client.prompts) == 2
@@ -0,0 +1,96 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+from conftest import FakeClient
+
+from rate_limiter import RateLimiter
+
+
+def rate_limit_error(headers=None, code=None):
+    response = SimpleNamespace(request=None, status_code=429, headers=headers or {})
+    error = openai.RateLimitError("Rate limit reached", response=response, body=None)
+    error.code = code
+    return error
+
+
+def flaky(failures, retry_after="0"):
+    """A model answer preceded by `failures` 429s asking to retry after `retry_after` seconds."""
+    remaining = [failures]
+
+    def respond(prompt):
+        if remaining[0]:
+            remaining[0] -= 1
+            raise rate_limit_error({"retry-after": retry_after})
+        return "const a: number = 1;"
+    return respond
+
+
+@pytest.fixture
+def limited(migration, monkeypatch):
+    monkeypatch.setattr(migration, "rate_limiter", RateLimiter())
+    monkeypatch.setattr(migration, "MAX_RATE_LIMIT_RETRIES", 2)
+    return migration
+
+
+def test_only_requests_that_went_through_count_as_retried(limited):
+    limited.client = FakeClient(flaky(2))
+    limited.create_chat_completion([{"role": "user", "content": "const a = 1;"}])
+    limited.client = FakeClient(flaky(3))
+    with pytest.raises(openai.RateLimitError):
+        limited.create_chat_completion([{"role": "user", "content": "const a = 1;"}])
+
+    assert limited.rate_limiter.rate_limited_count == 1
+    assert limited.rate_limiter.rate_limited_failures == 1
+
+
+def test_running_out_of_quota_is_a_failure_without_retries(limited):
+    def out_of_quota(prompt):
+        raise rate_limit_error(code="insufficient_quota")
+
+    limited.client = FakeClient(out_of_quota)
+    with pytest.raises(openai.RateLimitError):
+        limited.create_chat_completion([{"role": "user", "content": "const a = 1;"}])
+
+    assert len(limited.client.prompts) == 1
+    assert (limited.rate_limiter.rate_limited_count, limited.rate_limiter.rate_limited_failures) == (0, 1)
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "1500", "retry-after": "9"}, 1.5),
+    ({"retry-after": "7"}, 7.0),
+    ({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, 0.0),  # A date in the past.
+    ({"retry-after": "soon"}, None),
+    ({}, None),
+])
+def test_retry_after_headers(migration, headers, expected):
+    assert migration._retry_after_seconds(rate_limit_error(headers)) == expected
+
+
+def test_a_429_pauses_every_worker_for_its_retry_after():
+    limiter = RateLimiter()
+    assert limiter.on_rate_limited(0.3) == 0.3
+    started = time.monotonic()
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert time.monotonic() - started >= 0.25
+    assert not any(thread.is_alive() for thread in threads)
+
+
+def test_requests_are_retried_after_the_server_requested_pause(limited, monkeypatch):
+    pauses = []
+    on_rate_limited = limited.rate_limiter.on_rate_limited
+    monkeypatch.setattr(limited.rate_limiter, "on_rate_limited", lambda seconds: pauses.append(seconds) or on_rate_limited(0))
+    limited.client = FakeClient(flaky(2, retry_after="2"))
+
+    response = limited.create_chat_completion([{"role": "user", "content": "const a = 1;"}])
+
+    assert response.choices[0].message.content == "const a: number = 1;"
+    assert pauses == [2.0, 2.0]
+    assert len(limited.client.prompts) == 3
@@ -0,0 +1,20 @@
+import json
+
+import run_migration
+
+
+def test_empty_shard_still_writes_its_summary(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_migration, "load_env_and_setup_api_key", lambda: None)
+    input_dir = tmp_path / "src"
+    input_dir.mkdir()
+    summaries = []
+    for index in (1, 2):
+        summary_path = tmp_path / f"shard-{index}.json"
+        run_migration.main(["--input_dir", str(input_dir), "--output_dir", str(tmp_path / f"out-{index}"),
+                            "--shard", f"{index}/2", "--summary_json", str(summary_path)])
+        with open(summary_path, encoding="utf-8") as f:
+            summaries.append(json.load(f))
+
+    assert [summary["shard"] for summary in summaries] == ["1/2", "2/2"]
+    assert all(summary["discovered"] == 0 and summary["migrated"] == 0 for summary in summaries)
+    assert run_migration.merge_summaries(summaries)["missing_shards"] == []
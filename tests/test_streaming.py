@@ -0,0 +1,29 @@
+import pytest
+
+from streaming import RunawayResponseError, StreamingFenceStripper
+
+
+def stream(text, chunk_size=7):
+    stripper = StreamingFenceStripper()
+    chunks = [stripper.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+    return "".join(chunks) + stripper.finish()
+
+
+@pytest.mark.parametrize("code", [
+    "const s = `\nHere is text\n`;",
+    "const s = `${name}\nNote: ${`\n## nested`}\n`;",
+    "/*\nNote: keep in sync with the API.\n```\n*/\nexport const x = 1;",
+    "export const re = /`/;\nconst y = 2;\nconst s = '`';",
+])
+def test_prose_and_fences_inside_literals_are_code(code):
+    assert stream(f"```tsx\n{code}\n```\nThe converted file above is ready.\n") == code
+
+
+def test_prose_after_the_code_is_cut_off():
+    with pytest.raises(RunawayResponseError):
+        stream("const s = `\nHere is text\n`;\nHere is the converted component.\n")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100])
+def test_closing_fence_on_the_last_code_line_is_dropped(chunk_size):
+    assert stream("```tsx\nconst s = `a`;\nconst x = 1;```", chunk_size) == "const s = `a`;\nconst x = 1;"
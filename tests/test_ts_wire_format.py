@@ -0,0 +1,41 @@
+import pytest
+from conftest import requires_typescript
+
+import ast_utils
+
+SOURCES = [
+    "function greet(name: string): string { return \"Hello, \" + name; }\nconst x: string = greet(\"World\");",
+    "interface Props { label: string; count?: number }\nenum Size { Small, Large }\n"
+    "export function Badge({ label, count = 0 }: Props): number { return (label.length + count) as number; }",
+    "export class Store<T> implements Iterable<T> {\n  private items: T[] = [];\n"
+    "  constructor(public readonly name: string) {}\n  add(item: T): void { this.items.push(item!); }\n"
+    "  *[Symbol.iterator]() { yield* this.items; }\n}",
+    "const identity = <T,>(value: T): T => value;\ntype Pair = [number, string];\nlet pair: Pair = [1, \"a\"];",
+]
+
+
+@requires_typescript
+@pytest.mark.parametrize("source", SOURCES)
+def test_the_pruned_wire_format_compares_like_the_full_one(source):
+    pruned = ast_utils.generate_ts_ast_from_source(source, pruned=True)
+    full = ast_utils.generate_ts_ast_from_source(source, pruned=False)
+    js_ast = ast_utils.generate_js_ast_lenient(ast_utils.generate_js_from_tsx(source))
+
+    assert pruned and full
+    assert ast_utils.normalize_for_comparison(pruned) == ast_utils.normalize_for_comparison(full)
+    assert ast_utils.compare_asts(js_ast, pruned) == ast_utils.compare_asts(js_ast, full)
+
+
+@requires_typescript
+def test_the_pruned_wire_format_is_smaller():
+    worker = ast_utils.TsAstWorker()
+    try:
+        sizes = []
+        for prune_spec in (None, ast_utils.TS_WIRE_PRUNE_SPEC):
+            received = worker.bytes_received
+            worker.parse([{"source": "\n".join(SOURCES), "fileName": "input.tsx"}], prune_spec)
+            sizes.append(worker.bytes_received - received)
+    finally:
+        worker.close()
+
+    assert sizes[1] * 2 < sizes[0]
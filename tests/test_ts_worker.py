@@ -0,0 +1,83 @@
+import shutil
+
+import pytest
+from conftest import requires_typescript
+
+import ast_utils
+
+requires_node = pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+
+# Speaks the generate_ts_ast.js worker protocol. Answers each item with {"name": ...}, exits on
+# an item named "crash", and answers an item named "desync" with a wrong request id the first
+# time (recorded by creating the file named by its fileName).
+FAKE_WORKER = r"""
+const fs = require('fs');
+const path = require('path');
+const readline = require('readline');
+readline.createInterface({ input: process.stdin }).on('line', (line) => {
+  const request = JSON.parse(line);
+  request.items.forEach((item, index) => {
+    const name = item.source !== undefined ? item.source : path.basename(item.path, '.tsx');
+    if (name === 'crash') process.exit(1);
+    let id = request.id;
+    if (name === 'desync' && !fs.existsSync(item.fileName)) {
+      fs.writeFileSync(item.fileName, '');
+      id = -1;
+    }
+    process.stdout.write(JSON.stringify({ id, index, ast: { name } }) + '\n');
+  });
+  process.stdout.write(JSON.stringify({ id: request.id, done: true }) + '\n');
+});
+"""
+
+
+@pytest.fixture
+def fake_worker(tmp_path):
+    script = tmp_path / "fake_worker.js"
+    script.write_text(FAKE_WORKER, encoding="utf-8")
+    worker = ast_utils.TsAstWorker(str(script))
+    yield worker
+    worker.close()
+
+
+def items(*names):
+    return [{"source": name, "fileName": "input.tsx"} for name in names]
+
+
+@requires_node
+def test_an_item_that_crashes_the_worker_is_isolated(fake_worker):
+    results = fake_worker.parse(items("a", "b", "crash", "c", "d"))
+
+    assert results == [{"name": "a"}, {"name": "b"}, {}, {"name": "c"}, {"name": "d"}]
+    assert fake_worker.parse(items("e")) == [{"name": "e"}]
+
+
+@requires_node
+def test_a_desynced_worker_is_restarted(fake_worker, tmp_path):
+    batch = items("a", "b") + [{"source": "desync", "fileName": str(tmp_path / "desynced")}]
+
+    assert fake_worker.parse(batch) == [{"name": "a"}, {"name": "b"}, {"name": "desync"}]
+
+
+@requires_node
+def test_a_worker_that_always_crashes_gives_up(fake_worker):
+    assert fake_worker.parse(items(*["crash"] * 20)) == [{}] * 20
+
+
+@requires_node
+def test_batch_parse_keeps_the_results_of_other_files(fake_worker, tmp_path):
+    paths = [str(tmp_path / f"{name}.tsx") for name in ("a", "crash", "b")]
+
+    assert ast_utils.generate_ts_asts(paths, fake_worker.node_script_full_path) == [{"name": "a"}, {}, {"name": "b"}]
+
+
+@requires_typescript
+def test_the_typescript_worker_restarts_after_being_killed():
+    worker = ast_utils.TsAstWorker()
+    try:
+        assert worker.parse(items("const a = 1;"))[0]
+        worker._process.kill()
+        worker._process.wait()
+        assert all(worker.parse(items("const b = 2;", "const c = 3;")))
+    finally:
+        worker.close()
@@ -0,0 +1,157 @@
+import json
+
+from conftest import requires_typescript
+
+import ast_similarity
+import ast_utils
+import verify_migration
+
+PROGRAM = {"type": "Program", "body": [{"type": "EmptyStatement"}]}
+
+COMPONENT_JSX = """import React, { useState } from "react";
+import { formatName } from "./format";
+
+export default function Greeting({ user, onRename }) {
+  const [name, setName] = useState(user.name);
+  const handleChange = (event) => setName(event.target.value);
+  return (
+    <div className="greeting">
+      <h1>Hello, {formatName(name)}!</h1>
+      <input value={name} onChange={handleChange} />
+      <button onClick={() => onRename(name)}>Save</button>
+    </div>
+  );
+}
+"""
+COMPONENT_TSX = """import React, { useState } from "react";
+import type { ChangeEvent } from "react";
+import { formatName } from "./format";
+
+interface User {
+  name: string;
+}
+
+interface GreetingProps {
+  user: User;
+  onRename: (name: string) => void;
+}
+
+export default function Greeting({ user, onRename }: GreetingProps) {
+  const [name, setName] = useState<string>(user.name);
+  const handleChange = (event: ChangeEvent<HTMLInputElement>) => setName(event.target.value as string);
+  return (
+    <div className="greeting">
+      <h1>Hello, {formatName(name)}!</h1>
+      <input value={name} onChange={handleChange} />
+      <button onClick={() => onRename(name)}>Save</button>
+    </div>
+  );
+}
+"""
+
+
+def write_pair(tmp_path):
+    js_path, tsx_path = tmp_path / "Button.jsx", tmp_path / "Button.tsx"
+    js_path.write_text("const a = 1;\n", encoding="utf-8")
+    tsx_path.write_text("const a: number = 1;\n", encoding="utf-8")
+    return str(js_path), str(tsx_path)
+
+
+def test_unparsable_input_is_a_parse_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(verify_migration, "_load_normalized", lambda language, *args: None if language == "ts" else PROGRAM)
+
+    row, _ = verify_migration.verify_pair(*write_pair(tmp_path))
+
+    assert row["status"] == verify_migration.STATUS_PARSE_ERROR
+    assert row["error"] == "Could not parse TSX"
+
+
+def test_unreadable_input_is_a_parse_error(tmp_path):
+    js_path, tsx_path = write_pair(tmp_path)
+    with open(js_path, "wb") as f:
+        f.write(b"\xff\xfe not utf-8")
+
+    row, _ = verify_migration.verify_pair(js_path, tsx_path)
+
+    assert row["status"] == verify_migration.STATUS_PARSE_ERROR
+    assert row["error"].startswith("UnicodeDecodeError")
+
+
+def test_a_failing_comparison_is_an_error_not_a_parse_error(tmp_path, monkeypatch):
+    def broken(*args):
+        raise KeyError("body")
+
+    monkeypatch.setattr(verify_migration, "_load_normalized", lambda *args: PROGRAM)
+    monkeypatch.setattr(ast_utils, "compare_normalized", broken)
+
+    row, _ = verify_migration.verify_pair(*write_pair(tmp_path))
+
+    assert row["status"] == verify_migration.STATUS_ERROR
+    assert row["error"] == "KeyError - 'body'"
+
+
+@requires_typescript
+def test_a_typed_jsx_component_matches_its_source(tmp_path):
+    js_path, tsx_path = tmp_path / "Greeting.jsx", tmp_path / "Greeting.tsx"
+    js_path.write_text(COMPONENT_JSX, encoding="utf-8")
+    tsx_path.write_text(COMPONENT_TSX, encoding="utf-8")
+    hash_cache = ast_utils.AstHashCache(str(tmp_path / "hashes.json"))
+    pairs = [(str(js_path), str(tsx_path))]
+
+    [row] = verify_migration.verify_pairs(pairs, workers=1, hash_cache=hash_cache,
+                                          tree_cache_dir=str(tmp_path / "trees"))
+    [cached_row] = verify_migration.verify_pairs(pairs, workers=1, hash_cache=hash_cache)
+    tsx_path.write_text(COMPONENT_TSX.replace("onRename(name)", "onRename(name.trim())"), encoding="utf-8")
+    [changed_row] = verify_migration.verify_pairs(pairs, workers=1, tree_cache_dir=str(tmp_path / "trees"))
+
+    assert row["status"] == verify_migration.STATUS_MATCH, row
+    assert cached_row["status"] == verify_migration.STATUS_MATCH and cached_row["cached"]
+    assert changed_row["status"] == verify_migration.STATUS_MISMATCH
+
+
+@requires_typescript
+def test_triage_ranks_migration_changes_not_parser_differences(tmp_path):
+    variants = {
+        "Correct": COMPONENT_TSX,
+        "Renamed": COMPONENT_TSX.replace("onRename(name)", "onRename(name.trim())"),
+        "Rewritten": COMPONENT_TSX.replace('      <input value={name} onChange={handleChange} />\n', ""),
+    }
+    pairs = []
+    for name, tsx_code in variants.items():
+        js_path, tsx_path = tmp_path / f"{name}.jsx", tmp_path / f"{name}.tsx"
+        js_path.write_text(COMPONENT_JSX, encoding="utf-8")
+        tsx_path.write_text(tsx_code, encoding="utf-8")
+        pairs.append((str(js_path), str(tsx_path)))
+
+    rows = verify_migration.verify_pairs(pairs, workers=1, max_edit_distance=200)
+    triage_path = tmp_path / "triage.json"
+    verify_migration.write_triage(rows, str(triage_path))
+
+    assert [row["status"] for row in rows] == ["match", "mismatch", "mismatch"]
+    assert rows[0]["edit_distance"] is None
+    assert 0 < rows[1]["edit_distance"] < rows[2]["edit_distance"] < 50
+    triage = json.loads(triage_path.read_text(encoding="utf-8"))
+    assert [entry["js_file"] for entry in triage] == [pairs[1][0], pairs[2][0]]
+    assert ast_similarity.migration_similarity(COMPONENT_JSX, COMPONENT_TSX).distance == 0
+
+
+@requires_typescript
+def test_a_batch_strips_its_tsx_files_in_one_round_trip(tmp_path, monkeypatch):
+    pairs = []
+    for name in ("One", "Two", "Three"):
+        js_path, tsx_path = tmp_path / f"{name}.jsx", tmp_path / f"{name}.tsx"
+        js_path.write_text(COMPONENT_JSX.replace("greeting", name), encoding="utf-8")
+        tsx_path.write_text(COMPONENT_TSX.replace("greeting", name), encoding="utf-8")
+        pairs.append((str(js_path), str(tsx_path)))
+    strip_many = ast_utils.generate_js_from_tsx_many
+    batches = []
+    monkeypatch.setattr(ast_utils, "generate_js_from_tsx_many",
+                        lambda sources: batches.append(len(sources)) or strip_many(sources))
+    monkeypatch.setattr(ast_utils, "generate_js_from_tsx", None)  # Not called per file.
+    tree_cache_dir = str(tmp_path / "trees")
+
+    first = verify_migration.verify_batch(pairs, [False] * 3, tree_cache_dir)
+    again = verify_migration.verify_batch(pairs, [False] * 3, tree_cache_dir)
+
+    assert [row["status"] for row, _ in first + again] == ["match"] * 6
+    assert batches == [3, 0]
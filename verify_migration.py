@@ -0,0 +1,396 @@
+import argparse
+import csv
+import json
+import logging
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import ast_similarity
+import ast_utils
+import discovery
+from instrumentation import tracer
+
+# Ranked mismatches listed in the log; see --triage_json for all of them.
+TRIAGE_LOG_LIMIT = 10
+# Most pairs sent to a pool worker at once; their .tsx files are stripped in one worker round trip.
+VERIFY_BATCH_SIZE = 32
+
+STATUS_MATCH = "match"
+STATUS_MISMATCH = "mismatch"
+STATUS_PARSE_ERROR = "parse_error"
+STATUS_MISSING_OUTPUT = "missing_output"
+# The verification itself failed (a bug or a crashed worker), not the input.
+STATUS_ERROR = "error"
+
+REPORT_FIELDS = [
+    "js_file", "tsx_file", "status", "divergence_path", "edit_distance", "similarity", "cached",
+    "js_parse_s", "ts_parse_s", "normalize_s", "compare_s", "similarity_s", "total_s", "error",
+]
+
+
+def setup_logging():
+    """Configures basic logging."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+
+def pair_files(extracted_dir, migrated_dir):
+    """
+    Pairs every extracted source file (found recursively, honouring ignore files) with the .tsx
+    file run_migration.py writes for it.
+    """
+    return [
+        (os.path.join(extracted_dir, *rel_path.split("/")), discovery.output_path_for(migrated_dir, rel_path))
+        for rel_path in discovery.discover_sources(extracted_dir, skip_dirs=[migrated_dir])
+    ]
+
+
+def _new_row(js_path, tsx_path):
+    return {field: None for field in REPORT_FIELDS} | {"js_file": js_path, "tsx_file": tsx_path, "cached": False}
+
+
+def error_row(js_path, tsx_path, error):
+    """Report row of a pair whose verification raised `error`."""
+    return _new_row(js_path, tsx_path) | {"status": STATUS_ERROR, "error": f"{type(error).__name__} - {error}"}
+
+
+# Cache "language" of each side: the .tsx side is cached with its types stripped.
+CACHE_LANGUAGES = {"js": "js", "ts": ast_utils.STRIPPED_TSX}
+
+
+def _load_normalized(language, path, tree_cache, row, stripped_tsx=None):
+    """
+    Normalized AST of the "js" file at `path`, or of the "ts" file with its types stripped by the
+    compiler, so both sides are Esprima trees (see ast_utils.compare_migration). Taken from
+    `tree_cache` when its content was normalized before; None if it does not parse. Adds
+    parse/normalize timings to `row`. `stripped_tsx` is a (source, stripped code, seconds) result
+    of stripping the file ahead (see verify_batch), used if the file still has that source.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    key = ast_utils.NormalizedAstCache.key(CACHE_LANGUAGES[language], source) if tree_cache is not None else None
+    if key is not None:
+        cleaned = tree_cache.get(key)
+        if cleaned is not None:
+            return cleaned
+
+    started = time.perf_counter()
+    if language == "ts" and stripped_tsx is not None and stripped_tsx[0] == source:
+        source = stripped_tsx[1]
+        started -= stripped_tsx[2]
+    elif language == "ts":
+        source = ast_utils.generate_js_from_tsx(source, os.path.basename(path))
+    ast = ast_utils.generate_js_ast_lenient(source, lean=True) if source is not None else None
+    row[f"{language}_parse_s"] = time.perf_counter() - started
+    if not ast:
+        return None
+    started = time.perf_counter()
+    cleaned = ast_utils.normalize_for_comparison(ast)
+    row["normalize_s"] = (row["normalize_s"] or 0.0) + time.perf_counter() - started
+    if key is not None:
+        tree_cache.put(key, cleaned)
+    return cleaned
+
+
+def verify_pair(js_path, tsx_path, want_hash_entries=False, tree_cache_dir=None, max_edit_distance=None,
+                stripped_tsx=None):
+    """
+    Parses and compares one .js/.tsx pair; runs inside a pool worker, each of which keeps its own
+    TypeScript parser worker warm. With `tree_cache_dir`, normalized trees are reused from and
+    stored in a NormalizedAstCache there. With `max_edit_distance`, mismatches are scored by
+    their bounded tree edit distance. Returns (report_row, hash_entries or None).
+    """
+    row = _new_row(js_path, tsx_path)
+    started = time.perf_counter()
+    hash_entries = None
+    tree_cache = ast_utils.NormalizedAstCache(tree_cache_dir) if tree_cache_dir else None
+    try:
+        if not os.path.exists(tsx_path):
+            row["status"] = STATUS_MISSING_OUTPUT
+            return row, None
+
+        try:
+            js_cleaned = _load_normalized("js", js_path, tree_cache, row)
+            ts_cleaned = _load_normalized("ts", tsx_path, tree_cache, row, stripped_tsx)
+        except (OSError, UnicodeDecodeError) as e:
+            row["status"] = STATUS_PARSE_ERROR
+            row["error"] = f"{type(e).__name__} - {e}"
+            return row, None
+        if js_cleaned is None or ts_cleaned is None:
+            row["status"] = STATUS_PARSE_ERROR
+            row["error"] = "Could not parse " + " and ".join(
+                name for name, cleaned in (("JS", js_cleaned), ("TSX", ts_cleaned)) if cleaned is None
+            )
+            return row, None
+        js_cleaned, ts_cleaned = ast_utils.without_empty_exports(js_cleaned), ast_utils.without_empty_exports(ts_cleaned)
+
+        compare_started = time.perf_counter()
+        hasher = ast_utils.SubtreeHasher()
+        comparison = ast_utils.compare_normalized(js_cleaned, ts_cleaned, hasher)
+        if want_hash_entries:
+            hash_entries = (ast_utils.build_hash_entry(js_cleaned, hasher), ast_utils.build_hash_entry(ts_cleaned, hasher))
+        row["compare_s"] = time.perf_counter() - compare_started
+        row["status"] = STATUS_MATCH if comparison.equal else STATUS_MISMATCH
+        row["divergence_path"] = comparison.divergence_path
+        if max_edit_distance and not comparison.equal:
+            similarity_started = time.perf_counter()
+            score = ast_similarity.similarity_normalized(js_cleaned, ts_cleaned, max_edit_distance, hasher)
+            row["similarity_s"] = time.perf_counter() - similarity_started
+            row["edit_distance"], row["similarity"] = score.distance, score.similarity
+    except Exception as e:
+        row.update(status=STATUS_ERROR, error=f"{type(e).__name__} - {e}")
+    finally:
+        row["total_s"] = time.perf_counter() - started
+    return row, hash_entries
+
+
+def verify_batch(pairs, want_hash_entries, tree_cache_dir=None, max_edit_distance=None):
+    """
+    verify_pair for several pairs in one pool task (`want_hash_entries` has a flag per pair). The
+    .tsx files that are not in the tree cache have their types stripped in one round trip to the
+    TypeScript worker first. Returns a (report_row, hash_entries or None) per pair.
+    """
+    tree_cache = ast_utils.NormalizedAstCache(tree_cache_dir) if tree_cache_dir else None
+    sources = {}
+    for _, tsx_path in pairs:
+        try:
+            with open(tsx_path, "r", encoding="utf-8") as f:
+                source = f.read()
+        except (OSError, UnicodeDecodeError):
+            continue  # verify_pair reports it.
+        if tree_cache is None or not tree_cache.has(ast_utils.NormalizedAstCache.key(CACHE_LANGUAGES["ts"], source)):
+            sources[tsx_path] = source
+    started = time.perf_counter()
+    stripped = ast_utils.generate_js_from_tsx_many([(source, os.path.basename(path)) for path, source in sources.items()])
+    seconds = (time.perf_counter() - started) / max(1, len(sources))
+    stripped_tsx = {path: (source, code, seconds) for (path, source), code in zip(sources.items(), stripped)}
+    return [
+        verify_pair(js_path, tsx_path, want, tree_cache_dir, max_edit_distance, stripped_tsx.get(tsx_path))
+        for (js_path, tsx_path), want in zip(pairs, want_hash_entries)
+    ]
+
+
+def _hash_cache_keys(js_path, tsx_path):
+    with open(js_path, "r", encoding="utf-8") as f:
+        js_key = ast_utils.AstHashCache.key("js", f.read())
+    with open(tsx_path, "r", encoding="utf-8") as f:
+        ts_key = ast_utils.AstHashCache.key(CACHE_LANGUAGES["ts"], f.read())
+    return js_key, ts_key
+
+
+def verify_pairs(pairs, workers=None, hash_cache=None, tree_cache_dir=None, max_edit_distance=None):
+    """
+    Verifies (js_path, tsx_path) pairs across a process pool (default: one worker per core), in
+    batches of up to VERIFY_BATCH_SIZE pairs (see verify_batch).
+    Pairs whose files are both known to `hash_cache` are decided from the stored hashes without
+    parsing (only matches, when mismatches are scored with `max_edit_distance`); files with a
+    normalized tree in `tree_cache_dir` are not parsed again either. Returns report rows in input order.
+    """
+    rows = [None] * len(pairs)
+    pending = []
+    keys = {}
+    for index, (js_path, tsx_path) in enumerate(pairs):
+        if hash_cache is not None and os.path.exists(tsx_path):
+            keys[index] = _hash_cache_keys(js_path, tsx_path)
+            js_entry, ts_entry = (hash_cache.get(key) for key in keys[index])
+            if js_entry is not None and ts_entry is not None:
+                comparison = ast_utils.compare_hash_entries(js_entry, ts_entry)
+                if max_edit_distance and not comparison.equal:
+                    pending.append(index)
+                    continue
+                row = _new_row(js_path, tsx_path)
+                row.update(status=STATUS_MATCH if comparison.equal else STATUS_MISMATCH,
+                           divergence_path=comparison.divergence_path, cached=True, total_s=0.0)
+                rows[index] = row
+                continue
+        pending.append(index)
+
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        # Smaller batches when there are few pairs, so every worker gets some.
+        batch_size = max(1, min(VERIFY_BATCH_SIZE, math.ceil(len(pending) / workers)))
+        batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(verify_batch, [pairs[index] for index in batch], [index in keys for index in batch],
+                                tree_cache_dir, max_edit_distance): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:  # e.g. BrokenProcessPool after a worker crashed
+                    results = [(error_row(*pairs[index], e), None) for index in batch]
+                for index, (row, hash_entries) in zip(batch, results):
+                    rows[index] = row
+                    record_row_spans(row)
+                    if hash_entries is not None:
+                        for key, entry in zip(keys[index], hash_entries):
+                            hash_cache.put(key, entry)
+                    logging.info(f"{row['status']:>14}  {row['js_file']}")
+    return rows
+
+
+# Report columns recorded as instrumentation spans (the pool workers do not trace themselves).
+ROW_SPANS = {"js_parse_s": "ast.js_parse", "ts_parse_s": "ast.ts_parse", "normalize_s": "ast.normalize",
+             "compare_s": "ast.compare", "similarity_s": "ast.similarity", "total_s": "verify.file"}
+
+
+def record_row_spans(row):
+    for field, stage in ROW_SPANS.items():
+        if row[field] is not None:
+            tracer.record(stage, row[field], file=row["js_file"], status=row["status"])
+    tracer.count("verified_files_total", status=row["status"])
+
+
+def rank_mismatches(rows):
+    """Mismatched rows, most similar first (the likeliest trivial differences); unscored rows last."""
+    mismatches = [row for row in rows if row["status"] == STATUS_MISMATCH]
+    return sorted(mismatches, key=lambda row: (row["similarity"] is None, -(row["similarity"] or 0.0), row["js_file"]))
+
+
+def write_triage(rows, path):
+    """Writes the ranked mismatches of `rows` as a JSON triage list."""
+    triage = [
+        {"rank": rank, **{field: row[field] for field in
+                          ("js_file", "tsx_file", "similarity", "edit_distance", "divergence_path")}}
+        for rank, row in enumerate(rank_mismatches(rows), 1)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(triage, f, indent=2)
+
+
+def write_reports(rows, json_path=None, csv_path=None):
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    if csv_path:
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main(argv=None):
+    """
+    Verifies a whole migration run: pairs every extracted .js file with its migrated .tsx file,
+    compares their ASTs in parallel and writes a JSON/CSV report.
+    """
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Verify migrated TSX files against the original JS by AST comparison.")
+    parser.add_argument(
+        "--extracted_dir",
+        default="extracted",
+        help="Directory containing the original JavaScript files. (default: 'extracted')"
+    )
+    parser.add_argument(
+        "--migrated_dir",
+        default="migrated",
+        help="Directory containing the migrated TSX files. (default: 'migrated')"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes. (default: number of CPU cores)"
+    )
+    parser.add_argument(
+        "--report_json",
+        default="verification_report.json",
+        help="Path of the JSON report. (default: 'verification_report.json')"
+    )
+    parser.add_argument(
+        "--report_csv",
+        default=None,
+        help="Optional path of a CSV report."
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help=f"Do not reuse or store AST hashes in '{ast_utils.DEFAULT_AST_HASH_CACHE}' or normalized trees."
+    )
+    parser.add_argument(
+        "--tree_cache_dir",
+        default=ast_utils.DEFAULT_NORMALIZED_AST_CACHE,
+        help=f"Directory of cached normalized ASTs. (default: '{ast_utils.DEFAULT_NORMALIZED_AST_CACHE}')"
+    )
+    parser.add_argument(
+        "--max_edit_distance",
+        type=int,
+        default=ast_similarity.DEFAULT_MAX_EDIT_DISTANCE,
+        help="Score mismatches by tree edit distance, giving up beyond this many edits; 0 disables scoring. "
+             f"(default: {ast_similarity.DEFAULT_MAX_EDIT_DISTANCE})"
+    )
+    parser.add_argument(
+        "--triage_json",
+        default=None,
+        help="Write the mismatches ranked by similarity (closest first) to this JSON file."
+    )
+    parser.add_argument(
+        "--trace_file",
+        default=None,
+        help="Write a JSON-lines trace of per-stage timing spans to this file."
+    )
+    parser.add_argument(
+        "--metrics_file",
+        default=None,
+        help="Write a Prometheus text-format summary of stage latencies to this file."
+    )
+    args = parser.parse_args(argv)
+    if args.trace_file or args.metrics_file:
+        tracer.enable(args.trace_file)
+
+    try:
+        pairs = pair_files(args.extracted_dir, args.migrated_dir)
+    except FileNotFoundError:
+        logging.error(f"Error: Input directory '{args.extracted_dir}' not found.")
+        sys.exit(1)
+    if not pairs:
+        logging.info(f"No .js files found in '{args.extracted_dir}'. Nothing to verify.")
+        return []
+
+    hash_cache = None if args.no_cache else ast_utils.AstHashCache()
+    logging.info(f"Verifying {len(pairs)} file pair(s) with {args.workers or os.cpu_count()} worker(s)...")
+    started = time.perf_counter()
+    rows = verify_pairs(pairs, args.workers, hash_cache, None if args.no_cache else args.tree_cache_dir,
+                        args.max_edit_distance)
+    wall_time = time.perf_counter() - started
+    if hash_cache is not None:
+        hash_cache.save()
+
+    write_reports(rows, args.report_json, args.report_csv)
+    if args.triage_json:
+        write_triage(rows, args.triage_json)
+    if args.metrics_file:
+        tracer.write_prometheus(args.metrics_file)
+    tracer.close()
+    counts = {status: 0 for status in (STATUS_MATCH, STATUS_MISMATCH, STATUS_PARSE_ERROR, STATUS_MISSING_OUTPUT,
+                                       STATUS_ERROR)}
+    for row in rows:
+        counts[row["status"]] += 1
+    logging.info("Verification complete.")
+    logging.info(f"Summary: {counts[STATUS_MATCH]} match, {counts[STATUS_MISMATCH]} mismatch, "
+                 f"{counts[STATUS_PARSE_ERROR]} parse error(s), {counts[STATUS_MISSING_OUTPUT]} missing output(s), "
+                 f"{counts[STATUS_ERROR]} verification error(s) in {wall_time:.1f}s.")
+    logging.info(f"Report written to '{args.report_json}'" + (f" and '{args.report_csv}'." if args.report_csv else "."))
+    if args.max_edit_distance and counts[STATUS_MISMATCH]:
+        logging.info("Closest mismatches:")
+        for row in rank_mismatches(rows)[:TRIAGE_LOG_LIMIT]:
+            score = (f"{row['similarity']:.4f} ({row['edit_distance']} edit(s))" if row["similarity"] is not None
+                     else f"> {args.max_edit_distance} edits")
+            logging.info(f"  {score:>28}  {row['tsx_file']}")
+        if args.triage_json:
+            logging.info(f"Ranked triage list written to '{args.triage_json}'.")
+    return rows
+
+
+if __name__ == "__main__":
+    main()